@@ -0,0 +1,130 @@
+"""JWT-аутентификация без запроса к БД на каждый запрос.
+
+Токен из `send_token_jwt` несёт поля пользователя, которые нужны
+разрешениям и представлениям (USER_CLAIMS), и версию `ver` — версии
+тегов USERS_AUTH_TAG и `auth_tag(pk)` в кэше версий на момент выдачи.
+Тег пользователя сбрасывается сигналом при изменении этих полей (смена
+роли через UserViewSet или `/users/me/`) и при удалении пользователя.
+Общий тег сбрасывает bulk_loaded с моделью User: запись пользователей
+в обход сигналов (`load_data --bulk`, `generate_data --insert`,
+QuerySet.update) делает устаревшими токены всех пользователей.
+
+Версии хранятся в общем для процессов кэше API, поэтому смена роли
+или удаление пользователя в одном процессе сразу видны остальным.
+
+Пока версия в токене совпадает с текущей, пользователь собирается из
+полей токена. Иначе (или в токене нет полей, например он выдан
+AccessToken.for_user) поля берутся из LRU процесса по текущей версии,
+и только при промахе — одним запросом к БД. Запись LRU живёт не
+дольше JWT_USER_CACHE_TTL секунд.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reviews.models import User
+
+from .cache import get_versions, object_tag
+
+USER_CLAIMS = ('username', 'role', 'is_superuser', 'is_staff', 'is_active')
+USER_FIELDS = ('id',) + USER_CLAIMS
+VERSION_CLAIM = 'ver'
+USERS_AUTH_TAG = object_tag(User, auth='all')
+
+
+def auth_tag(user_id):
+    return object_tag(User, auth=user_id)
+
+
+def auth_version(user_id):
+    return get_versions([USERS_AUTH_TAG, auth_tag(user_id)])
+
+
+class LruCache:
+    """Least recently used на OrderedDict с ограничением по числу ключей."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = LruCache(settings.JWT_USER_CACHE_SIZE)
+
+
+class ClaimsAccessToken(AccessToken):
+    """Access-токен с полями пользователя и версией его прав."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        token[VERSION_CLAIM] = auth_version(user.pk)
+        return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification'))
+        version = auth_version(user_id)
+        if (validated_token.get(VERSION_CLAIM) == version
+                and all(claim in validated_token for claim in USER_CLAIMS)):
+            values = (user_id,) + tuple(
+                validated_token[claim] for claim in USER_CLAIMS)
+        else:
+            values = self.get_values(user_id, version)
+        fields = dict(zip(USER_FIELDS, values))
+        if not fields['is_active']:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive')
+        # from_db ждёт значения в порядке полей модели; остальные поля
+        # отложены и загрузятся при обращении.
+        names = [field.attname for field in User._meta.concrete_fields
+                 if field.attname in fields]
+        return User.from_db(
+            'default', names, [fields[name] for name in names])
+
+    def get_values(self, user_id, version):
+        entry = user_cache.get(user_id)
+        now = time.monotonic()
+        if entry is not None and entry[0] == version and entry[1] > now:
+            return entry[2]
+        values = User.objects.filter(pk=user_id).values_list(
+            *USER_FIELDS).first()
+        if values is None:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found')
+        user_cache.set(
+            user_id, (version, now + settings.JWT_USER_CACHE_TTL, values))
+        return values
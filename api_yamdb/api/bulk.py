@@ -0,0 +1,204 @@
+"""Массовая запись произведений (`POST /api/v1/titles/bulk/`).
+
+Элементы читаются потоком (JSON-массив или NDJSON) и обрабатываются
+пачками по `chunk_size`. На пачку:
+- один запрос загружает уже существующие произведения по `id`;
+- каждый элемент проверяется TitlesEditorSerializer (для существующих —
+  как частичное обновление); slug жанров и категорий разрешаются по
+  снимку справочников reference_data, без запросов к БД;
+- в одной транзакции новые произведения вставляются bulk_create,
+  существующие обновляются bulk_update, связи TitleGenre заменяются
+  одним DELETE и одним bulk_create, затем обновляются поисковый
+  индекс (один раз на пачку) и счётчик строк.
+
+Вставка и обновление идут в обход сигналов моделей, поэтому после
+записи всех пачек один раз отправляется bulk_loaded, и кэши API
+сбрасываются, как после load_data; теги обновлённых произведений
+сбрасываются после каждой пачки.
+Элемент с `id`, которого нет в базе, создаётся с этим id; если пачка
+не записалась из-за нарушения целостности (тот же id успел создать
+другой запрос), её элементы возвращаются с ошибкой.
+"""
+import time
+from itertools import islice
+
+from django.db import IntegrityError, connection, transaction
+from rest_framework.exceptions import ParseError
+
+from reviews import search
+from reviews.models import RowCount, Title, TitleGenre
+from reviews.signals import bulk_loaded
+
+from .cache import object_tag
+from .serializers import TitlesEditorSerializer
+from .signals import bump_on_commit, collected_bumps
+
+TITLE_FIELDS = ('name', 'year', 'description', 'category')
+
+
+def chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_titles(titles):
+    """bulk_create, после которого у всех объектов заполнен pk.
+
+    Возвращает число произведений, сохранённых по одному через save()
+    (их счётчик строк уже обновили сигналы).
+    """
+    with_pk = [title for title in titles if title.pk is not None]
+    without_pk = [title for title in titles if title.pk is None]
+    Title.objects.bulk_create(with_pk)
+    if not without_pk:
+        return 0
+    if connection.features.can_return_rows_from_bulk_insert:
+        Title.objects.bulk_create(without_pk)
+        return 0
+    if connection.vendor != 'sqlite':
+        # pk вставленных строк известен только при вставке по одной.
+        for title in without_pk:
+            title.save()
+        return len(without_pk)
+    Title.objects.bulk_create(without_pk)
+    # Django 3.2 не возвращает pk из bulk_create на SQLite. Транзакция
+    # держит блокировку записи, и новые rowid идут подряд после
+    # наибольшего, поэтому вставленным строкам принадлежат последние id.
+    pks = Title.objects.order_by('-pk').values_list(
+        'pk', flat=True)[:len(without_pk)]
+    for title, pk in zip(without_pk, reversed(pks)):
+        title.pk = pk
+    return 0
+
+
+class TitleBulkUpsert:
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.results = []
+        self.stats = {'received': 0, 'created': 0, 'updated': 0,
+                      'errors': 0, 'chunks': 0}
+        self.seen_ids = set()
+
+    def run(self, items):
+        started = time.perf_counter()
+        for chunk in chunks(enumerate(items), self.chunk_size):
+            self.process(chunk)
+        if self.stats['created'] or self.stats['updated']:
+            bulk_loaded.send(
+                sender=self.__class__, models=[Title, TitleGenre])
+        self.results.sort(key=lambda result: result['index'])
+        elapsed = time.perf_counter() - started
+        self.stats['seconds'] = round(elapsed, 3)
+        self.stats['items_per_second'] = round(
+            self.stats['received'] / elapsed if elapsed else 0, 1)
+        return {'results': self.results, 'stats': self.stats}
+
+    def error(self, index, errors, title_id=None):
+        self.stats['errors'] += 1
+        result = {'index': index, 'status': 'error', 'errors': errors}
+        if title_id is not None:
+            result['id'] = title_id
+        self.results.append(result)
+
+    def item_id(self, index, item):
+        """id элемента или None; False, если id неверный."""
+        title_id = item.get('id')
+        if title_id is None:
+            return None
+        if (not isinstance(title_id, int) or isinstance(title_id, bool)
+                or title_id < 1):
+            self.error(index, {'id': ['Ожидается положительное целое.']})
+            return False
+        if title_id in self.seen_ids:
+            self.error(index, {'id': ['Повтор id в запросе.']}, title_id)
+            return False
+        self.seen_ids.add(title_id)
+        return title_id
+
+    def process(self, chunk):
+        self.stats['chunks'] += 1
+        self.stats['received'] += len(chunk)
+        items = []
+        for index, item in chunk:
+            if isinstance(item, ParseError):
+                self.error(index, {'non_field_errors': [str(item.detail)]})
+            elif not isinstance(item, dict):
+                self.error(index, {
+                    'non_field_errors': ['Ожидается объект JSON.']})
+            else:
+                title_id = self.item_id(index, item)
+                if title_id is not False:
+                    items.append((index, item, title_id))
+        existing = Title.objects.in_bulk(
+            [title_id for _, _, title_id in items if title_id is not None])
+
+        created, updated, genres = [], [], {}
+        for index, item, title_id in items:
+            title = existing.get(title_id)
+            serializer = TitlesEditorSerializer(
+                title, data=item, partial=title is not None)
+            if not serializer.is_valid():
+                self.error(index, serializer.errors, title_id)
+                continue
+            data = dict(serializer.validated_data)
+            if 'genre' in data:
+                genres[index] = data.pop('genre')
+            if title is None:
+                title = Title(pk=title_id, **data)
+                created.append((index, title))
+            else:
+                for field, value in data.items():
+                    setattr(title, field, value)
+                updated.append((index, title))
+        self.write(created, updated, genres)
+
+    def write(self, created, updated, genres):
+        if not created and not updated:
+            return
+        titles = dict(created + updated)
+        # id из запроса: после отката pk новых объектов недействительны.
+        requested_ids = {index: title.pk for index, title in titles.items()}
+        try:
+            # post_delete строк TitleGenre переиндексирует и сбрасывает
+            # теги по разу на пачку.
+            with transaction.atomic(), search.batch_indexing(), \
+                    collected_bumps():
+                saved = insert_titles([title for _, title in created])
+                Title.objects.bulk_update(
+                    [title for _, title in updated], TITLE_FIELDS)
+                self.delete_genres(
+                    [title.pk for index, title in updated
+                     if index in genres])
+                TitleGenre.objects.bulk_create(
+                    TitleGenre(title_id=titles[index].pk, genre_id=genre.pk)
+                    for index, chunk_genres in genres.items()
+                    for genre in chunk_genres)
+                search.index_titles([title.pk for title in titles.values()])
+                if len(created) > saved:
+                    RowCount.add(Title, len(created) - saved)
+        except IntegrityError:
+            # Например, произведение с тем же id создано параллельным
+            # запросом. Пачка откатывается целиком, предыдущие уже
+            # записаны.
+            for index, title_id in requested_ids.items():
+                self.error(index, {'non_field_errors': [
+                    'Пачка не записана из-за параллельной записи, '
+                    'повторите элемент.']}, title_id)
+            return
+        # Карточки произведений не зависят от тега модели Title.
+        bump_on_commit(
+            *(object_tag(Title, pk=title.pk) for _, title in updated))
+        for status, pairs in (('created', created), ('updated', updated)):
+            self.stats[status] += len(pairs)
+            self.results.extend(
+                {'index': index, 'status': status, 'id': title.pk}
+                for index, title in pairs)
+
+    @staticmethod
+    def delete_genres(title_ids):
+        if title_ids:
+            TitleGenre.objects.filter(title_id__in=title_ids).delete()
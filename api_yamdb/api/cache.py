@@ -0,0 +1,261 @@
+"""Версии тегов для инвалидации кэшей API.
+
+У каждого тега (например, `reviews.title`) в кэше лежит номер версии.
+Ключи кэшированных значений включают версии своих тегов, поэтому
+запись в модель просто увеличивает версию её тега, и все зависимые
+записи перестают находиться без явного удаления.
+
+Кроме тегов моделей есть теги частей данных (`object_tag`), например
+`reviews.review:title=5` — отзывы одного произведения: запись отзыва
+сбрасывает только закэшированные ответы этого произведения.
+
+Тега, который ещё ни разу не сбрасывали, в кэше нет, и его версия
+считается равной 0: чтение версий ничего не записывает, поэтому запросы
+к несуществующим объектам (`/titles/<n>/`) не наполняют кэш, запись
+появляется только при сбросе тега.
+
+Версии должны быть видны всем процессам, поэтому API_CACHE_ALIAS
+указывает на общий кэш (по умолчанию DurableFileBasedCache, в
+продакшене — Redis или Memcached).
+"""
+import hashlib
+import math
+import os
+import pickle
+import random
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только в пределах процесса.
+    fcntl = None
+
+VERSION_PREFIX = 'tag-version:'
+# Тег всех закэшированных ответов, сбрасывается после массовой загрузки.
+RESPONSE_TAG = 'api.response'
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def model_tag(model):
+    return model._meta.label_lower
+
+
+def object_tag(model, **lookup):
+    """Тег строк модели с одним значением поля: `reviews.title:pk=5`."""
+    (field, value), = lookup.items()
+    return f'{model_tag(model)}:{field}={value}'
+
+
+def _new_version():
+    # Первая версия тега не должна совпасть с 0 и с версией,
+    # вытесненной из кэша раньше.
+    return time.time_ns()
+
+
+def get_versions(tags):
+    keys = [VERSION_PREFIX + tag for tag in tags]
+    versions = get_cache().get_many(keys)
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump(*tags):
+    cache = get_cache()
+    for tag in tags:
+        key = VERSION_PREFIX + tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Первый сброс тега; add не затирает версию, записанную
+            # одновременным сбросом из другого процесса.
+            if not cache.add(key, _new_version(), timeout=None):
+                cache.incr(key)
+
+
+def increment(cache, key, delta=1, timeout=None):
+    """Атомарное увеличение счётчика, которого может ещё не быть."""
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Счётчик вытеснен между add и incr.
+        cache.set(key, delta, timeout=timeout)
+        return delta
+
+
+def make_key(prefix, tags, *parts):
+    """Ключ кэша из произвольных частей и текущих версий тегов."""
+    raw = repr((parts, get_versions(tags)))
+    return f'{prefix}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def response_key(request, tags):
+    """Ключ ответа: адрес с нормализованной строкой запроса и версии
+    тегов. Схема и хост входят в ключ, потому что ссылки пагинации
+    абсолютные."""
+    query = sorted(request.query_params.lists())
+    return make_key(
+        'response', [RESPONSE_TAG, *tags], request.scheme,
+        request.get_host(), request.path, query)
+
+
+def expires_early(expires, delta, beta, now=None):
+    """Вероятностное досрочное истечение (XFetch).
+
+    Запись считается истёкшей на случайный срок раньше: чем дороже её
+    пересчёт (delta, сек.) и ближе срок, тем вероятнее. Так одна из
+    частых читок обновляет популярную запись до её истечения, и
+    одновременного промаха у всех не происходит. beta = 0 отключает.
+    """
+    if now is None:
+        now = time.time()
+    return now - delta * beta * math.log(1 - random.random()) >= expires
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых вычислений в пределах процесса: пока по
+    ключу идёт вызов, остальные потоки с тем же ключом ждут его
+    результата (или исключения) вместо повторного вычисления.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def running(self, key):
+        return key in self.calls
+
+    def do(self, key, func, timeout=None):
+        """Результат func и признак, что он получен от чужого вызова.
+
+        Если чужой вызов не закончился за timeout секунд, func
+        выполняется самостоятельно.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            if call.done.wait(timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            return func(), False
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class LockingFileBasedCache(FileBasedCache):
+    """
+    Файловый кэш, общий для процессов одной машины, с атомарными add и
+    incr: они выполняются под flock на файле блокировки в каталоге
+    кэша. У FileBasedCache обе операции — чтение и запись без
+    блокировки, и одновременные вызовы теряют обновления.
+    incr сохраняет срок жизни записи.
+
+    FileBasedCache перед каждой записью обходит весь каталог, чтобы
+    проверить MAX_ENTRIES; здесь это делается раз в cull_every записей
+    объекта кэша, иначе запись дорожает с числом ключей.
+    """
+    lock_file_name = 'lock'
+    thread_lock = threading.Lock()
+    cull_every = 100
+    writes = 0
+
+    def _cull(self):
+        self.writes += 1
+        if self.writes % self.cull_every == 0:
+            self._cull_entries()
+
+    def _cull_entries(self):
+        super()._cull()
+
+    @contextmanager
+    def locked(self):
+        with self.thread_lock:
+            if fcntl is None:
+                yield
+                return
+            self._createdir()
+            path = os.path.join(self._dir, self.lock_file_name)
+            with open(path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self.locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self.locked():
+            expiry = value = None
+            try:
+                with open(fname, 'rb') as file:
+                    expiry = pickle.load(file)
+                    value = pickle.loads(zlib.decompress(file.read()))
+            except (FileNotFoundError, EOFError):
+                pass
+            now = time.time()
+            if value is None or (expiry is not None and expiry < now):
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            self.set(key, value,
+                     None if expiry is None else expiry - now, version)
+        return value
+
+
+class DurableFileBasedCache(LockingFileBasedCache):
+    """
+    LockingFileBasedCache, который не вытесняет живые записи: при
+    MAX_ENTRIES файлов удаляются только истёкшие. Для данных, потеря
+    которых меняет поведение, а не только стоимость запроса: версий
+    тегов (вытесненная версия вернулась бы к 0), кодов подтверждения и
+    счётчиков лимитов.
+    """
+
+    def _cull_entries(self):
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        for fname in filelist:
+            try:
+                with open(fname, 'rb') as file:
+                    # Удаляет файл, если срок записи истёк.
+                    self._is_expired(file)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,183 @@
+"""Кэш карточек произведений.
+
+Карточка — сериализованное TitlesReadSerializer произведение (жанры,
+категория, рейтинг). Уровни:
+- LFU в памяти процесса, ограниченный суммарным размером карточек в
+  байтах (размер — длина JSON);
+- общий для процессов кэш TITLE_CARD_CACHE_ALIAS (по умолчанию
+  файловый FileBasedCache на этой машине).
+
+Карточка хранится вместе со штампом — версиями тегов произведения,
+его жанров и категорий. Запись произведения, его жанров, категории
+или отзывов меняет версию, и карточка со старым штампом считается
+промахом и перезаписывается на месте. Версии лежат в общем кэше API,
+поэтому запись в любом процессе сбрасывает и локальные LFU остальных.
+"""
+import json
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.utils.encoders import JSONEncoder
+
+from reviews.models import Category, Genre, Title
+
+from .cache import get_versions, model_tag, object_tag
+
+
+def title_card_tags(title_id):
+    return [object_tag(Title, pk=title_id), model_tag(Genre),
+            model_tag(Category)]
+
+
+class LfuCache:
+    """
+    Least frequently used с ограничением по байтам, O(1) на операцию:
+    ключи разложены по корзинам частоты обращений, внутри корзины — в
+    порядке давности, так что из наименее частых вытесняется самый
+    старый. Замена значения сохраняет накопленную частоту ключа.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = {}
+        self.buckets = defaultdict(OrderedDict)
+        self.min_count = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self._touch(key, entry)
+            return entry[0]
+
+    def set(self, key, value, size):
+        """Сохраняет значение; False, если оно больше всего кэша."""
+        if size > self.max_bytes:
+            return False
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.size -= entry[1]
+                entry[0], entry[1] = value, size
+                self._touch(key, entry)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._evict(keep=key)
+            if entry is None:
+                self.entries[key] = [value, size, 1]
+                self.buckets[1][key] = None
+                self.min_count = 1
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.buckets.clear()
+            self.size = self.min_count = 0
+
+    def _touch(self, key, entry):
+        count = entry[2]
+        entry[2] = count + 1
+        self.buckets[count + 1][key] = None
+        self._unlink(key, count)
+
+    def _unlink(self, key, count):
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = min(self.buckets, default=0)
+
+    def _evict(self, keep):
+        for victim in self.buckets.get(self.min_count, ()):
+            if victim != keep:
+                break
+        else:
+            # В наименьшей корзине только сохраняемый ключ.
+            victim = next(
+                victim for count in sorted(self.buckets)
+                for victim in self.buckets[count] if victim != keep)
+        _, size, count = self.entries.pop(victim)
+        self._unlink(victim, count)
+        self.size -= size
+        self.evictions += 1
+
+
+class TitleCardCache:
+    """Двухуровневый кэш карточек со счётчиками обращений."""
+    key_prefix = 'title-card:'
+
+    def __init__(self, max_bytes=None):
+        self.local = LfuCache(
+            max_bytes or settings.TITLE_CARD_LOCAL_BYTES)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[settings.TITLE_CARD_CACHE_ALIAS]
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get_or_build(self, title_id, build):
+        """Карточка произведения; при промахе строится вызовом build()."""
+        title_id = int(title_id)
+        # Штамп берётся до построения: запись, случившаяся во время
+        # построения, оставит карточку со старым штампом.
+        stamp = tuple(get_versions(title_card_tags(title_id)))
+        entry = self.local.get(title_id)
+        if entry is not None and entry[0] == stamp:
+            self.count('local_hits')
+            return entry[1]
+        stale = entry is not None
+        entry = self.shared.get(f'{self.key_prefix}{title_id}')
+        if entry is not None and entry[0] == stamp:
+            self.count('shared_hits')
+            self.local.set(title_id, entry, entry[2])
+            return entry[1]
+        if stale or entry is not None:
+            self.count('invalidations')
+        self.count('misses')
+        card = build()
+        size = len(json.dumps(
+            card, cls=JSONEncoder, ensure_ascii=False).encode())
+        entry = (stamp, card, size)
+        self.local.set(title_id, entry, size)
+        self.shared.set(f'{self.key_prefix}{title_id}', entry,
+                        settings.TITLE_CARD_TIMEOUT)
+        return card
+
+    def stats(self):
+        """Счётчики процесса: попадания по уровням, промахи,
+        устаревшие карточки и вытеснения из LFU."""
+        with self.lock:
+            stats = dict.fromkeys(
+                ('local_hits', 'shared_hits', 'misses', 'invalidations'), 0)
+            stats.update(self.counters)
+        stats.update(
+            evictions=self.local.evictions,
+            local_entries=len(self.local),
+            local_bytes=self.local.size,
+        )
+        return stats
+
+    def reset(self):
+        self.local.clear()
+        self.local.evictions = 0
+        with self.lock:
+            self.counters.clear()
+
+
+title_cards = TitleCardCache()
@@ -0,0 +1,79 @@
+"""Хранилище кодов подтверждения.
+
+Код живёт CONFIRMATION_CODE_TTL секунд и принимается один раз; после
+CONFIRMATION_CODE_MAX_ATTEMPTS неверных попыток код сбрасывается, и
+нужно запросить новый. Коды не пишутся в таблицу пользователей, поэтому
+повторная регистрация не обращается к БД на запись, а просроченные
+коды удаляет сам кэш.
+
+Класс хранилища задаётся настройкой CONFIRMATION_CODE_STORE. Кэш
+CONFIRMATION_CODE_CACHE_ALIAS должен быть общим для всех процессов,
+которые обслуживают регистрацию и получение токена, и переживать их
+перезапуск (по умолчанию — файловый кэш `auth`).
+"""
+import hashlib
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+from .cache import increment
+from .util import confirmation_code_generation
+
+
+class CodeStore(ABC):
+    """Интерфейс хранилища кодов, ключ — username."""
+
+    @abstractmethod
+    def issue(self, username):
+        """Новый код, заменяющий выданный ранее."""
+
+    @abstractmethod
+    def verify(self, username, code):
+        """True, если код верный; верный код гасится."""
+
+
+class CacheCodeStore(CodeStore):
+    """
+    Код лежит в кэше под ключом username. Счётчик неверных попыток
+    привязан к самому коду (ключ включает его хэш) и создаётся первой
+    неверной попыткой, поэтому выдача кода — одна запись в кэш, а новый
+    код начинает счёт с нуля.
+    """
+    code_prefix = 'confirmation-code:'
+    attempts_prefix = 'confirmation-attempts:'
+
+    @property
+    def cache(self):
+        return caches[settings.CONFIRMATION_CODE_CACHE_ALIAS]
+
+    def attempts_key(self, username, code):
+        digest = hashlib.md5(code.encode()).hexdigest()
+        return f'{self.attempts_prefix}{username}:{digest}'
+
+    def issue(self, username):
+        code = confirmation_code_generation()
+        self.cache.set(self.code_prefix + username, code,
+                       settings.CONFIRMATION_CODE_TTL)
+        return code
+
+    def verify(self, username, code):
+        code_key = self.code_prefix + username
+        stored = self.cache.get(code_key)
+        if stored is None:
+            return False
+        keys = (code_key, self.attempts_key(username, stored))
+        if constant_time_compare(stored, str(code)):
+            self.cache.delete_many(keys)
+            return True
+        attempts = increment(self.cache, keys[1],
+                             timeout=settings.CONFIRMATION_CODE_TTL)
+        if attempts >= settings.CONFIRMATION_CODE_MAX_ATTEMPTS:
+            self.cache.delete_many(keys)
+        return False
+
+
+def get_code_store():
+    return import_string(settings.CONFIRMATION_CODE_STORE)()
@@ -1,14 +1,29 @@
 import django_filters as filters
 
-from reviews.models import Title
+from reviews.models import Category, Genre, Title
+from reviews.search import search_titles
+from .references import reference_data
 
 
 class TitleFilter(filters.FilterSet):
-    genre = filters.CharFilter(field_name='genre__slug')
-    category = filters.CharFilter(field_name='category__slug')
+    genre = filters.CharFilter(method='filter_reference')
+    category = filters.CharFilter(method='filter_reference')
     year = filters.NumberFilter(field_name='year')
     name = filters.CharFilter(field_name='name', lookup_expr='contains')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('category', 'genre', 'year', 'name')
+        fields = ('category', 'genre', 'year', 'name', 'search')
+
+    def filter_reference(self, queryset, name, value):
+        """Slug жанра или категории переводится в id по снимку
+        справочника, и фильтр обходится без JOIN со справочником."""
+        model = {'genre': Genre, 'category': Category}[name]
+        reference_id = reference_data.get(model).id_for_slug(value)
+        if reference_id is None:
+            return queryset.none()
+        return queryset.filter(**{name: reference_id})
+
+    def filter_search(self, queryset, name, value):
+        return search_titles(queryset, value)
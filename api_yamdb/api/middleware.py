@@ -0,0 +1,75 @@
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class QueryRecorder:
+    """execute_wrapper, считающий запросы и суммарное время в БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def query_stats():
+    """Накопленная статистика по именам маршрутов: запросы, число
+    SQL-запросов и время БД в миллисекундах."""
+    with _stats_lock:
+        return {name: dict(stat) for name, stat in _stats.items()}
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class QueryCountMiddleware:
+    """
+    В режиме DEBUG или при QUERY_COUNT_HEADERS = True считает SQL-запросы
+    и время БД для каждого запроса, копит их по имени маршрута
+    (`api:titles-list`) и добавляет заголовки X-Query-Count и
+    X-Query-Time-Ms. Иначе обработчик запросов к БД не подключается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (settings.DEBUG or settings.QUERY_COUNT_HEADERS):
+            # Без заголовков счётчик не нужен: запросы идут напрямую.
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            self.record(match.view_name, recorder)
+        response['X-Query-Count'] = recorder.count
+        response['X-Query-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+        return response
+
+    @staticmethod
+    def record(name, recorder):
+        with _stats_lock:
+            stat = _stats.setdefault(
+                name, {'requests': 0, 'queries': 0, 'db_time_ms': 0.0})
+            stat['requests'] += 1
+            stat['queries'] += recorder.count
+            stat['db_time_ms'] += recorder.duration * 1000
@@ -1,5 +1,16 @@
+import time
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from rest_framework import mixins, viewsets, filters
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from reviews.models import Review, Title
+from .cache import (SingleFlight, expires_early, get_response_cache,
+                    model_tag, response_key)
 from .permissions import AdminPermissions
+from .references import reference_data
 
 
 class ListCreateDestroyViewSet(mixins.ListModelMixin,
@@ -10,3 +21,150 @@ class ListCreateDestroyViewSet(mixins.ListModelMixin,
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
     lookup_field = 'slug'
+
+
+class ReferenceListMixin:
+    """
+    list справочника (категории, жанры) из снимка reference_data без
+    запросов к БД. Поиск повторяет SearchFilter по полю name: каждое
+    слово запроса должно входить в название без учёта регистра.
+    """
+
+    def list(self, request, *args, **kwargs):
+        rows = reference_data.get(self.queryset.model).rows
+        terms = [term.casefold() for term in
+                 filters.SearchFilter().get_search_terms(request)]
+        if terms:
+            rows = [row for row in rows if all(
+                term in row['name'].casefold() for term in terms)]
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.get_serializer(rows, many=True).data)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+def resolve_nested_parents(kwargs):
+    """
+    Загрузка цепочки родителей для маршрутов
+    titles/<title_id>/reviews/<review_id>/comments одним запросом.
+    """
+    title_id = kwargs.get('title_id')
+    review_id = kwargs.get('review_id')
+    if review_id is not None:
+        review = get_object_or_404(
+            Review.objects.select_related('title'),
+            id=review_id,
+            title_id=title_id,
+        )
+        return {'title': review.title, 'review': review}
+    return {'title': get_object_or_404(Title, id=title_id)}
+
+
+class NestedParentMixin:
+    """
+    Родительские объекты вложенного маршрута загружаются один раз за
+    запрос и хранятся в `request.nested_parents`, откуда их берут
+    вьюсет, сериализатор (через context['view']) и разрешения.
+    """
+
+    def get_parents(self):
+        parents = getattr(self.request, 'nested_parents', None)
+        if parents is None:
+            parents = resolve_nested_parents(self.kwargs)
+            self.request.nested_parents = parents
+        return parents
+
+    def get_title(self):
+        return self.get_parents()['title']
+
+    def get_review(self):
+        return self.get_parents()['review']
+
+
+class CachedListMixin:
+    """
+    Ответы list анонимным пользователям хранятся в кэше
+    RESPONSE_CACHE_ALIAS. Ключ включает версии тегов из
+    `get_response_cache_tags()` (по умолчанию теги моделей
+    `response_cache_models`), поэтому запись в зависимые данные сразу
+    даёт промах. Кэшируются только успешные ответы.
+
+    Для дорогих списков `response_cache_coalesce = True` включает защиту
+    от лавины промахов:
+    - одинаковые одновременные промахи ждут одного вычисления
+      (SingleFlight) не дольше `response_cache_wait` секунд;
+    - истёкшая запись ещё RESPONSE_CACHE_STALE секунд отдаётся всем,
+      пока один запрос её пересчитывает (stale-while-revalidate);
+    - запись обновляется досрочно с вероятностью, растущей к сроку
+      истечения (RESPONSE_CACHE_EARLY_BETA, см. `expires_early`).
+
+    Заголовок X-Cache: HIT, MISS, STALE или COALESCED (результат
+    чужого вычисления).
+    """
+    response_cache_models = ()
+    response_cache_coalesce = False
+    response_cache_wait = 10
+    response_cache_flight = SingleFlight()
+
+    def get_response_cache_tags(self):
+        return [model_tag(model) for model in self.response_cache_models]
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if (not timeout or request.method not in SAFE_METHODS
+                or request.user.is_authenticated):
+            return handler(request, *args, **kwargs)
+        cache = get_response_cache()
+        key = response_key(request, self.get_response_cache_tags())
+        entry = cache.get(key)
+        now = time.time()
+        coalesce = self.response_cache_coalesce
+        if entry is not None:
+            data, expires, delta = entry
+            fresh = now < expires and not (coalesce and expires_early(
+                expires, delta, settings.RESPONSE_CACHE_EARLY_BETA, now))
+            if fresh:
+                return self.cached(data, 'HIT')
+            if coalesce and self.response_cache_flight.running(key):
+                return self.cached(data, 'STALE')
+
+        def compute():
+            started = time.perf_counter()
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                delta = time.perf_counter() - started
+                stale = settings.RESPONSE_CACHE_STALE if coalesce else 0
+                cache.set(key, (response.data, time.time() + timeout, delta),
+                          timeout + stale)
+            return response
+
+        if not coalesce:
+            response = compute()
+        else:
+            response, shared = self.response_cache_flight.do(
+                key, compute, self.response_cache_wait)
+            if shared:
+                return self.cached(response.data, 'COALESCED',
+                                   response.status_code)
+        if response.status_code == 200:
+            response['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def cached(data, cache_status, status=200):
+        response = Response(data, status=status)
+        response['X-Cache'] = cache_status
+        return response
+
+
+class CachedResponseMixin(CachedListMixin):
+    """То же для list и retrieve. Отдельный класс, потому что роутер
+    добавляет маршрут детального просмотра по наличию retrieve."""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
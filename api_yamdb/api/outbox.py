@@ -0,0 +1,232 @@
+"""Очередь исходящих писем.
+
+Запрос только кладёт письмо в таблицу OutboxEmail и сразу отвечает;
+отправкой занимается обработчик:
+- пачками по EMAIL_OUTBOX_BATCH_SIZE через одно соединение с
+  почтовым бэкендом на пачку;
+- письмо, которое не удалось отправить, откладывается с
+  экспоненциальной задержкой, после EMAIL_OUTBOX_MAX_ATTEMPTS
+  попыток остаётся в таблице с пустым `next_attempt_at`;
+- повторный запрос на тот же адрес заменяет ещё не отправленное
+  письмо, поэтому на адрес уходит одно письмо с последним кодом.
+
+Пачку обработчик забирает себе условным UPDATE с арендой на
+EMAIL_OUTBOX_LEASE секунд, так что несколько процессов не отправят
+одно письмо дважды, а письма упавшего обработчика вернутся в очередь.
+
+Режим EMAIL_OUTBOX_DELIVERY:
+- `thread` — фоновый поток процесса, который будится после коммита;
+- `eager` — отправка после коммита в том же потоке (для тестов);
+- `command` — только команда `send_emails`.
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import (IntegrityError, close_old_connections, connection,
+                       models, transaction)
+from django.utils import timezone
+
+from reviews.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+# Одна команда вместо UPDATE и INSERT там, где есть ON CONFLICT.
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+
+
+@lru_cache(maxsize=None)
+def upsert_sql(vendor, fields):
+    """Текст upsert строится один раз на набор полей, а не на письмо."""
+    quote = connection.ops.quote_name
+    table = quote(OutboxEmail._meta.db_table)
+    columns = ', '.join(
+        quote(column) for column in ('email', 'revision', *fields))
+    placeholders = ', '.join(['%s'] * (len(fields) + 2))
+    updates = ', '.join(
+        f'{quote(column)} = excluded.{quote(column)}' for column in fields)
+    return (
+        f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+        f'ON CONFLICT ({quote("email")}) DO UPDATE SET {updates}, '
+        f'{quote("revision")} = {table}.{quote("revision")} + 1')
+
+
+def upsert(email, fields):
+    values = {
+        **fields,
+        'next_attempt_at': connection.ops.adapt_datetimefield_value(
+            fields['next_attempt_at']),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(upsert_sql(connection.vendor, tuple(values)),
+                       [email, 1, *values.values()])
+
+
+def enqueue(email, subject, body):
+    """Ставит письмо в очередь, заменяя неотправленное на тот же адрес."""
+    now = timezone.now()
+    fields = {'subject': subject, 'body': body, 'attempts': 0,
+              'next_attempt_at': now, 'claim': '', 'last_error': ''}
+    if connection.vendor in UPSERT_VENDORS:
+        upsert(email, fields)
+    elif not OutboxEmail.objects.filter(email=email).update(
+            revision=models.F('revision') + 1, **fields):
+        try:
+            with transaction.atomic():
+                OutboxEmail.objects.create(email=email, **fields)
+        except IntegrityError:
+            # Параллельный запрос успел создать письмо на этот адрес.
+            OutboxEmail.objects.filter(email=email).update(
+                revision=models.F('revision') + 1, **fields)
+    transaction.on_commit(deliver)
+
+
+def deliver():
+    mode = settings.EMAIL_OUTBOX_DELIVERY
+    if mode == 'eager':
+        Outbox().drain()
+    elif mode == 'thread':
+        worker.wake()
+
+
+def retry_delay(attempts):
+    """Задержка перед попыткой после `attempts` неудачных, сек."""
+    return min(settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.EMAIL_OUTBOX_RETRY_MAX_DELAY)
+
+
+class Outbox:
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.claim = uuid.uuid4().hex
+
+    def claim_batch(self):
+        now = timezone.now()
+        due = OutboxEmail.objects.filter(next_attempt_at__lte=now)
+        ids = list(due.order_by('next_attempt_at').values_list(
+            'pk', flat=True)[:self.batch_size])
+        if not ids:
+            return []
+        due.filter(pk__in=ids).update(
+            claim=self.claim,
+            next_attempt_at=now + timedelta(
+                seconds=settings.EMAIL_OUTBOX_LEASE),
+        )
+        return list(OutboxEmail.objects.filter(claim=self.claim))
+
+    def send_batch(self, emails):
+        """Отправляет пачку через одно соединение; (отправлено, ошибок)."""
+        sent, failed = [], []
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as error:
+            failed = [(email, error) for email in emails]
+            emails = []
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, settings.DEFAULT_FROM_EMAIL,
+                [email.email], connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                failed.append((email, error))
+                # Соединение после ошибки могло оборваться.
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                sent.append(email)
+        connection.close()
+        self.finish(sent, failed)
+        return len(sent), len(failed)
+
+    def finish(self, sent, failed):
+        # Письмо, заменённое во время отправки, остаётся в очереди.
+        if sent:
+            OutboxEmail.objects.filter(reduce(or_, (
+                models.Q(pk=email.pk, revision=email.revision)
+                for email in sent))).delete()
+        now = timezone.now()
+        for email, error in failed:
+            attempts = email.attempts + 1
+            next_attempt_at = None
+            if attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                next_attempt_at = now + timedelta(
+                    seconds=retry_delay(attempts))
+            logger.warning('Письмо на %s не отправлено (попытка %s): %s',
+                           email.email, attempts, error)
+            OutboxEmail.objects.filter(
+                pk=email.pk, revision=email.revision).update(
+                attempts=attempts, next_attempt_at=next_attempt_at,
+                claim='', last_error=str(error))
+
+    def drain(self):
+        """Отправляет все письма, срок которых наступил; (отправлено,
+        ошибок). Отложенные после ошибки письма ждут следующего вызова."""
+        sent = failed = 0
+        while True:
+            emails = self.claim_batch()
+            if not emails:
+                return sent, failed
+            batch_sent, batch_failed = self.send_batch(emails)
+            sent += batch_sent
+            failed += batch_failed
+
+
+class OutboxWorker:
+    """Фоновый поток, отправляющий письма процесса.
+
+    Поток запускается при первом письме и будится после каждого
+    коммита с письмом; раз в EMAIL_OUTBOX_POLL_INTERVAL секунд он
+    просыпается сам, чтобы повторить отложенные письма.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopping = False
+
+    def wake(self):
+        with self.lock:
+            self.stopping = False
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='email-outbox', daemon=True)
+                self.thread.start()
+        self.event.set()
+
+    def stop(self, timeout=None):
+        """Останавливает поток после текущей пачки."""
+        with self.lock:
+            self.stopping = True
+            thread = self.thread
+        self.event.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def run(self):
+        outbox = Outbox()
+        while True:
+            self.event.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
+            self.event.clear()
+            if self.stopping:
+                return
+            try:
+                outbox.drain()
+            except Exception:
+                logger.exception('Ошибка обработчика очереди писем')
+            finally:
+                close_old_connections()
+
+
+worker = OutboxWorker()
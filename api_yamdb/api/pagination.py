@@ -0,0 +1,218 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from reviews.models import RowCount
+from reviews.signals import COUNTED_MODELS
+
+from .cache import get_cache, make_key, model_tag
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset): курсор хранит значения полей сортировки
+    последнего объекта страницы, и следующая страница выбирается условием
+    `(pub_date, id) < (:pub_date, :id)` по индексу, без OFFSET и COUNT.
+    Поэтому страница N стоит столько же, сколько первая.
+
+    Сортировка берётся из атрибута `cursor_ordering` вьюсета; последним
+    полем должен идти уникальный ключ.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = self.previous_position = None
+        if results and has_next:
+            self.next_position = self._position(results[-1])
+        if results and has_previous:
+            self.previous_position = self._position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            tokens = json.loads(b64decode(encoded.encode('ascii')))
+            position, reverse = tokens['p'], bool(tokens.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        tokens = {'p': position}
+        if reverse:
+            tokens['r'] = 1
+        encoded = b64encode(json.dumps(tokens).encode('ascii'))
+        return replace_query_param(
+            remove_query_param(self.base_url, 'page'),
+            self.cursor_query_param, encoded.decode('ascii'))
+
+    def _position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """Лексикографическое условие «строго после позиции»."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class CountedPaginator(DjangoPaginator):
+    """Paginator, который берёт `count` из переданной функции."""
+
+    def __init__(self, object_list, per_page, count_func, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @property
+    def count(self):
+        if not hasattr(self, '_count'):
+            self._count = self.count_func()
+        return self._count
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Постраничная пагинация без SELECT COUNT(*) на каждый запрос.
+
+    `count` берётся по порядку:
+    - из `view.get_list_count()`, если вьюсет его определяет и он вернул
+      не None (например, хранимое число отзывов произведения);
+    - из таблицы RowCount для нефильтрованного списка модели;
+    - из кэша с коротким TTL по нормализованному набору фильтров; ключ
+      включает версии тегов модели и `view.count_dependencies`, так что
+      любая запись в них сразу даёт промах.
+    Точный подсчёт выполняется только по `?exact_count=1`.
+    """
+    exact_count_query_param = 'exact_count'
+    count_cache_timeout = settings.COUNT_CACHE_TIMEOUT
+    count_ignored_query_params = ('page', 'cursor', 'exact_count')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountedPaginator,
+            count_func=partial(self.get_count, queryset, request, view))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset, request, view=None):
+        if isinstance(queryset, list):
+            # Список уже в памяти, например снимок справочника.
+            return len(queryset)
+        if request.query_params.get(self.exact_count_query_param) in (
+                '1', 'true'):
+            return queryset.count()
+        get_list_count = getattr(view, 'get_list_count', None)
+        if get_list_count is not None:
+            count = get_list_count()
+            if count is not None:
+                return count
+        filters = sorted(
+            (key, tuple(values))
+            for key, values in request.query_params.lists()
+            if key not in self.count_ignored_query_params
+        )
+        view_kwargs = sorted(getattr(view, 'kwargs', {}).items())
+        model = queryset.model
+        if not filters and not view_kwargs and model in COUNTED_MODELS:
+            return RowCount.get_count(model)
+
+        tags = [model_tag(model)] + [
+            model_tag(dependency)
+            for dependency in getattr(view, 'count_dependencies', ())]
+        key = make_key('count', tags, request.path, view_kwargs, filters)
+        cache = get_cache()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+
+class OptionalCursorPagination(CachedCountPagination):
+    """
+    Постраничная пагинация, которая переключается на KeysetPagination,
+    если в запросе есть параметр `cursor` (пустой — первая страница).
+    """
+    cursor_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = None
+        if self.cursor_class.cursor_query_param in request.query_params:
+            self.cursor = self.cursor_class()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,33 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NdjsonParser(BaseParser):
+    """
+    NDJSON (по объекту JSON на строку). Возвращает генератор, который
+    читает тело запроса по строкам по мере обработки, поэтому поток
+    не загружается в память целиком. Строка с неверным JSON выдаётся
+    как объект ParseError, чтобы вызывающий код мог сообщить о ней и
+    продолжить со следующей.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        return self.items(stream, encoding)
+
+    @staticmethod
+    def items(stream, encoding):
+        if stream is None:
+            return
+        for line_num, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(encoding))
+            except ValueError as error:
+                yield ParseError(f'Строка {line_num}: {error}')
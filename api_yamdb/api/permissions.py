@@ -13,7 +13,7 @@ class IsAuthorOrModerOrAdmin(permissions.BasePermission):
                 request.user.role == 'admin'
                 or request.user.role == 'moderator'
                 or (request.user.role == 'user'
-                    and request.user == obj.author)
+                    and request.user.pk == obj.author_id)
             )
         )
 
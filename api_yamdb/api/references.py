@@ -0,0 +1,64 @@
+"""Снимок справочников Category и Genre в памяти процесса.
+
+Таблицы крошечные и почти не меняются, а читаются при каждом разборе
+slug в TitlesEditorSerializer, фильтре произведений и списках
+категорий и жанров. Снимок таблицы (slug → id → name) хранится вместе
+с версией тега модели из api.cache; на каждое обращение проверяется
+только версия (один get_many в общем для процессов кэше API), и
+таблица перечитывается целиком, если любой процесс записал в неё и
+увеличил версию.
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from reviews.models import Category, Genre
+
+from .cache import get_versions, model_tag
+
+
+class ReferenceTable:
+    """Строки одной таблицы в порядке pk и индексы по slug и id."""
+
+    def __init__(self, model, version, rows):
+        self.model = model
+        self.version = version
+        self.rows = rows
+        self.by_slug = {row['slug']: row for row in rows}
+        self.by_id = {row['id']: row for row in rows}
+
+    def id_for_slug(self, slug):
+        row = self.by_slug.get(slug)
+        return None if row is None else row['id']
+
+    def instances(self, slugs):
+        """Объекты модели по известным снимку slug, без запроса к БД."""
+        fields = self.model._meta.concrete_fields
+        names = [field.attname for field in fields]
+        return {
+            slug: self.model.from_db(
+                DEFAULT_DB_ALIAS, names,
+                [self.by_slug[slug][name] for name in names])
+            for slug in slugs if slug in self.by_slug
+        }
+
+
+class ReferenceData:
+    models = (Category, Genre)
+
+    def __init__(self):
+        self.tables = {}
+
+    def get(self, model):
+        version, = get_versions([model_tag(model)])
+        table = self.tables.get(model)
+        if table is None or table.version != version:
+            # Версия читается до строк: запись между ними даст снимок
+            # новее версии, и следующая проверка перечитает таблицу.
+            rows = list(model._default_manager.order_by('pk').values())
+            table = self.tables[model] = ReferenceTable(model, version, rows)
+        return table
+
+    def reset(self):
+        self.tables = {}
+
+
+reference_data = ReferenceData()
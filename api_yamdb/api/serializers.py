@@ -1,8 +1,17 @@
+from functools import lru_cache
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
-from django.shortcuts import get_object_or_404
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from api_yamdb.settings import PATTERN, PATTERN_SLUG
-from reviews.models import Review, Comment, Category, User, Genre, Title
+from reviews import search
+from reviews.models import (Review, Comment, Category, User, Genre, Title,
+                            TitleGenre)
+from reviews.slugs import SlugAllocator
+from .references import reference_data
 
 from django.forms import ValidationError
 from rest_framework.validators import UniqueValidator
@@ -32,8 +41,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         request = self.context['request']
-        title_id = self.context.get('view').kwargs.get('title_id')
-        title = get_object_or_404(Title, id=title_id)
+        title = self.context['view'].get_title()
         if (
             request.method == 'POST'
             and Review.objects.filter(title=title,
@@ -59,6 +67,7 @@ class GenreSerializer(serializers.ModelSerializer):
     slug = serializers.RegexField(
         regex=PATTERN_SLUG,
         max_length=50,
+        required=False,
         validators=[
             UniqueValidator(queryset=Genre.objects.all()),
         ],
@@ -72,6 +81,13 @@ class GenreSerializer(serializers.ModelSerializer):
         }
         fields = ('name', 'slug')
 
+    def validate(self, attrs):
+        """Если slug не передан, он выдаётся по названию жанра."""
+        if 'slug' not in attrs and 'name' in attrs:
+            attrs['slug'] = SlugAllocator.for_name(
+                Genre, attrs['name']).allocate(attrs['name'])
+        return attrs
+
 
 class TitlesReadSerializer(serializers.ModelSerializer):
     genre = GenreSerializer(many=True, read_only=True)
@@ -84,65 +100,222 @@ class TitlesReadSerializer(serializers.ModelSerializer):
             'id', 'name', 'year', 'description', 'genre', 'category', 'rating']
 
 
+class BatchManyRelatedField(serializers.ManyRelatedField):
+    """
+    many=True для slug-полей: все slug списка разрешаются одним вызовом
+    `child_relation.resolve_many`, и об отсутствующих сообщается сразу
+    обо всех, а не об одном первом. Повторы в списке отбрасываются.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        slugs = list(dict.fromkeys(
+            self.child_relation.to_slug(item) for item in data))
+        found = self.child_relation.resolve_many(slugs)
+        missing = [slug for slug in slugs if slug not in found]
+        if missing:
+            raise serializers.ValidationError([
+                self.child_relation.error_messages['does_not_exist'].format(
+                    slug_name=self.child_relation.slug_field, value=slug)
+                for slug in missing
+            ])
+        return [found[slug] for slug in slugs]
+
+
+class BatchSlugRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField, который при many=True разрешает все slug одним
+    запросом `slug IN (...)`."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchManyRelatedField(**list_kwargs)
+
+    def to_slug(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        return data
+
+    def resolve_many(self, slugs):
+        """Словарь slug → объект для найденных slug."""
+        if not slugs:
+            return {}
+        return {
+            getattr(instance, self.slug_field): instance
+            for instance in self.get_queryset().filter(
+                **{f'{self.slug_field}__in': slugs})
+        }
+
+    def to_internal_value(self, data):
+        slug = self.to_slug(data)
+        instance = self.resolve_many([slug]).get(slug)
+        if instance is None:
+            self.fail('does_not_exist', slug_name=self.slug_field,
+                      value=slug)
+        return instance
+
+
+class ReferenceSlugRelatedField(BatchSlugRelatedField):
+    """BatchSlugRelatedField, который ищет объекты в снимке справочника
+    reference_data. Запрос к БД выполняется только для slug, которых
+    снимок не знает (например, запись в другом процессе ещё не дошла
+    до общего кэша версий)."""
+
+    def resolve_many(self, slugs):
+        found = reference_data.get(self.queryset.model).instances(slugs)
+        unknown = [slug for slug in slugs if slug not in found]
+        if unknown:
+            found.update(super().resolve_many(unknown))
+        return found
+
+
 class TitlesEditorSerializer(serializers.ModelSerializer):
-    genre = serializers.SlugRelatedField(
+    genre = ReferenceSlugRelatedField(
         slug_field='slug',
         queryset=Genre.objects.all(),
         many=True
     )
-    category = serializers.SlugRelatedField(
+    category = ReferenceSlugRelatedField(
         slug_field='slug',
         queryset=Category.objects.all()
     )
 
     class Meta:
         model = Title
-        fields = '__all__'
-
-
-class SignupUserSerializer(serializers.ModelSerializer):
-    username = serializers.RegexField(regex=PATTERN, max_length=150)
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
+
+    @transaction.atomic
+    def create(self, validated_data):
+        genres = validated_data.pop('genre', [])
+        title = super().create(validated_data)
+        set_title_genres(title, genres, created=True)
+        return title
+
+    def update(self, instance, validated_data):
+        genres = validated_data.pop('genre', None)
+        if genres is None:
+            return super().update(instance, validated_data)
+        with transaction.atomic():
+            title = super().update(instance, validated_data)
+            set_title_genres(title, genres)
+        return title
+
+
+def set_title_genres(title, genres, created=False):
+    """
+    Замена жанров произведения: лишние строки TitleGenre удаляются
+    одним DELETE, новые вставляются одним bulk_create. Для нового
+    произведения существующие строки не запрашиваются. Обработчики
+    m2m_changed (поисковый индекс, теги кэша) получают те же сигналы,
+    что и при title.genre.set(); поисковый индекс обновляется один раз,
+    а не на каждую удалённую строку.
+    """
+    wanted = {genre.pk for genre in genres}
+    current = set() if created else set(
+        TitleGenre.objects.filter(title=title).values_list(
+            'genre_id', flat=True))
+    with search.batch_indexing():
+        for action, pk_set in (('remove', current - wanted),
+                               ('add', wanted - current)):
+            if not pk_set:
+                continue
+            signal_kwargs = dict(
+                sender=TitleGenre, instance=title, reverse=False,
+                model=Genre, pk_set=pk_set, using=title._state.db)
+            m2m_changed.send(action=f'pre_{action}', **signal_kwargs)
+            if action == 'remove':
+                TitleGenre.objects.filter(
+                    title=title, genre_id__in=pk_set).delete()
+            else:
+                TitleGenre.objects.bulk_create(
+                    TitleGenre(title=title, genre_id=pk) for pk in pk_set)
+            m2m_changed.send(action=f'post_{action}', **signal_kwargs)
+    # Закэшированные через prefetch жанры устарели.
+    getattr(title, '_prefetched_objects_cache', {}).pop('genre', None)
+
+
+@lru_cache(maxsize=None)
+def signup_lookup_sql():
+    """SELECT пользователей по username или email.
+
+    Текст запроса строится один раз: разбор Q-фильтра ORM на каждой
+    регистрации обходится дороже самого запроса по двум индексам.
+    """
+    query = User.objects.filter(
+        Q(username='') | Q(email='')).only('pk', 'username', 'email')
+    sql, _ = query.query.sql_with_params()
+    return sql
+
+
+class SignupUserSerializer(serializers.Serializer):
+    # Оба поля объявлены явно, а create() свой, поэтому ModelSerializer
+    # только разбирал бы модель на каждом запросе.
     email = serializers.EmailField(max_length=254)
-
-    class Meta:
-        model = User
-        fields = ['email', 'username']
+    username = serializers.RegexField(regex=PATTERN, max_length=150)
 
     def validate_username(self, value):
         """Валидация поля username."""
-        if (User.objects.filter(username=value).exists()
-                and User.objects.get(username=value).email
-                != self.initial_data.get('email')):
-            raise serializers.ValidationError(
-                'username зарегистрированного пользователя'
-                'не соответствует email.'
-            )
         if 'me' == value:
             raise serializers.ValidationError(
                 'Имя me недоступно для пользователей'
             )
         return value
 
-    def validate_email(self, value):
-        """Валидация поля email."""
-        if (User.objects.filter(email=value).exists()
-                and User.objects.get(email=value).username
-                != self.initial_data.get('username')):
-            raise serializers.ValidationError(
-                'email зарегистрированного пользователя'
-                'не соответствует username.'
-            )
-        return value
-
-
-class TokenUserSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        """
+        Пользователи с этим username или email ищутся одним запросом;
+        повторная регистрация допустима, только если оба поля
+        принадлежат одному пользователю.
+        """
+        username, email = attrs['username'], attrs['email']
+        self.existing = None
+        errors = {}
+        for user in User.objects.raw(signup_lookup_sql(), [username, email]):
+            if user.username == username and user.email == email:
+                self.existing = user
+            elif user.username == username:
+                errors['username'] = [
+                    'username зарегистрированного пользователя'
+                    'не соответствует email.'
+                ]
+            else:
+                errors['email'] = [
+                    'email зарегистрированного пользователя'
+                    'не соответствует username.'
+                ]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Новый пользователь или уже зарегистрированный. Параллельную
+        регистрацию тех же данных ловят уникальные индексы, после чего
+        проверка повторяется по записанной строке.
+        """
+        if self.existing is not None:
+            return self.existing
+        try:
+            with transaction.atomic():
+                return User.objects.create(**validated_data)
+        except IntegrityError:
+            self.validate(validated_data)
+            if self.existing is None:
+                raise
+            return self.existing
+
+
+class TokenUserSerializer(serializers.Serializer):
     username = serializers.CharField(
         max_length=150,
     )
-
-    class Meta:
-        model = User
-        fields = ['confirmation_code', 'username']
+    confirmation_code = serializers.CharField(max_length=150)
 
 
 class UserSerializer(serializers.ModelSerializer):
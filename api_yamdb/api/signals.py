@@ -0,0 +1,130 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save)
+
+from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.signals import bulk_loaded
+
+from .authentication import USER_CLAIMS, USERS_AUTH_TAG, auth_tag
+from .cache import RESPONSE_TAG, bump, model_tag, object_tag
+
+TAGGED_MODELS = (
+    Category, Comment, Genre, Review, Title, Title.genre.through, User,
+)
+
+# Теги частей данных, которые затрагивает запись одного объекта.
+# Отзыв меняет рейтинг своего произведения, поэтому сбрасывает и его.
+INSTANCE_TAGS = {
+    Title: lambda title: [object_tag(Title, pk=title.pk)],
+    Title.genre.through: lambda pair: [object_tag(Title, pk=pair.title_id)],
+    Review: lambda review: [
+        object_tag(Review, title=review.title_id),
+        object_tag(Title, pk=review.title_id),
+    ],
+    Comment: lambda comment: [object_tag(Comment, review=comment.review_id)],
+}
+
+
+_collected = threading.local()
+
+
+def bump_on_commit(*tags):
+    """Версии увеличиваются после фиксации транзакции: иначе
+    параллельный запрос успел бы закэшировать ещё незафиксированное
+    состояние под новой версией. Вне транзакции — сразу."""
+    tags_in_block = getattr(_collected, 'tags', None)
+    if tags_in_block is not None:
+        tags_in_block.update(tags)
+        return
+    transaction.on_commit(partial(bump, *tags))
+
+
+@contextmanager
+def collected_bumps():
+    """Теги, сброшенные в блоке, сбрасываются на выходе из него одним
+    bump_on_commit, каждый по разу: удаление строк с post_delete на
+    каждую не увеличивает одну версию сотни раз."""
+    if getattr(_collected, 'tags', None) is not None:
+        yield
+        return
+    _collected.tags = set()
+    try:
+        yield
+        tags = _collected.tags
+    finally:
+        _collected.tags = None
+    if tags:
+        bump_on_commit(*sorted(tags))
+
+
+def bump_model_tag(sender, instance, **kwargs):
+    get_tags = INSTANCE_TAGS.get(sender)
+    bump_on_commit(
+        model_tag(sender), *(get_tags(instance) if get_tags else ()))
+
+
+def bump_title_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    tags = [model_tag(sender)]
+    if not reverse:
+        tags.append(object_tag(Title, pk=instance.pk))
+    elif pk_set:
+        tags += [object_tag(Title, pk=pk) for pk in pk_set]
+    else:
+        # genre.titles.clear(): какие произведения затронуты, неизвестно,
+        # а ответы с жанрами зависят от тега модели жанров.
+        tags.append(model_tag(Genre))
+    bump_on_commit(*tags)
+
+
+for model in TAGGED_MODELS:
+    post_save.connect(bump_model_tag, sender=model)
+    post_delete.connect(bump_model_tag, sender=model)
+m2m_changed.connect(bump_title_genres, sender=Title.genre.through)
+
+
+def bump_bulk_loaded(sender, models, **kwargs):
+    tags = [RESPONSE_TAG, *(model_tag(model) for model in models)]
+    if User in models:
+        # Поля пользователей могли измениться без сигналов post_save.
+        tags.append(USERS_AUTH_TAG)
+    bump_on_commit(*tags)
+
+
+bulk_loaded.connect(bump_bulk_loaded)
+
+
+def _auth_state(user):
+    # Отложенные поля не трогаем, чтобы не вызвать запрос.
+    if all(claim in user.__dict__ for claim in USER_CLAIMS):
+        return tuple(user.__dict__[claim] for claim in USER_CLAIMS)
+    return None
+
+
+def remember_auth_state(sender, instance, **kwargs):
+    instance._auth_state = _auth_state(instance)
+
+
+def bump_user_auth(sender, instance, created, **kwargs):
+    """Токены с прежними полями пользователя становятся устаревшими."""
+    state = _auth_state(instance)
+    # У нового пользователя токенов ещё нет: удаление прежнего владельца
+    # id уже сбросило тег, поэтому регистрация его не трогает.
+    if not created and (instance._auth_state is None or (
+            state != instance._auth_state)):
+        bump_on_commit(auth_tag(instance.pk))
+    instance._auth_state = state
+
+
+def bump_deleted_user_auth(sender, instance, **kwargs):
+    bump_on_commit(auth_tag(instance.pk))
+
+
+post_init.connect(remember_auth_state, sender=User)
+post_save.connect(bump_user_auth, sender=User)
+post_delete.connect(bump_deleted_user_auth, sender=User)
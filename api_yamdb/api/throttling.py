@@ -0,0 +1,142 @@
+"""Ограничение частоты запросов к эндпоинтам аутентификации.
+
+Скользящее окно: лимит из AUTH_THROTTLE_RATES (`10/min` — не больше 10
+запросов за любые 60 секунд) проверяется по счётчикам текущего и
+предыдущего окон периода, где вклад предыдущего окна убывает по мере
+сдвига: `prev * (1 - elapsed / period) + current`. Счётчики меняются
+только атомарными add и incr кэша THROTTLE_CACHE_ALIAS, поэтому
+одновременные запросы не теряют обновлений друг друга; проверка идёт
+до разбора данных сериализатором и без запросов к БД. Чтобы
+ограничение действовало на все процессы, кэш должен быть общим.
+
+Отклонённые запросы считаются в том же кэше по scope и отдаются
+`throttle_stats()`.
+"""
+import hashlib
+import time
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .cache import increment
+
+REJECTIONS_PREFIX = 'throttle-rejections:'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_throttle_cache():
+    return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+def record_rejection(scope):
+    increment(get_throttle_cache(), REJECTIONS_PREFIX + scope)
+
+
+def parse_rate(rate):
+    """`10/min` -> (10, 60): число запросов и период в секундах."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def throttle_stats():
+    """Настроенный лимит и число отклонённых запросов по scope."""
+    rates = settings.AUTH_THROTTLE_RATES
+    rejected = get_throttle_cache().get_many(
+        [REJECTIONS_PREFIX + scope for scope in rates])
+    return {
+        scope: {'rate': rate,
+                'rejected': rejected.get(REJECTIONS_PREFIX + scope, 0)}
+        for scope, rate in rates.items()
+    }
+
+
+def retry_after(limit, duration, elapsed, previous, current):
+    """Секунды до того, как оценка окна позволит ещё один запрос.
+
+    current — запросы текущего окна без отклонённого.
+    """
+    if current < limit:
+        # Достаточно, чтобы вклад предыдущего окна убыл.
+        return duration * (1 - (limit - 1 - current) / previous) - elapsed
+    # Текущее окно заполнено: ждём следующего, где оно станет
+    # предыдущим и начнёт убывать.
+    return duration - elapsed + duration * (1 - (limit - 1) / current)
+
+
+class SlidingWindowThrottle(BaseThrottle, ABC):
+    scope = None
+    timer = time.time
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    @abstractmethod
+    def get_keys(self, request, view):
+        """Значения, для каждого из которых ведётся своё окно."""
+
+    def allow_request(self, request, view):
+        rate = settings.AUTH_THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            return True
+        limit, duration = parse_rate(rate)
+        keys = [f'throttle:{self.scope}:{key}'
+                for key in self.get_keys(request, view)]
+        if not keys:
+            return True
+        cache = get_throttle_cache()
+        now = self.timer()
+        window, elapsed = divmod(now, duration)
+        weight = 1 - elapsed / duration
+        windows = [(f'{key}:{window:.0f}', f'{key}:{window - 1:.0f}')
+                   for key in keys]
+        previous = cache.get_many([key for _, key in windows])
+        counted = []
+        for current_key, previous_key in windows:
+            # Окно живёт два периода: следующее читает его как предыдущее.
+            count = increment(cache, current_key, timeout=2 * duration)
+            counted.append(current_key)
+            before = previous.get(previous_key, 0)
+            if before * weight + count > limit:
+                # Отклонённый запрос не расходует лимит.
+                for counted_key in counted:
+                    try:
+                        cache.decr(counted_key)
+                    except ValueError:
+                        pass
+                self.wait_seconds = retry_after(
+                    limit, duration, elapsed, before, count - 1)
+                record_rejection(self.scope)
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AuthIpThrottle(SlidingWindowThrottle):
+    """Окно на IP-адрес клиента (REMOTE_ADDR при NUM_PROXIES = 0)."""
+    scope = 'auth_ip'
+
+    def get_keys(self, request, view):
+        return [self.get_ident(request)]
+
+
+class AuthIdentityThrottle(SlidingWindowThrottle):
+    """Окна на username и на email из тела запроса: перебор кодов
+    одного пользователя с разных адресов упирается в общий лимит."""
+    scope = 'auth_identity'
+    fields = ('username', 'email')
+
+    def get_keys(self, request, view):
+        data = request.data if hasattr(request.data, 'get') else {}
+        keys = []
+        for field in self.fields:
+            value = data.get(field)
+            if isinstance(value, str) and value:
+                # Ключ кэша не должен зависеть от символов значения.
+                digest = hashlib.md5(
+                    value.strip().lower().encode()).hexdigest()
+                keys.append(f'{field}:{digest}')
+        return keys
@@ -11,6 +11,7 @@ from .views import (
     # UserUsernameViewSet,
     send_confirmation_code,
     send_token_jwt,
+    auth_throttle_stats,
     data_request_from_users_me,
     # CategoryAPIView,
 )
@@ -31,13 +32,14 @@ router_v1.register(
     CommentViewSet, basename='comments')
 
 auth_v1 = [
-    path('signup/', send_confirmation_code),
-    path('token/', send_token_jwt),
+    path('signup/', send_confirmation_code, name='signup'),
+    path('token/', send_token_jwt, name='token'),
+    path('throttles/', auth_throttle_stats, name='throttles'),
 ]
 
 
 urlpatterns = [
     path('v1/auth/', include(auth_v1)),
-    path('v1/users/me/', data_request_from_users_me),
+    path('v1/users/me/', data_request_from_users_me, name='users-me'),
     path('v1/', include(router_v1.urls)),
 ]
@@ -1,5 +1,6 @@
 import random
-from django.core.mail import send_mail
+
+from .outbox import enqueue
 
 
 def confirmation_code_generation():
@@ -16,13 +17,11 @@ def confirmation_code_generation():
 
 
 def send_confirmation_code_to_email(confirmation_code, email):
-    """Отправка пользователю на email confirmation_code."""
-    send_mail(
+    """Постановка в очередь письма с confirmation_code пользователю."""
+    enqueue(
+        email,
         'Код подтверждения для получения JWT токена.',
         f'confirmation_code: {confirmation_code}',
-        'from@example.com',  # Это поле "От кого"
-        [email],  # Это поле "Кому" (можно указать список адресов)
-        fail_silently=False,  # Сообщать об ошибках («молчать ли об ошибках?»)
     )
 
 
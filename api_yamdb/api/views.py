@@ -1,9 +1,16 @@
+from collections.abc import Iterator
+
 from django.shortcuts import get_object_or_404
-from django.db.models import Avg
 from rest_framework import viewsets, filters, permissions
-from reviews.models import Category, Review, Title, User, Genre
+from reviews.models import (Category, Comment, Review, Title, TitleGenre,
+                            User, Genre)
 from django_filters.rest_framework import DjangoFilterBackend
-from .mixins import ListCreateDestroyViewSet
+from .bulk import TitleBulkUpsert
+from .cache import object_tag
+from .cards import title_card_tags, title_cards
+from .mixins import (CachedListMixin, CachedResponseMixin,
+                     ListCreateDestroyViewSet, NestedParentMixin,
+                     ReferenceListMixin)
 from .serializers import (
     CategorySerializer,
     ReviewSerializer,
@@ -19,24 +26,30 @@ from .serializers import (
 )
 from rest_framework import status
 from .filters import TitleFilter
+from .pagination import CachedCountPagination, OptionalCursorPagination
+from .parsers import NdjsonParser
+from .throttling import (AuthIdentityThrottle, AuthIpThrottle,
+                         throttle_stats)
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
 )
-from rest_framework.pagination import PageNumberPagination
 from .permissions import (
     IsAuthorOrModerOrAdmin,
     AdminPermissions,
     IsAdminOrReadOnly,
 )
 
-from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       throttle_classes)
+from rest_framework.parsers import JSONParser
 
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import AccessToken
 
+from api.authentication import USER_FIELDS, ClaimsAccessToken
+from api.codes import get_code_store
 from api.util import (
-    confirmation_code_generation,
     send_confirmation_code_to_email,
     http_methods_disable,
 )
@@ -48,7 +61,7 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserUsernameSerializer
     lookup_field = 'username'
     permission_classes = (IsAuthenticated, AdminPermissions)
-    pagination_class = PageNumberPagination
+    pagination_class = CachedCountPagination
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username', )
 
@@ -60,6 +73,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthIpThrottle, AuthIdentityThrottle])
 def send_confirmation_code(request):
     """
     Обработка данных пользователя поступивших с api/v1/auth/signup/
@@ -67,18 +81,15 @@ def send_confirmation_code(request):
     """
     serializer = SignupUserSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    user, _ = User.objects.get_or_create(
-        username=serializer.validated_data.get('username'),
-        email=serializer.validated_data.get('email'),
-    )
-    user.confirmation_code = confirmation_code_generation()
-    user.save(update_fields=['confirmation_code'])
-    send_confirmation_code_to_email(user.confirmation_code, user.email)
+    user = serializer.save()
+    confirmation_code = get_code_store().issue(user.username)
+    send_confirmation_code_to_email(confirmation_code, user.email)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthIpThrottle, AuthIdentityThrottle])
 def send_token_jwt(request):
     """
     Обработка данных поступивших с api/v1/auth/token/
@@ -88,9 +99,10 @@ def send_token_jwt(request):
     serializer.is_valid(raise_exception=True)
     username = serializer.validated_data.get('username')
     confirmation_code = serializer.validated_data.get('confirmation_code')
-    user = get_object_or_404(User, username=username)
-    if user.confirmation_code == confirmation_code:
-        access_jwt_token = AccessToken.for_user(user)
+    user = get_object_or_404(
+        User.objects.only(*USER_FIELDS), username=username)
+    if get_code_store().verify(username, confirmation_code):
+        access_jwt_token = ClaimsAccessToken.for_user(user)
         return Response(
             f'token: {access_jwt_token}',
             status=status.HTTP_200_OK,
@@ -101,6 +113,13 @@ def send_token_jwt(request):
     )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, AdminPermissions])
+def auth_throttle_stats(request):
+    """Лимиты эндпоинтов аутентификации и число отклонённых запросов."""
+    return Response(throttle_stats(), status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated, ])
 def data_request_from_users_me(request):
@@ -123,24 +142,87 @@ def data_request_from_users_me(request):
     return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class CategoryViewSet(ListCreateDestroyViewSet):
+class CategoryViewSet(CachedListMixin, ReferenceListMixin,
+                      ListCreateDestroyViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (IsAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = CachedCountPagination
     filter_backends = (filters.SearchFilter,)
     search_fields = ("name",)
     lookup_field = "slug"
+    response_cache_models = (Category,)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     serializer_class = TitlesEditorSerializer
     queryset = Title.objects.select_related('category').prefetch_related(
-        'genre').annotate(rating=Avg('reviews__score'))
+        'genre').order_by('id')
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
-    pagination_class = PageNumberPagination
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('id',)
+    count_dependencies = (TitleGenre, Genre, Category)
+    response_cache_models = (Title, TitleGenre, Genre, Category, Review)
+    response_cache_coalesce = True
+    # Теги строятся из int(pk): `/titles/05/` и `/titles/5/` — одна запись.
+    lookup_value_regex = r'\d+'
+
+    def get_response_cache_tags(self):
+        if self.action == 'retrieve':
+            # Рейтинг и жанры одного произведения сбрасывают тег
+            # `reviews.title:pk=<id>`, а не весь список.
+            return title_card_tags(int(self.kwargs['pk']))
+        return super().get_response_cache_tags()
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.retrieve_card, request, *args, **kwargs)
+
+    def retrieve_card(self, request, *args, **kwargs):
+        """Детальный ответ из кэша карточек, в том числе для
+        авторизованных пользователей."""
+        card = title_cards.get_or_build(
+            int(self.kwargs['pk']),
+            lambda: self.get_serializer(self.get_object()).data)
+        return Response(card)
+
+    @action(detail=False, methods=['post'],
+            permission_classes=(AdminPermissions,),
+            parser_classes=(JSONParser, NdjsonParser))
+    def bulk(self, request):
+        """
+        Массовое создание и обновление произведений: JSON-массив или
+        NDJSON. Элемент с `id` существующего произведения обновляет его
+        (частично), остальные создаются. Ответ — результат по каждому
+        элементу и статистика.
+        """
+        try:
+            chunk_size = int(request.query_params.get(
+                'chunk_size', settings.TITLE_BULK_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = 0
+        if not 0 < chunk_size <= settings.TITLE_BULK_MAX_CHUNK_SIZE:
+            return Response(
+                {'chunk_size': [
+                    'Ожидается целое от 1 до '
+                    f'{settings.TITLE_BULK_MAX_CHUNK_SIZE}.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        items = request.data
+        # JSONParser отдаёт список, NdjsonParser — генератор; строка или
+        # число JSON разбирались бы по символам или не разбирались вовсе.
+        if not isinstance(items, (list, Iterator)):
+            return Response(
+                {'non_field_errors': [
+                    'Ожидается массив объектов или NDJSON.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        return Response(TitleBulkUpsert(chunk_size).run(items))
+
+    @action(detail=False, permission_classes=(AdminPermissions,))
+    def cards(self, request):
+        """Счётчики кэша карточек произведений в этом процессе."""
+        return Response(title_cards.stats())
 
     def get_serializer_class(self):
         if (
@@ -151,50 +233,54 @@ class TitleViewSet(viewsets.ModelViewSet):
         return TitlesEditorSerializer
 
 
-class GenreViewSet(ListCreateDestroyViewSet):
+class GenreViewSet(CachedListMixin, ReferenceListMixin,
+                   ListCreateDestroyViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = CachedCountPagination
     filter_backends = (filters.SearchFilter,)
     search_fields = ("name",)
     lookup_field = "slug"
+    response_cache_models = (Genre,)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(NestedParentMixin, CachedResponseMixin,
+                    viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthorOrModerOrAdmin,)
-    pagination_class = PageNumberPagination
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('-pub_date', '-id')
+    response_cache_coalesce = True
+
+    def get_response_cache_tags(self):
+        # Маршрут /reviews/ без title_id отвечает 404 из get_title().
+        return [object_tag(Review, title=int(self.kwargs.get('title_id', 0)))]
 
     def get_queryset(self):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        new_queryset = title.reviews.select_related(
-            'title', 'author').order_by('id')
-        return new_queryset
+        return self.get_title().reviews.select_related(
+            'author').order_by('id')
+
+    def get_list_count(self):
+        return self.get_title().review_count
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        serializer.save(author=self.request.user, title=self.get_title())
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(NestedParentMixin, CachedResponseMixin,
+                     viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorOrModerOrAdmin,)
-    pagination_class = PageNumberPagination
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('-pub_date', '-id')
+
+    def get_response_cache_tags(self):
+        return [object_tag(Comment, review=int(self.kwargs['review_id']))]
 
     def get_queryset(self):
-        review = get_object_or_404(
-            Review,
-            id=self.kwargs.get('review_id'),
-            title=self.kwargs.get('title_id')
-        )
-        new_queryset = review.comments.order_by('id')
-        return new_queryset
+        return self.get_review().comments.select_related(
+            'author').order_by('id')
 
     def perform_create(self, serializer):
-        review = get_object_or_404(
-            Review,
-            id=self.kwargs.get('review_id'),
-            title=self.kwargs.get('title_id')
-        )
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author=self.request.user, review=self.get_review())
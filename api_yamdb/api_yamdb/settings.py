@@ -15,6 +15,12 @@ SECRET_KEY = 'p&l%385148kslhtyn^##a1)ilz@4zqj=rq&agdol^##zgl9(vs'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Режим замеров производительности (бенчмарки, нагрузочные тесты).
+BENCH_MODE = os.getenv('YAMDB_BENCH_MODE') == '1'
+
+# Заголовки X-Query-Count/X-Query-Time-Ms (всегда включены при DEBUG).
+QUERY_COUNT_HEADERS = BENCH_MODE
+
 ALLOWED_HOSTS = ['*']
 
 
@@ -35,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,17 +106,92 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CachedCountPagination',
     'PAGE_SIZE': 5,
+    # Адрес клиента для лимитов — REMOTE_ADDR, а не присланный клиентом
+    # X-Forwarded-For; за N доверенными прокси указать N.
+    'NUM_PROXIES': 0,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий для процессов уровень кэша карточек произведений.
+    'title_cards': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'title_cards'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Общее для процессов состояние: версии тегов и счётчики пагинации.
+    # На нескольких машинах заменяется на Redis или Memcached.
+    'shared': {
+        'BACKEND': 'api.cache.DurableFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'shared'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Коды подтверждения и счётчики лимитов аутентификации: отдельный
+    # каталог, чтобы рост других кэшей их не вытеснял.
+    'auth': {
+        'BACKEND': 'api.cache.DurableFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'auth'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
+# Алиас кэша для счётчиков пагинации и версий тегов API; должен быть
+# общим для всех процессов, иначе запись в одном процессе не сбросит
+# кэши остальных.
+API_CACHE_ALIAS = 'shared'
+
+# Время жизни закэшированного `count` для фильтрованных списков, сек.
+COUNT_CACHE_TIMEOUT = 30
+
+# Алиас кэша для ответов анонимным пользователям (можно указать
+# отдельный бэкенд, например Redis) и время жизни ответа, сек.;
+# 0 отключает кэш ответов.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Для вьюсетов с response_cache_coalesce: сколько секунд после истечения
+# ответ ещё отдаётся, пока его пересчитывает один запрос, и коэффициент
+# вероятностного досрочного обновления (0 — только по сроку).
+RESPONSE_CACHE_STALE = 30
+RESPONSE_CACHE_EARLY_BETA = 1.0
+
+# Кэш карточек произведений: размер LFU в памяти процесса (байт), алиас
+# общего уровня и время жизни карточки в нём, сек.
+TITLE_CARD_LOCAL_BYTES = 8 * 1024 * 1024
+TITLE_CARD_CACHE_ALIAS = 'title_cards'
+TITLE_CARD_TIMEOUT = 3600
+
+# POST /api/v1/titles/bulk/: элементов в одной транзакции по умолчанию
+# и наибольшее значение параметра chunk_size.
+TITLE_BULK_CHUNK_SIZE = 500
+TITLE_BULK_MAX_CHUNK_SIZE = 2000
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=10),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Лимиты эндпоинтов аутентификации (api/throttling.py), скользящее
+# окно: на IP-адрес и на username/email из запроса; None или
+# отсутствие scope отключает лимит. Алиас кэша счётчиков должен
+# указывать на общий для процессов кэш с атомарным incr.
+AUTH_THROTTLE_RATES = {
+    'auth_ip': '60/min',
+    'auth_identity': '10/min',
+}
+THROTTLE_CACHE_ALIAS = 'auth'
+
+# Число пользователей в LRU процесса для токенов с устаревшими полями
+# (api/authentication.py) и время жизни записи, сек.
+JWT_USER_CACHE_SIZE = 1024
+JWT_USER_CACHE_TTL = 60
+
 
 # Internationalization
 
@@ -136,5 +218,29 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+DEFAULT_FROM_EMAIL = 'from@example.com'
+
+# Коды подтверждения (api/codes.py): класс хранилища, алиас кэша, общего
+# для всех процессов API, время жизни кода, сек., и число неверных
+# попыток, после которого код сбрасывается.
+CONFIRMATION_CODE_STORE = 'api.codes.CacheCodeStore'
+CONFIRMATION_CODE_CACHE_ALIAS = 'auth'
+CONFIRMATION_CODE_TTL = 3600
+CONFIRMATION_CODE_MAX_ATTEMPTS = 5
+
+# Очередь писем (api/outbox.py): кто отправляет письма — фоновый поток
+# процесса ('thread'), запрос после коммита ('eager') или только команда
+# send_emails ('command'); размер пачки на одно соединение с бэкендом;
+# аренда пачки обработчиком, сек.; задержка повтора после первой ошибки
+# и её предел, сек. (удваивается с каждой попыткой); число попыток;
+# период, с которым фоновый поток сам проверяет очередь, сек.
+EMAIL_OUTBOX_DELIVERY = 'thread'
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_LEASE = 300
+EMAIL_OUTBOX_RETRY_DELAY = 30
+EMAIL_OUTBOX_RETRY_MAX_DELAY = 3600
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_POLL_INTERVAL = 30
+
 PATTERN = r'^[\w.@+-]+\Z'
 PATTERN_SLUG = r'^[-a-zA-Z0-9_]+$'
@@ -48,6 +48,8 @@ class TitleAdmin(BaseAdmin):
         'year',
         'description',
         'category',
+        'rating',
+        'review_count',
     )
 
     search_fields = ('name',)
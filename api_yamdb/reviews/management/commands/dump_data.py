@@ -0,0 +1,87 @@
+import csv
+import gzip
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from reviews.management.loading import TABLES, format_value
+
+
+class Command(BaseCommand):
+    help = 'Dump tables to CSV files in the format accepted by load_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', type=str, help='Directory to write CSV files to'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Write gzip-compressed <table>.csv.gz files '
+                 '(readable by load_data --bulk)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Rows fetched from the database per round trip'
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=1,
+            help='Dump up to this many tables in parallel threads'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        os.makedirs(path, exist_ok=True)
+        started = time.perf_counter()
+        if options['jobs'] > 1:
+            with ThreadPoolExecutor(options['jobs']) as pool:
+                futures = [
+                    pool.submit(self.dump_in_thread, table, path, options)
+                    for table in TABLES
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            for table in TABLES:
+                self.dump_table(table, path, options)
+        self.stdout.write(self.style.SUCCESS(
+            f'всего: {time.perf_counter() - started:.2f} с'))
+
+    def dump_in_thread(self, table, path, options):
+        # У каждого потока своё соединение с базой, его нужно закрыть.
+        try:
+            return self.dump_table(table, path, options)
+        finally:
+            connection.close()
+
+    def dump_table(self, table, path, options):
+        file_path = os.path.join(path, table.file_name)
+        if options['gzip']:
+            file_path += '.gz'
+        fields = [column.field for column in table.columns]
+        rows = table.model._default_manager.order_by('pk').values_list(
+            *fields).iterator(chunk_size=options['chunk_size'])
+        started = time.perf_counter()
+        count = 0
+        # Файл появляется под своим именем только целиком записанным.
+        temporary = f'{file_path}.tmp'
+        opener = gzip.open if options['gzip'] else open
+        try:
+            with opener(temporary, 'wt', encoding='utf-8',
+                        newline='') as file:
+                writer = csv.writer(file, lineterminator='\n')
+                writer.writerow([column.column for column in table.columns])
+                for row in rows:
+                    writer.writerow([format_value(value) for value in row])
+                    count += 1
+        except OSError as error:
+            raise CommandError(f'{table.name}: {error}')
+        os.replace(temporary, file_path)
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{table.name}: {count} строк за {elapsed:.2f} с '
+            f'({rate:.0f} строк/с)'))
+        return count
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.management.generating import (CsvSink, DatabaseSink, Generator,
+                                           database_offsets, database_slugs,
+                                           generate)
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic users, titles, genres, reviews and comments '
+            'as load_data CSV files or straight into the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', type=str, nargs='?',
+            help='Directory to write CSV files to'
+        )
+        parser.add_argument(
+            '--insert', action='store_true',
+            help='Insert rows into the database instead of writing CSV'
+        )
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--titles', type=int, default=1000)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--categories', type=int, default=5)
+        parser.add_argument('--reviews', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Zipf exponent for title popularity and user activity'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Write gzip-compressed <table>.csv.gz files'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per insert batch with --insert'
+        )
+
+    def handle(self, *args, **options):
+        if options['insert'] == bool(options['path']):
+            raise CommandError('Укажите либо каталог для CSV, либо --insert')
+        if options['categories'] < 1 or options['genres'] < 1:
+            raise CommandError('Нужна хотя бы одна категория и один жанр')
+        if options['comments'] and not options['reviews']:
+            raise CommandError('Комментариям нужны отзывы')
+        if options['reviews'] > options['users'] * options['titles']:
+            raise CommandError(
+                'Отзывов больше, чем пар пользователь-произведение: '
+                'каждый пользователь пишет не больше одного отзыва '
+                'на произведение')
+
+        offsets = taken_slugs = None
+        if options['insert']:
+            offsets, taken_slugs = database_offsets(), database_slugs()
+            sink = DatabaseSink()
+        else:
+            sink = CsvSink(options['path'], compress=options['gzip'])
+        generator = Generator(
+            users=options['users'], titles=options['titles'],
+            genres=options['genres'], categories=options['categories'],
+            reviews=options['reviews'], comments=options['comments'],
+            seed=options['seed'], exponent=options['zipf'],
+            offsets=offsets, taken_slugs=taken_slugs,
+        )
+        generate(self, generator, sink, options['batch_size'])
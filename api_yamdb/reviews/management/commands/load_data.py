@@ -2,7 +2,7 @@ import csv
 import os
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.base import BaseCommand, CommandError
-from django.utils.text import slugify
+from reviews.management.loading import BulkLoader
 from reviews.models import (
     User,
     Category,
@@ -10,8 +10,11 @@ from reviews.models import (
     Title,
     Comment,
     Review,
+    RowCount,
     TitleGenre,
 )
+from reviews.signals import bulk_loaded
+from reviews.slugs import SlugAllocator
 from datetime import datetime
 
 
@@ -26,9 +29,51 @@ class Command(BaseCommand):
         parser.add_argument(
             'path', type=str, help='Path to the directory containing CSV files'
         )
+        parser.add_argument(
+            '--bulk', action='store_true',
+            help='Load tables in batches instead of row by row'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per batch and transaction in --bulk mode'
+        )
+        parser.add_argument(
+            '--checkpoint-dir', type=str, default=None,
+            help='Directory for resume checkpoints in --bulk mode '
+                 '(default: <path>/.load_data)'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore checkpoints and load every table from the start'
+        )
+        parser.add_argument(
+            '--preload-limit', type=int, default=100_000,
+            help='Keep ids of referenced tables up to this size in memory, '
+                 'query larger ones per batch'
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=1,
+            help='Worker processes that parse and validate CSV chunks '
+                 'in --bulk mode'
+        )
+        parser.add_argument(
+            '--progress-every', type=float, default=10,
+            help='Seconds between progress reports in --bulk mode'
+        )
 
     def handle(self, *args, **options):
         path = options['path']
+        if options['bulk']:
+            BulkLoader(
+                self, path, options['batch_size'],
+                checkpoint_dir=(options['checkpoint_dir']
+                                or os.path.join(path, '.load_data')),
+                restart=options['restart'],
+                preload_limit=options['preload_limit'],
+                progress_every=options['progress_every'],
+                jobs=options['jobs'],
+            ).load()
+            return
         self.load_category(path)
         self.load_genres(path)
         self.load_titles(path)
@@ -53,32 +98,26 @@ class Command(BaseCommand):
 
     def load_genres(self, path):
         genre_file = os.path.join(path, 'genre.csv')
+        slugs = dict(Genre.objects.values_list('name', 'slug'))
+        allocator = SlugAllocator(Genre, taken=slugs.values())
+        genres = []
         with open(genre_file, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for idx, row in enumerate(reader):
-                if idx == 0:
+            reader = csv.DictReader(file)
+            for row in reader:
+                name = row['name']
+                if name in slugs:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Genre "{name}" already exists '
+                        f'with slug "{slugs[name]}"'))
                     continue
-                name = row[1]
-                base_slug = slugify(name).lower()
-                slug = base_slug
-                counter = 1
-                while Genre.objects.filter(slug=slug).exists():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                genre, created = Genre.objects.get_or_create(
-                    name=name, defaults={'slug': slug})
-                if created:
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Genre "{genre.name}" created'
-                            'with slug "{genre.slug}"')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Genre "{genre.name}" already exists'
-                            'with slug "{genre.slug}"')
-                    )
+                slugs[name] = allocator.allocate(name, row.get('slug'))
+                genres.append(Genre(name=name, slug=slugs[name]))
+        Genre.objects.bulk_create(genres)
+        RowCount.add(Genre, len(genres))
+        bulk_loaded.send(sender=self.__class__, models=[Genre])
+        for genre in genres:
+            self.stdout.write(self.style.SUCCESS(
+                f'Genre "{genre.name}" created with slug "{genre.slug}"'))
 
     def load_titles(self, path):
         title_file = os.path.join(path, 'titles.csv')
@@ -0,0 +1,139 @@
+import json
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cards import title_cards
+from reviews.management.loadtesting import (BUCKETS_MS, SERVERS, LoadTest,
+                                            Scenarios, parse_mix)
+
+BAR_WIDTH = 40
+
+
+class Command(BaseCommand):
+    help = ('Serve the API locally and drive it with an open-loop mix of '
+            'anonymous browsing, review posting and comment threads')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server', choices=sorted(SERVERS), default='wsgi',
+            help='Serve api_yamdb.wsgi or api_yamdb.asgi (needs uvicorn)'
+        )
+        parser.add_argument(
+            '--url', type=str,
+            help='Load an already running server sharing this database '
+                 'instead of starting one'
+        )
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument(
+            '--port', type=int, default=0,
+            help='Port for the local server, 0 picks a free one'
+        )
+        parser.add_argument(
+            '--mix', type=str, default='browse=80,review=10,comments=10',
+            help='Scenario weights: browse, review, comments'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=20,
+            help='Scenario arrivals per second (Poisson)'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Seconds to keep scheduling arrivals'
+        )
+        parser.add_argument(
+            '--connections', type=int, default=20,
+            help='Keep-alive connections in the client pool'
+        )
+        parser.add_argument(
+            '--max-inflight', type=int, default=1000,
+            help='Arrivals beyond this many unfinished scenarios are '
+                 'dropped and reported'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=10,
+            help='Per-request timeout in seconds'
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Authenticated loadtest users posting reviews and comments'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--json', type=str,
+            help='Also write the report to this JSON file'
+        )
+
+    def handle(self, *args, **options):
+        if options['rate'] <= 0 or options['duration'] <= 0:
+            raise CommandError('--rate и --duration должны быть больше нуля')
+        if options['users'] < 1 or options['connections'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и соединение')
+        mix = parse_mix(options['mix'])
+        scenarios = Scenarios(options['users'], options['seed'])
+
+        server = None
+        if options['url']:
+            url = urlsplit(options['url'])
+            if url.scheme != 'http' or not url.hostname:
+                raise CommandError('--url должен быть вида http://host:port')
+            host, port = url.hostname, url.port or 80
+        else:
+            title_cards.reset()
+            server = SERVERS[options['server']](
+                options['host'], options['port'])
+            server.start()
+            host, port = server.address
+        self.stdout.write(
+            f'нагрузка на http://{host}:{port}: {options["rate"]:g} '
+            f'сценариев/с, {options["duration"]:g} с')
+        load = LoadTest(
+            host, port, scenarios, mix, rate=options['rate'],
+            duration=options['duration'],
+            connections=options['connections'],
+            max_inflight=options['max_inflight'],
+            timeout=options['timeout'], seed=options['seed'],
+        )
+        try:
+            load.run()
+        finally:
+            if server:
+                server.stop()
+        report = load.report()
+        if server:
+            # Счётчики процесса доступны, только если сервер в нём же.
+            report['title_cards'] = title_cards.stats()
+        self.print_report(report)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'запросов: {report["requests"]} за {report["duration"]:.2f} с '
+            f'({report["throughput"]:.1f} в с), сценариев запланировано '
+            f'{report["scheduled"]}, отброшено {report["dropped"]}')
+        self.stdout.write(
+            f'{"":>20} {"count":>7} {"errors":>7} {"p50":>8} {"p95":>8} '
+            f'{"p99":>8}')
+        for label, stats in report['labels'].items():
+            share = stats['errors'] / stats['count'] * 100
+            self.stdout.write(
+                f'{label:>20} {stats["count"]:7} {share:6.1f}% '
+                f'{stats.get("p50", 0):8.2f} {stats.get("p95", 0):8.2f} '
+                f'{stats.get("p99", 0):8.2f}')
+        self.stdout.write('задержки запросов, мс:')
+        counts = list(report['histogram'].values())
+        peak = max(counts) or 1
+        bounds = [f'<={bound}' for bound in BUCKETS_MS] + ['>5000']
+        for bound, count in zip(bounds, counts):
+            bar = '#' * round(count / peak * BAR_WIDTH)
+            self.stdout.write(f'{bound:>7} {count:7} {bar}')
+        if 'title_cards' in report:
+            self.stdout.write('карточки произведений: ' + ', '.join(
+                f'{name} {value}'
+                for name, value in report['title_cards'].items()))
+        for label, errors in report['errors'].items():
+            details = ', '.join(
+                f'{outcome}: {count}' for outcome, count in errors.items())
+            self.stdout.write(self.style.ERROR(f'{label}: {details}'))
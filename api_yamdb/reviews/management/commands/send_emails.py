@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.outbox import Outbox
+
+
+class Command(BaseCommand):
+    help = ('Send queued emails in batches, one backend connection per '
+            'batch; failed emails are retried with backoff')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Emails per backend connection '
+                 '(default EMAIL_OUTBOX_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the outbox instead of exiting once it '
+                 'has no due emails'
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            help='Seconds between polls with --loop '
+                 '(default EMAIL_OUTBOX_POLL_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        outbox = Outbox(options['batch_size'])
+        interval = options['interval'] or settings.EMAIL_OUTBOX_POLL_INTERVAL
+        while True:
+            sent, failed = outbox.drain()
+            if sent or failed or not options['loop']:
+                self.stdout.write(
+                    f'отправлено писем: {sent}, отложено: {failed}')
+            if not options['loop']:
+                return
+            time.sleep(interval)
@@ -0,0 +1,330 @@
+"""Генерация синтетических данных для нагрузочных проверок
+(`generate_data`).
+
+Распределения перекошены, как в жизни:
+- популярность произведений подчиняется закону Ципфа (вес
+  1 / rank ** s), так что небольшая доля произведений собирает
+  большинство отзывов;
+- число отзывов на пользователя тоже распределено по Ципфу: немногие
+  активные пользователи пишут отзывы на сотни произведений;
+- комментарии чаще достаются ранним (популярным) отзывам.
+
+Ограничения unique_title_author и unique_title_genre_pair соблюдаются
+по построению: отзывы генерируются по авторам, и у каждого автора
+произведения выбираются без повторов; жанры произведения выбираются
+через random.sample. Строки выдаются пачками, в памяти хранятся только
+веса выбора (по одному числу на произведение и пользователя), поэтому
+10 млн отзывов генерируются за минуты без роста памяти.
+
+Генерация детерминирована при одинаковом `seed`.
+"""
+import csv
+import gzip
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.db.models import Max
+
+from reviews.models import Category, Genre, User
+from reviews.slugs import SlugAllocator
+
+from .loading import (TABLES_BY_NAME, TableWriter, format_value,
+                      refresh_derived_data)
+
+GENRE_NAMES = (
+    'Драма', 'Комедия', 'Вестерн', 'Фэнтези', 'Фантастика', 'Детектив',
+    'Триллер', 'Сказка', 'Гонзо', 'Ужасы', 'Боевик', 'Мелодрама',
+    'Классика', 'Рок', 'Джаз', 'Шансон', 'Рок-н-ролл', 'Баллада',
+)
+CATEGORY_NAMES = ('Фильм', 'Книга', 'Музыка', 'Сериал', 'Игра')
+ADJECTIVES = (
+    'Тёмный', 'Последний', 'Белый', 'Тихий', 'Далёкий', 'Железный',
+    'Звёздный', 'Старый', 'Красный', 'Вечный', 'Северный', 'Забытый',
+)
+NOUNS = (
+    'лес', 'город', 'остров', 'берег', 'рассвет', 'путь', 'сад',
+    'маяк', 'ветер', 'дом', 'океан', 'поезд', 'замок', 'снег',
+)
+WORDS = (
+    'отличный', 'сюжет', 'скучно', 'актёры', 'музыка', 'финал',
+    'рекомендую', 'неожиданно', 'слабо', 'пересмотрю', 'атмосфера',
+    'герои', 'затянуто', 'шедевр', 'диалоги', 'концовка', 'смешно',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', '')
+LAST_NAMES = ('Иванов', 'Петрова', 'Смирнов', 'Кузнецова', 'Попов', '')
+# Оценки смещены к высоким, как на реальных сайтах.
+SCORE_WEIGHTS = (1, 1, 2, 2, 4, 6, 10, 14, 12, 8)
+ROLE_WEIGHTS = ((User.USER, 0.97), (User.MODERATOR, 0.02),
+                (User.ADMIN, 0.01))
+TEXT_POOL_SIZE = 1000
+DATE_FROM = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_weights(count, exponent):
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+class ZipfSampler:
+    """Выбор id из диапазона с вероятностью ~ 1 / rank ** exponent.
+
+    Ранги раздаются id в случайном порядке, чтобы популярность не
+    совпадала с порядком id.
+    """
+
+    def __init__(self, rng, ids, exponent):
+        self.rng = rng
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = list(
+            accumulate(zipf_weights(len(self.ids), exponent)))
+
+    def sample(self, count):
+        return self.rng.choices(
+            self.ids, cum_weights=self.cum_weights, k=count)
+
+    def distinct(self, count):
+        """`count` разных id; популярные выпадают чаще."""
+        if count > len(self.ids) // 2:
+            # Хвост распределения почти не выпадает, отбор был бы долгим.
+            return self.rng.sample(self.ids, count)
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.sample(count - len(chosen)))
+        return list(chosen)
+
+
+def split_by_zipf(total, count, exponent, cap):
+    """Разбиение total на count слагаемых не больше cap, пропорционально
+    весам Ципфа; остаток от округления и ограничения достаётся самым
+    активным."""
+    if total > count * cap:
+        raise ValueError(
+            f'{total} не разбить на {count} частей не больше {cap}')
+    weights = zipf_weights(count, exponent)
+    scale = total / sum(weights)
+    parts = [min(cap, int(weight * scale)) for weight in weights]
+    remaining = total - sum(parts)
+    for index in range(count):
+        if not remaining:
+            break
+        extra = min(cap - parts[index], remaining)
+        parts[index] += extra
+        remaining -= extra
+    return parts
+
+
+class Generator:
+    """Строки таблиц дампа в формате TABLES (значения по полям)."""
+
+    def __init__(self, users, titles, genres, categories, reviews, comments,
+                 seed=0, exponent=1.1, offsets=None, taken_slugs=None):
+        self.rng = random.Random(seed)
+        self.sizes = {
+            'users': users, 'titles': titles, 'genre': genres,
+            'category': categories, 'review': reviews,
+            'comments': comments,
+        }
+        self.exponent = exponent
+        self.offsets = offsets or {}
+        self.taken_slugs = taken_slugs or {}
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.texts = [
+            ' '.join(self.rng.choices(WORDS, k=self.rng.randint(3, 30)))
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def ids(self, table):
+        start = self.offsets.get(table, 0) + 1
+        return range(start, start + self.sizes[table])
+
+    def tables(self):
+        """Пары (имя таблицы, генератор строк) в порядке зависимостей."""
+        return [
+            ('category', self.categories()),
+            ('genre', self.genres()),
+            ('users', self.users()),
+            ('titles', self.titles()),
+            ('genre_title', self.genre_titles()),
+            ('review', self.reviews()),
+            ('comments', self.comments()),
+        ]
+
+    def date(self):
+        seconds = (self.now - DATE_FROM).total_seconds()
+        return DATE_FROM + timedelta(seconds=int(self.rng.random() * seconds))
+
+    def slugged(self, table, model, names):
+        allocator = SlugAllocator(
+            model, taken=self.taken_slugs.get(table, ()))
+        for index, object_id in enumerate(self.ids(table)):
+            name = names[index % len(names)]
+            if index >= len(names):
+                name = f'{name} {index // len(names) + 1}'
+            yield {'id': object_id, 'name': name,
+                   'slug': allocator.allocate(name)}
+
+    def categories(self):
+        return self.slugged('category', Category, CATEGORY_NAMES)
+
+    def genres(self):
+        return self.slugged('genre', Genre, GENRE_NAMES)
+
+    def users(self):
+        roles, weights = zip(*ROLE_WEIGHTS)
+        for user_id in self.ids('users'):
+            yield {
+                'id': user_id,
+                'username': f'user{user_id}',
+                'email': f'user{user_id}@yamdb.fake',
+                'role': self.rng.choices(roles, weights)[0],
+                'bio': '',
+                'first_name': self.rng.choice(FIRST_NAMES),
+                'last_name': self.rng.choice(LAST_NAMES),
+            }
+
+    def titles(self):
+        categories = ZipfSampler(self.rng, self.ids('category'), 1)
+        for title_id in self.ids('titles'):
+            yield {
+                'id': title_id,
+                'name': (f'{self.rng.choice(ADJECTIVES)} '
+                         f'{self.rng.choice(NOUNS)}'),
+                'year': self.rng.randint(1950, self.now.year),
+                'category_id': categories.sample(1)[0],
+                'description': self.rng.choice(self.texts),
+            }
+
+    def genre_titles(self):
+        genre_ids = list(self.ids('genre'))
+        pair_id = self.offsets.get('genre_title', 0)
+        for title_id in self.ids('titles'):
+            count = min(len(genre_ids), self.rng.choice((1, 1, 2, 2, 3)))
+            for genre_id in sorted(self.rng.sample(genre_ids, count)):
+                pair_id += 1
+                yield {'id': pair_id, 'title_id': title_id,
+                       'genre_id': genre_id}
+
+    def reviews(self):
+        titles = ZipfSampler(self.rng, self.ids('titles'), self.exponent)
+        authors = list(self.ids('users'))
+        self.rng.shuffle(authors)
+        counts = split_by_zipf(self.sizes['review'], len(authors),
+                               self.exponent, cap=self.sizes['titles'])
+        scores = range(1, 11)
+        score_weights = list(accumulate(SCORE_WEIGHTS))
+        review_id = self.offsets.get('review', 0)
+        for author_id, count in zip(authors, counts):
+            title_ids = titles.distinct(count)
+            author_scores = self.rng.choices(
+                scores, cum_weights=score_weights, k=count)
+            texts = self.rng.choices(self.texts, k=count)
+            for title_id, score, text in zip(title_ids, author_scores, texts):
+                review_id += 1
+                yield {
+                    'id': review_id,
+                    'title_id': title_id,
+                    'text': text,
+                    'author_id': author_id,
+                    'score': score,
+                    'pub_date': self.date(),
+                }
+
+    def comments(self):
+        authors = ZipfSampler(self.rng, self.ids('users'), self.exponent)
+        first_review = self.offsets.get('review', 0) + 1
+        reviews = self.sizes['review']
+        for comment_id in self.ids('comments'):
+            # Степенное преобразование: ранние отзывы комментируют чаще,
+            # без массива весов на каждый из миллионов отзывов.
+            offset = int(reviews * self.rng.random() ** 3)
+            yield {
+                'id': comment_id,
+                'review_id': first_review + offset,
+                'text': self.rng.choice(self.texts),
+                'author_id': authors.sample(1)[0],
+                'pub_date': self.date(),
+            }
+
+
+class CsvSink:
+    """Запись в CSV-файлы в формате load_data."""
+
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.compress = compress
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, table, rows, batch_size):
+        file_path = os.path.join(self.path, table.file_name)
+        opener = open
+        if self.compress:
+            file_path += '.gz'
+            opener = gzip.open
+        count = 0
+        with opener(file_path, 'wt', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow([column.column for column in table.columns])
+            for row in rows:
+                writer.writerow([format_value(row[column.field])
+                                 for column in table.columns])
+                count += 1
+        return count
+
+    def close(self):
+        pass
+
+
+class DatabaseSink:
+    """Вставка напрямую в базу пачками, как в `load_data --bulk`.
+
+    Возвращает число реально вставленных строк: дубликаты, пропущенные
+    INSERT по уникальности, не считаются.
+    """
+
+    def write(self, table, rows, batch_size):
+        writer = TableWriter(table)
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(writer.row(row))
+            if len(batch) >= batch_size:
+                count += writer.write(batch, existing=())
+                batch = []
+        if batch:
+            count += writer.write(batch, existing=())
+        return count
+
+    def close(self):
+        refresh_derived_data(
+            [table.model for table in TABLES_BY_NAME.values()])
+
+
+def database_offsets():
+    """Максимальные id таблиц, чтобы новые строки шли после них."""
+    return {
+        name: table.model._default_manager.aggregate(
+            max_id=Max('pk'))['max_id'] or 0
+        for name, table in TABLES_BY_NAME.items()
+    }
+
+
+def database_slugs():
+    return {
+        'category': Category.objects.values_list('slug', flat=True),
+        'genre': Genre.objects.values_list('slug', flat=True),
+    }
+
+
+def generate(command, generator, sink, batch_size):
+    for name, rows in generator.tables():
+        started = time.perf_counter()
+        count = sink.write(TABLES_BY_NAME[name], rows, batch_size)
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        command.stdout.write(command.style.SUCCESS(
+            f'{name}: {count} строк за {elapsed:.2f} с '
+            f'({rate:.0f} строк/с)'))
+    sink.close()
@@ -0,0 +1,685 @@
+"""Массовая загрузка CSV-дампов (`load_data --bulk`).
+
+Каждая таблица проходит потоковый конвейер
+`чтение → проверка → пачки → запись`, собранный из генераторов, поэтому
+в памяти одновременно находится не больше одной пачки строк:
+- строки читаются из файла по одной, позиция в байтах даёт прогресс и
+  оценку оставшегося времени;
+- внешние ключи проверяются по множествам id в памяти, если таблица,
+  на которую ссылаются, не больше `preload_limit` строк, иначе одним
+  запросом IN на пачку;
+- пачка пишется в отдельной транзакции: новые строки одним executemany
+  с INSERT, пропускающим конфликты (как bulk_create с ignore_conflicts,
+  но без построения моделей и SQL на каждую строку), строки с уже
+  существующим id — executemany с UPDATE (в Django 3.2 у bulk_create
+  ещё нет update_conflicts);
+- после каждой пачки в каталог контрольных точек пишется позиция в
+  файле, и прерванная загрузка продолжается с последней записанной
+  пачки, а не с начала;
+- после загрузки пересчитываются рейтинги, поисковый индекс и
+  счётчики строк, которые обычно поддерживают сигналы.
+
+С `jobs` > 1 преобразование и проверка строк выполняются в пуле
+процессов: главный процесс читает CSV и раздаёт пачки, а записывает их
+он же, единственным писателем, так что SQLite не упирается в
+блокировки. Таблицы обходятся по уровням DAG зависимостей (категории,
+жанры и пользователи ни от чего не зависят), и пока пишется одна
+таблица, пул уже готовит пачки следующих.
+"""
+import csv
+import gzip
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import django
+from django.core.management.base import CommandError
+from django.db import connection, models, transaction
+from django.utils.dateparse import parse_datetime
+
+from reviews import search
+from reviews.models import (Category, Comment, Genre, Review, RowCount, Title,
+                            TitleGenre, User)
+from reviews.signals import COUNTED_MODELS, bulk_loaded
+
+REQUIRED = object()
+MAX_REPORTED_ERRORS = 10
+# Меньше ограничения SQLite в 999 параметров на запрос.
+LOOKUP_CHUNK_SIZE = 900
+
+
+def format_value(value):
+    """Значение для CSV в том виде, в котором его принимает load_data."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return f'{value.isoformat()}Z'
+    return value
+
+
+def refresh_derived_data(models):
+    """Пересчёт данных, которые обычно поддерживают сигналы моделей:
+    рейтингов, поискового индекса и счётчиков строк."""
+    Title.objects.refresh_rating()
+    search.rebuild_index()
+    for model in COUNTED_MODELS:
+        RowCount.refresh(model)
+    bulk_loaded.send(sender=refresh_derived_data, models=models)
+
+
+def to_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'неверная дата "{value}"')
+    return parsed
+
+
+def to_score(value):
+    score = int(value)
+    if not 1 <= score <= 10:
+        raise ValueError(f'оценка {score} вне диапазона 1..10')
+    return score
+
+
+def to_role(value):
+    if value not in dict(User.ROLE_CHOICES):
+        raise ValueError(f'неизвестная роль "{value}"')
+    return value
+
+
+@dataclass
+class Column:
+    field: str
+    column: str
+    convert: callable = str
+    default: object = REQUIRED
+
+
+@dataclass
+class Table:
+    """Описание CSV-файла дампа и модели, в которую он загружается."""
+    name: str
+    file_name: str
+    model: type
+    columns: tuple
+    references: dict = field(default_factory=dict)
+
+    def convert(self, row):
+        values = {}
+        for column in self.columns:
+            raw = row.get(column.column)
+            if raw is None:
+                if column.default is REQUIRED:
+                    raise ValueError(f'нет столбца "{column.column}"')
+                values[column.field] = column.default
+                continue
+            values[column.field] = column.convert(raw)
+        return values
+
+
+TABLES = (
+    Table('category', 'category.csv', Category, (
+        Column('id', 'id', int),
+        Column('name', 'name'),
+        Column('slug', 'slug'),
+    )),
+    Table('genre', 'genre.csv', Genre, (
+        Column('id', 'id', int),
+        Column('name', 'name'),
+        Column('slug', 'slug'),
+    )),
+    Table('titles', 'titles.csv', Title, (
+        Column('id', 'id', int),
+        Column('name', 'name'),
+        Column('year', 'year', int),
+        Column('category_id', 'category', int),
+        Column('description', 'description', default=''),
+    ), references={'category_id': Category}),
+    Table('genre_title', 'genre_title.csv', TitleGenre, (
+        Column('id', 'id', int),
+        Column('title_id', 'title_id', int),
+        Column('genre_id', 'genre_id', int),
+    ), references={'title_id': Title, 'genre_id': Genre}),
+    Table('users', 'users.csv', User, (
+        Column('id', 'id', int),
+        Column('username', 'username'),
+        Column('email', 'email'),
+        Column('role', 'role', to_role),
+        Column('bio', 'bio', default=''),
+        Column('first_name', 'first_name', default=''),
+        Column('last_name', 'last_name', default=''),
+    )),
+    Table('review', 'review.csv', Review, (
+        Column('id', 'id', int),
+        Column('title_id', 'title_id', int),
+        Column('text', 'text'),
+        Column('author_id', 'author', int),
+        Column('score', 'score', to_score),
+        Column('pub_date', 'pub_date', to_datetime),
+    ), references={'title_id': Title, 'author_id': User}),
+    Table('comments', 'comments.csv', Comment, (
+        Column('id', 'id', int),
+        Column('review_id', 'review_id', int),
+        Column('text', 'text'),
+        Column('author_id', 'author', int),
+        Column('pub_date', 'pub_date', to_datetime),
+    ), references={'review_id': Review, 'author_id': User}),
+)
+
+
+class TableWriter:
+    """Подготовленные INSERT и UPDATE для таблицы модели.
+
+    Значения из дампа пишутся как есть (включая pub_date, который при
+    сохранении через ORM перезаписал бы auto_now_add); адаптация нужна
+    только датам.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        meta = table.model._meta
+        self.fields = [column.field for column in table.columns]
+        model_fields = [meta.get_field(name) for name in self.fields]
+        self.adapters = [
+            (index, connection.ops.adapt_datetimefield_value)
+            for index, model_field in enumerate(model_fields)
+            if isinstance(model_field, models.DateTimeField)
+        ]
+        # Столбцы, которых нет в дампе, получают значения по умолчанию
+        # модели, как при bulk_create.
+        defaults = [
+            model_field for model_field in meta.concrete_fields
+            if model_field.attname not in self.fields
+        ]
+        self.defaults = [
+            model_field.get_db_prep_save(model_field.get_default(), connection)
+            for model_field in defaults
+        ]
+        quote = connection.ops.quote_name
+        db_table = quote(meta.db_table)
+        columns = [quote(model_field.column) for model_field in model_fields]
+        inserted = columns + [
+            quote(model_field.column) for model_field in defaults]
+        placeholders = ', '.join(['%s'] * len(inserted))
+        self.insert_sql = (
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{db_table} ({", ".join(inserted)}) VALUES ({placeholders}) '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}'
+        )
+        self.update_sql = (
+            f'UPDATE {db_table} SET '
+            + ', '.join(f'{column} = %s' for column in columns[1:])
+            + f' WHERE {columns[0]} = %s'
+        )
+
+    def row(self, values):
+        row = [values[name] for name in self.fields]
+        for index, adapt in self.adapters:
+            row[index] = adapt(row[index])
+        return row
+
+    def write(self, rows, existing):
+        """Запись пачки; возвращает число записанных строк.
+
+        INSERT молча пропускает строки, нарушающие уникальность
+        (например, второй отзыв автора на произведение), поэтому
+        записанные строки считаются по rowcount, а не по размеру пачки.
+        """
+        new = [row + self.defaults for row in rows if row[0] not in existing]
+        old = [row[1:] + row[:1] for row in rows if row[0] in existing]
+        written = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            if new:
+                cursor.executemany(self.insert_sql, new)
+                written += cursor.rowcount
+            if old:
+                cursor.executemany(self.update_sql, old)
+                written += cursor.rowcount
+        return written
+
+
+class IdLookup:
+    """Проверка существования id объектов модели.
+
+    Небольшие таблицы загружаются в память целиком, для остальных
+    существующие id выбираются запросом по значениям из пачки, так что
+    память не растёт вместе с таблицей.
+    """
+
+    def __init__(self, model, preload_limit):
+        self.model = model
+        self.ids = None
+        if preload_limit and model.objects.count() <= preload_limit:
+            self.ids = set(model.objects.values_list('pk', flat=True))
+
+    def existing(self, ids):
+        ids = set(ids)
+        if self.ids is not None:
+            return ids & self.ids
+        ids = list(ids)
+        found = set()
+        for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+            found.update(self.model.objects.filter(
+                pk__in=ids[start:start + LOOKUP_CHUNK_SIZE]
+            ).values_list('pk', flat=True))
+        return found
+
+
+class Checkpoint:
+    """Контрольная точка загрузки таблицы: файл `<таблица>.json`.
+
+    Хранит позицию в CSV-файле сразу после последней записанной пачки.
+    Если CSV-файл с тех пор изменился (размер или время изменения),
+    контрольная точка игнорируется.
+    """
+
+    def __init__(self, directory, table, file_path):
+        self.path = None
+        if directory:
+            self.path = os.path.join(directory, f'{table.name}.json')
+        stat = os.stat(file_path)
+        self.source = [stat.st_size, stat.st_mtime_ns]
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('source') != self.source:
+            return None
+        return state
+
+    def save(self, **state):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'source': self.source, **state}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """Периодический вывод скорости и оставшегося времени загрузки.
+
+    Для сжатых файлов размер неизвестен (`size` равен None), и выводится
+    только скорость.
+    """
+
+    def __init__(self, command, table, size, position, interval):
+        self.command = command
+        self.table = table
+        self.size = size
+        self.start_position = position
+        self.interval = interval
+        self.started = self.reported = time.perf_counter()
+
+    def update(self, rows, position):
+        now = time.perf_counter()
+        if not self.interval or now - self.reported < self.interval:
+            return
+        self.reported = now
+        elapsed = now - self.started
+        read = position - self.start_position
+        rate = rows / elapsed if elapsed else 0
+        if self.size is None:
+            self.command.stdout.write(
+                f'{self.table.name}: {rows} строк, {rate:.0f} строк/с')
+            return
+        eta = (self.size - position) * elapsed / read if read else 0
+        self.command.stdout.write(
+            f'{self.table.name}: {rows} строк, '
+            f'{100 * position / self.size:.1f}%, {rate:.0f} строк/с, '
+            f'осталось ~{eta:.0f} с')
+
+
+class CsvStream:
+    """Записи CSV-файла, открытого в двоичном режиме.
+
+    Считает позицию в байтах после последней прочитанной записи, чтобы
+    контрольная точка могла вернуться к ней через `seek`.
+    """
+
+    def __init__(self, file, position=0, line_num=0):
+        header = file.readline()
+        self.fieldnames = next(csv.reader([header.decode('utf-8')]))
+        self.position = len(header)
+        self.line_base = line_num or 1
+        if position:
+            file.seek(position)
+            self.position = position
+        self.file = file
+        self.reader = csv.reader(self.lines())
+
+    def lines(self):
+        for line in self.file:
+            self.position += len(line)
+            yield line.decode('utf-8')
+
+    @property
+    def line_num(self):
+        return self.line_base + self.reader.line_num
+
+    def __iter__(self):
+        for values in self.reader:
+            if values:
+                yield self.line_num, values
+
+
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+
+@lru_cache(maxsize=None)
+def get_writer(table_name):
+    return TableWriter(TABLES_BY_NAME[table_name])
+
+
+def validate_chunk(table_name, fieldnames, records):
+    """Преобразование пачки записей CSV в строки для записи.
+
+    Не обращается к базе, поэтому выполняется и в процессах пула.
+    Возвращает строки, ошибки и затраченное время.
+    """
+    started = time.perf_counter()
+    table = TABLES_BY_NAME[table_name]
+    writer = get_writer(table_name)
+    rows, errors = [], []
+    for line_num, values in records:
+        try:
+            row = table.convert(dict(zip(fieldnames, values)))
+            rows.append((line_num, writer.row(row)))
+        except (TypeError, ValueError) as error:
+            errors.append((line_num, str(error)))
+    return rows, errors, time.perf_counter() - started
+
+
+def dependency_levels(tables):
+    """Уровни DAG зависимостей таблиц.
+
+    Таблица попадает на уровень после всех таблиц, на модели которых
+    ссылается; таблицы одного уровня друг от друга не зависят.
+    """
+    names = {table.model: table.name for table in tables}
+    dependencies = {
+        table.name: {names[model] for model in table.references.values()
+                     if model in names}
+        for table in tables
+    }
+    levels, placed = [], set()
+    while len(placed) < len(tables):
+        level = [
+            table for table in tables
+            if table.name not in placed
+            and dependencies[table.name] <= placed
+        ]
+        if not level:
+            raise CommandError('Циклическая зависимость между таблицами')
+        placed.update(table.name for table in level)
+        levels.append(level)
+    return levels
+
+
+@dataclass
+class Chunk:
+    """Пачка записей таблицы; `records` равно None в конце таблицы."""
+    load: 'TableLoad'
+    fieldnames: list
+    records: list
+    position: int
+    line_num: int
+
+
+class TableLoad:
+    """Загрузка одной таблицы: чтение пачек, запись, контрольная точка,
+    счётчики и время стадий конвейера."""
+
+    def __init__(self, loader, table, level):
+        self.loader = loader
+        self.command = loader.command
+        self.table = table
+        self.level = level
+        self.file_path = os.path.join(loader.path, table.file_name)
+        if not os.path.exists(self.file_path):
+            # Дамп из `dump_data --gzip`.
+            compressed = f'{self.file_path}.gz'
+            if os.path.exists(compressed):
+                self.file_path = compressed
+        self.checkpoint = None
+        self.writer = TableWriter(table)
+        self.loaded = self.skipped = self.conflicts = 0
+        self.timings = {'чтение': 0, 'проверка': 0, 'запись': 0}
+        self.started = self.finished = None
+
+    def chunks(self):
+        """Стадия чтения: пачки записей CSV-файла."""
+        if not os.path.exists(self.file_path):
+            self.command.stderr.write(self.command.style.WARNING(
+                f'{self.table.name}: файл "{self.file_path}" не найден, '
+                'пропускаю'))
+            return
+        self.checkpoint = Checkpoint(
+            self.loader.checkpoint_dir, self.table, self.file_path)
+        state = None if self.loader.restart else self.checkpoint.load()
+        self.state = state or {'position': 0, 'line': 0, 'loaded': 0,
+                               'skipped': 0, 'conflicts': 0, 'done': False}
+        if self.state['done']:
+            self.command.stdout.write(
+                f'{self.table.name}: уже загружена, пропускаю')
+            return
+        if self.state['position']:
+            self.command.stdout.write(
+                f'{self.table.name}: продолжаю со строки '
+                f'{self.state["line"] + 1}')
+
+        compressed = self.file_path.endswith('.gz')
+        with (gzip.open if compressed else open)(self.file_path, 'rb') as file:
+            reader = CsvStream(file, self.state['position'],
+                               self.state['line'])
+            size = None if compressed else os.path.getsize(self.file_path)
+            self.progress = Progress(
+                self.command, self.table, size, reader.position,
+                self.loader.progress_every)
+            records = []
+            started = time.perf_counter()
+            for record in reader:
+                records.append(record)
+                if len(records) < self.loader.batch_size:
+                    continue
+                self.timings['чтение'] += time.perf_counter() - started
+                yield Chunk(self, reader.fieldnames, records,
+                            reader.position, reader.line_num)
+                records = []
+                started = time.perf_counter()
+            self.timings['чтение'] += time.perf_counter() - started
+            if records:
+                yield Chunk(self, reader.fieldnames, records,
+                            reader.position, reader.line_num)
+            yield Chunk(self, reader.fieldnames, None,
+                        reader.position, reader.line_num)
+
+    def start(self):
+        """Начало записи: все таблицы, от которых зависит эта, записаны."""
+        self.started = time.perf_counter()
+        self.existing = IdLookup(self.table.model, preload_limit=0)
+        self.references = {
+            field_name: IdLookup(model, self.loader.preload_limit)
+            for field_name, model in self.table.references.items()
+        }
+
+    def write(self, chunk, rows, errors):
+        """Стадия записи: проверка ссылок и запись пачки."""
+        started = time.perf_counter()
+        for line_num, error in errors:
+            self.skip(line_num, error)
+        rows = self.check_references(rows)
+        written = self.writer.write(
+            [row for _, row in rows],
+            self.existing.existing(row[0] for _, row in rows))
+        self.loaded += written
+        self.conflicts += len(rows) - written
+        self.save(chunk, done=False)
+        self.timings['запись'] += time.perf_counter() - started
+        self.progress.update(self.loaded, chunk.position)
+
+    def finish(self, chunk):
+        self.save(chunk, done=True)
+        self.finished = time.perf_counter()
+        self.report()
+
+    def check_references(self, rows):
+        fields = [column.field for column in self.table.columns]
+        for field_name, lookup in self.references.items():
+            index = fields.index(field_name)
+            found = lookup.existing(row[index] for _, row in rows)
+            valid = []
+            for line_num, row in rows:
+                if row[index] in found:
+                    valid.append((line_num, row))
+                else:
+                    self.skip(line_num, f'{lookup.model.__name__} с id '
+                                        f'{row[index]} не найден')
+            rows = valid
+        return rows
+
+    def save(self, chunk, done):
+        self.checkpoint.save(
+            position=chunk.position, line=chunk.line_num,
+            loaded=self.state['loaded'] + self.loaded,
+            skipped=self.state['skipped'] + self.skipped,
+            conflicts=self.state.get('conflicts', 0) + self.conflicts,
+            done=done)
+
+    def skip(self, line_num, error):
+        self.skipped += 1
+        if self.skipped <= MAX_REPORTED_ERRORS:
+            self.command.stderr.write(self.command.style.ERROR(
+                f'{self.table.name}, строка {line_num}: {error}'))
+        elif self.skipped == MAX_REPORTED_ERRORS + 1:
+            self.command.stderr.write(self.command.style.ERROR(
+                f'{self.table.name}: дальнейшие ошибки не выводятся'))
+
+    def report(self):
+        elapsed = self.finished - self.started
+        rate = self.loaded / elapsed if elapsed else 0
+        stages = ', '.join(
+            f'{stage} {seconds:.2f} с'
+            for stage, seconds in self.timings.items())
+        self.command.stdout.write(self.command.style.SUCCESS(
+            f'{self.table.name}: {self.loaded} строк за {elapsed:.2f} с '
+            f'({rate:.0f} строк/с), пропущено {self.skipped}, '
+            f'конфликтов уникальности {self.conflicts} ({stages})'))
+
+
+class BulkLoader:
+    def __init__(self, command, path, batch_size, checkpoint_dir=None,
+                 restart=False, preload_limit=100_000, progress_every=10,
+                 jobs=1):
+        self.command = command
+        self.path = path
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.restart = restart
+        self.preload_limit = preload_limit
+        self.progress_every = progress_every
+        self.jobs = jobs
+
+    def load(self):
+        started = time.perf_counter()
+        levels = dependency_levels(TABLES)
+        loads = [
+            TableLoad(self, table, level)
+            for level, tables in enumerate(levels) for table in tables
+        ]
+        chunks = (chunk for load in loads for chunk in load.chunks())
+        pool = (ProcessPoolExecutor(self.jobs, initializer=django.setup)
+                if self.jobs > 1 else nullcontext())
+        with pool:
+            for chunk, (rows, errors, elapsed) in self.validate(
+                    chunks, pool):
+                load = chunk.load
+                if load.started is None:
+                    load.start()
+                load.timings['проверка'] += elapsed
+                if chunk.records is None:
+                    load.finish(chunk)
+                else:
+                    load.write(chunk, rows, errors)
+        self.report_levels(levels, loads)
+
+        finish_started = time.perf_counter()
+        self.finish()
+        for load in loads:
+            if load.checkpoint is not None:
+                load.checkpoint.clear()
+        if self.checkpoint_dir and os.path.isdir(self.checkpoint_dir):
+            if not os.listdir(self.checkpoint_dir):
+                os.rmdir(self.checkpoint_dir)
+        self.command.stdout.write(
+            f'пересчёт рейтингов, индекса и счётчиков: '
+            f'{time.perf_counter() - finish_started:.2f} с')
+        self.command.stdout.write(self.command.style.SUCCESS(
+            f'всего: {time.perf_counter() - started:.2f} с'))
+
+    def validate(self, chunks, pool):
+        """Стадия проверки: в этом процессе или в пуле.
+
+        В пул отправляется не больше 2 * jobs пачек вперёд, так что
+        память ограничена и при параллельной проверке.
+        """
+        if self.jobs <= 1:
+            for chunk in chunks:
+                yield chunk, self.validate_chunk(chunk)
+            return
+        pending = deque()
+        for chunk in chunks:
+            future = None
+            if chunk.records is not None:
+                future = pool.submit(
+                    validate_chunk, chunk.load.table.name,
+                    chunk.fieldnames, chunk.records)
+            pending.append((chunk, future))
+            if len(pending) > 2 * self.jobs:
+                yield self.result(*pending.popleft())
+        while pending:
+            yield self.result(*pending.popleft())
+
+    @staticmethod
+    def validate_chunk(chunk):
+        if chunk.records is None:
+            return [], [], 0
+        return validate_chunk(
+            chunk.load.table.name, chunk.fieldnames, chunk.records)
+
+    @staticmethod
+    def result(chunk, future):
+        if future is None:
+            return chunk, ([], [], 0)
+        return chunk, future.result()
+
+    def finish(self):
+        refresh_derived_data([table.model for table in TABLES])
+
+    def report_levels(self, levels, loads):
+        for level, tables in enumerate(levels):
+            level_loads = [
+                load for load in loads
+                if load.level == level and load.started is not None]
+            if not level_loads:
+                continue
+            elapsed = (max(load.finished for load in level_loads)
+                       - min(load.started for load in level_loads))
+            names = ', '.join(table.name for table in tables)
+            self.command.stdout.write(
+                f'уровень {level} ({names}): {elapsed:.2f} с')
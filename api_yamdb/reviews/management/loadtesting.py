@@ -0,0 +1,417 @@
+"""Нагрузочное тестирование API по HTTP (`loadtest`).
+
+Приложение из api_yamdb/wsgi.py (или asgi.py под uvicorn, если он
+установлен) запускается в фоновом потоке на локальном порту, либо
+нагрузка подаётся на уже запущенный сервер по `--url`. Клиент написан
+на asyncio из стандартной библиотеки и держит пул keep-alive
+соединений.
+
+Нагрузка открытая (open loop): сценарии запускаются по пуассоновскому
+потоку с заданной интенсивностью независимо от того, успевает ли
+сервер отвечать. Время сценария считается от запланированного момента
+запуска, поэтому ожидание свободного соединения тоже попадает в
+задержку, и перегрузка сервера не маскируется замедлением клиента.
+"""
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import product
+
+from django.core.management.base import CommandError
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reviews.models import Review, Title, User
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SCENARIOS = ('browse', 'review', 'comments')
+SAMPLE_SIZE = 10000
+USERNAME_PREFIX = 'loadtest'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class WsgiServer:
+    """api_yamdb.wsgi в многопоточном WSGI-сервере Django."""
+
+    def __init__(self, host, port):
+        from api_yamdb.wsgi import application
+
+        self.httpd = ThreadedWSGIServer((host, port), QuietRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.set_app(application)
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+class AsgiServer:
+    """api_yamdb.asgi под uvicorn (необязательная зависимость)."""
+
+    def __init__(self, host, port):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('Для --server asgi нужен uvicorn')
+        from api_yamdb.asgi import application
+
+        self.server = uvicorn.Server(uvicorn.Config(
+            application, host=host, port=port, log_level='warning',
+            lifespan='off'))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def address(self):
+        return self.server.servers[0].sockets[0].getsockname()[:2]
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise CommandError('Не удалось запустить uvicorn')
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+SERVERS = {'wsgi': WsgiServer, 'asgi': AsgiServer}
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpClient:
+    """Минимальный HTTP/1.1-клиент на asyncio с пулом соединений."""
+
+    def __init__(self, host, port, connections, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.idle = []
+        self.slots = asyncio.Semaphore(connections)
+
+    async def request(self, method, path, body=None, token=None):
+        """Статус и тело ответа."""
+        data = b'' if body is None else json.dumps(body).encode()
+        head = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Content-Length: {len(data)}',
+        ]
+        if data:
+            head.append('Content-Type: application/json')
+        if token:
+            head.append(f'Authorization: Bearer {token}')
+        message = ('\r\n'.join(head) + '\r\n\r\n').encode() + data
+        async with self.slots:
+            # Сервер мог закрыть простаивающее соединение: одна попытка
+            # повторяется на новом.
+            while True:
+                reused = bool(self.idle)
+                connection = (self.idle.pop() if reused
+                              else await self.connect())
+                try:
+                    status, body, keep = await asyncio.wait_for(
+                        self.exchange(connection, message), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection[1].close()
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    connection[1].close()
+                    raise
+                if keep:
+                    self.idle.append(connection)
+                else:
+                    connection[1].close()
+                return status, body
+
+    async def connect(self):
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def exchange(self, connection, message):
+        reader, writer = connection
+        writer.write(message)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('соединение закрыто сервером')
+        version, status = status_line.split()[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep = (version == b'HTTP/1.1'
+                and headers.get('connection', '').lower() != 'close')
+        if 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self.read_chunked(reader)
+        else:
+            body = await reader.read()
+            keep = False
+        return int(status), body, keep
+
+    @staticmethod
+    async def read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if not size:
+                await reader.readline()
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+
+    def add(self, label, latency_ms, outcome):
+        self.latencies[label].append(latency_ms)
+        self.outcomes[label][outcome] += 1
+
+    @staticmethod
+    def is_error(outcome):
+        return not isinstance(outcome, int) or outcome >= 400
+
+    def summary(self, label):
+        latencies = sorted(self.latencies[label])
+        errors = sum(count for outcome, count in self.outcomes[label].items()
+                     if self.is_error(outcome))
+        result = {'count': len(latencies), 'errors': errors}
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+            result.update(p50=cuts[49], p95=cuts[94], p99=cuts[98])
+        elif latencies:
+            result.update(p50=latencies[0], p95=latencies[0],
+                          p99=latencies[0])
+        return result
+
+    def histogram(self, labels):
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for label in labels:
+            for latency in self.latencies[label]:
+                index = next((index for index, bound in enumerate(BUCKETS_MS)
+                              if latency <= bound), len(BUCKETS_MS))
+                counts[index] += 1
+        return counts
+
+
+class Scenarios:
+    """Сценарии нагрузки по данным из базы.
+
+    - browse: анонимный просмотр — страница списка произведений,
+      произведение и его отзывы;
+    - review: отзыв пользователя loadtest на произведение, на которое он
+      ещё не писал (unique_title_author соблюдается);
+    - comments: ветка комментариев отзыва и новый комментарий.
+    """
+
+    def __init__(self, users, seed):
+        self.rng = random.Random(seed)
+        self.titles = list(
+            Title.objects.order_by('?').values_list('pk', flat=True)
+            [:SAMPLE_SIZE])
+        if not self.titles:
+            raise CommandError(
+                'В базе нет произведений: заполните её, например, '
+                '`generate_data --insert`')
+        self.reviews = list(
+            Review.objects.order_by('?').values_list('title_id', 'pk')
+            [:SAMPLE_SIZE])
+        self.pages = Title.objects.count() // 10 + 1
+        self.tokens = self.prepare_users(users)
+        reviewed = set(Review.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).values_list('author_id', 'title_id'))
+        self.pairs = (
+            (user_id, title_id)
+            for title_id, user_id in product(self.titles, self.tokens)
+            if (user_id, title_id) not in reviewed
+        )
+
+    @staticmethod
+    def prepare_users(count):
+        users = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(
+                username=f'{USERNAME_PREFIX}{index}',
+                defaults={'email': f'{USERNAME_PREFIX}{index}@yamdb.fake'})
+            users.append(user)
+        return {user.pk: str(AccessToken.for_user(user)) for user in users}
+
+    async def browse(self, call):
+        page = self.rng.randint(1, self.pages)
+        await call('titles', 'GET', f'/api/v1/titles/?page={page}')
+        title = self.rng.choice(self.titles)
+        await call('title', 'GET', f'/api/v1/titles/{title}/')
+        await call('reviews', 'GET', f'/api/v1/titles/{title}/reviews/')
+
+    async def review(self, call):
+        pair = next(self.pairs, None)
+        if pair is None:
+            raise HttpError('нет свободных пар пользователь-произведение')
+        user_id, title = pair
+        await call('review POST', 'POST', f'/api/v1/titles/{title}/reviews/',
+                   {'text': 'loadtest', 'score': self.rng.randint(1, 10)},
+                   self.tokens[user_id])
+
+    async def comments(self, call):
+        if not self.reviews:
+            return await self.browse(call)
+        title, review = self.rng.choice(self.reviews)
+        path = f'/api/v1/titles/{title}/reviews/{review}/comments/'
+        await call('comments', 'GET', path)
+        await call('comment POST', 'POST', path, {'text': 'loadtest'},
+                   self.rng.choice(list(self.tokens.values())))
+
+
+class LoadTest:
+    def __init__(self, host, port, scenarios, mix, rate, duration,
+                 connections, max_inflight, timeout, seed):
+        self.host = host
+        self.port = port
+        self.scenarios = scenarios
+        self.mix = mix
+        self.rate = rate
+        self.duration = duration
+        self.connections = connections
+        self.max_inflight = max_inflight
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+        self.scheduled = self.dropped = 0
+
+    def run(self):
+        started = time.perf_counter()
+        asyncio.run(self.arrivals())
+        self.elapsed = time.perf_counter() - started
+        return self.stats
+
+    async def arrivals(self):
+        client = HttpClient(self.host, self.port, self.connections,
+                            self.timeout)
+        loop = asyncio.get_running_loop()
+        names, weights = zip(*self.mix.items())
+        tasks = set()
+        start = next_at = loop.time()
+        while next_at < start + self.duration:
+            await asyncio.sleep(max(0, next_at - loop.time()))
+            self.scheduled += 1
+            if len(tasks) >= self.max_inflight:
+                self.dropped += 1
+            else:
+                name = self.rng.choices(names, weights)[0]
+                task = asyncio.create_task(
+                    self.scenario(client, name, next_at))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_at += self.rng.expovariate(self.rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+        client.close()
+
+    async def scenario(self, client, name, scheduled):
+        loop = asyncio.get_running_loop()
+
+        async def call(label, method, path, body=None, token=None):
+            started = loop.time()
+            try:
+                status, _ = await client.request(method, path, body, token)
+            except asyncio.TimeoutError:
+                status = 'timeout'
+            except (OSError, asyncio.IncompleteReadError,
+                    HttpError) as error:
+                status = type(error).__name__
+            self.stats.add(label, (loop.time() - started) * 1000, status)
+            if Stats.is_error(status):
+                raise HttpError(status)
+
+        try:
+            await getattr(self.scenarios, name)(call)
+            outcome = 200
+        except HttpError as error:
+            outcome = error.args[0]
+        self.stats.add(f'сценарий {name}',
+                       (loop.time() - scheduled) * 1000, outcome)
+
+    def request_labels(self):
+        return [label for label in self.stats.latencies
+                if not label.startswith('сценарий ')]
+
+    def report(self):
+        labels = self.request_labels()
+        completed = sum(len(self.stats.latencies[label]) for label in labels)
+        result = {
+            'duration': round(self.elapsed, 3),
+            'scheduled': self.scheduled,
+            'dropped': self.dropped,
+            'requests': completed,
+            'throughput': round(completed / self.elapsed, 2),
+            'labels': {
+                label: self.stats.summary(label)
+                for label in sorted(self.stats.latencies)
+            },
+            'errors': {
+                label: {str(outcome): count
+                        for outcome, count in outcomes.items()
+                        if Stats.is_error(outcome)}
+                for label, outcomes in self.stats.outcomes.items()
+            },
+            'histogram': dict(zip(
+                [f'<={bound}ms' for bound in BUCKETS_MS] + ['>5000ms'],
+                self.stats.histogram(labels))),
+        }
+        result['errors'] = {
+            label: errors for label, errors in result['errors'].items()
+            if errors}
+        return result
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise CommandError(
+                f'Неизвестный сценарий "{name}", есть: {", ".join(SCENARIOS)}')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f'Неверный вес сценария "{part}"')
+    return mix
@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowCount',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество строк')),
+            ],
+            options={
+                'verbose_name': 'Счётчик строк',
+                'verbose_name_plural': 'Счётчики строк',
+            },
+        ),
+    ]
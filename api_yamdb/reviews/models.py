@@ -1,5 +1,7 @@
 import datetime
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, NullIf
 from api_yamdb.settings import SHOW_WORDS
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import (MaxValueValidator, MinValueValidator)
@@ -35,7 +37,6 @@ class User(AbstractUser):
                                  null=True,)
     bio = models.TextField('О пользователе', null=True,)
     role = models.CharField(choices=ROLE_CHOICES, default=USER, max_length=150)
-    confirmation_code = models.CharField(max_length=150)
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -73,8 +74,37 @@ class Genre(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    def refresh_rating(self):
+        """Пересчёт хранимого рейтинга по отзывам одним UPDATE.
+
+        Нужен после массовых операций, которые обходят сигналы
+        (bulk_create, raw SQL), и для начального заполнения.
+        """
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')).order_by().values('title')
+        score_sum = Coalesce(Subquery(
+            reviews.annotate(total=Sum('score')).values('total')), 0)
+        review_count = Coalesce(Subquery(
+            reviews.annotate(total=Count('pk')).values('total')), 0)
+        return self.update(
+            score_sum=score_sum,
+            review_count=review_count,
+            rating=score_sum / NullIf(review_count, 0),
+        )
+
+
 class Title(models.Model):
-    """Модель произведений."""
+    """Модель произведений.
+
+    Поля score_sum, review_count и rating денормализованы: их
+    поддерживают сигналы модели Review (см. reviews/signals.py),
+    поэтому список произведений не агрегирует отзывы на каждый запрос.
+    save() существующего произведения эти поля не записывает, чтобы
+    устаревшие значения экземпляра не затёрли счётчики в БД.
+    """
+    DENORMALIZED_FIELDS = ('score_sum', 'review_count', 'rating')
+
     name = models.CharField('Название произведения', max_length=256)
     year = models.SmallIntegerField(
         verbose_name='Год выпуска',
@@ -95,6 +125,14 @@ class Title(models.Model):
         null=True,
         related_name='titles'
     )
+    score_sum = models.PositiveIntegerField(
+        'Сумма оценок', default=0, editable=False)
+    review_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0, editable=False)
+    rating = models.PositiveSmallIntegerField(
+        'Рейтинг', null=True, blank=True, editable=False)
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Название'
@@ -103,6 +141,15 @@ class Title(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class TitleGenre(models.Model):
     """Промежуточная модель для реализации отношения многие ко многим."""
@@ -170,10 +217,22 @@ class Review(models.Model):
                 name='unique_title_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['title', 'pub_date', 'id'],
+                name='review_title_pub_date_idx'
+            )
+        ]
 
     def str(self) -> str:
         return self.text[:SHOW_WORDS]
 
+    def save(self, *args, **kwargs):
+        # Рейтинг произведения обновляется в post_save,
+        # поэтому он должен попасть в ту же транзакцию.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """Модель комментариев к отзывам."""
@@ -197,6 +256,81 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['review', 'pub_date', 'id'],
+                name='comment_review_pub_date_idx'
+            )
+        ]
 
     def __str__(self) -> str:
         return self.text
+
+
+class RowCount(models.Model):
+    """Поддерживаемое сигналами число строк таблицы.
+
+    Отдаёт `count` для нефильтрованных списков без SELECT COUNT(*).
+    Строка создаётся лениво точным подсчётом, поэтому таблицу можно
+    очищать без последствий.
+    """
+    table = models.CharField('Таблица', max_length=100, primary_key=True)
+    count = models.BigIntegerField('Количество строк', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик строк'
+        verbose_name_plural = 'Счётчики строк'
+
+    def __str__(self) -> str:
+        return f'{self.table}: {self.count}'
+
+    @classmethod
+    def get_count(cls, model):
+        table = model._meta.db_table
+        count = cls.objects.filter(table=table).values_list(
+            'count', flat=True).first()
+        if count is None:
+            count = cls.refresh(model)
+        return count
+
+    @classmethod
+    def add(cls, model, delta):
+        table = model._meta.db_table
+        updated = cls.objects.filter(table=table).update(
+            count=F('count') + delta)
+        if not updated:
+            cls.refresh(model)
+
+    @classmethod
+    def refresh(cls, model):
+        """Точный пересчёт, например после bulk_create."""
+        count = model._default_manager.count()
+        cls.objects.update_or_create(
+            table=model._meta.db_table, defaults={'count': count})
+        return count
+
+
+class OutboxEmail(models.Model):
+    """Письмо, ожидающее отправки фоновым обработчиком.
+
+    На адрес хранится не больше одного письма: повторный запрос
+    заменяет текст и увеличивает `revision`, поэтому отправленное
+    письмо удаляется, только если его не успели заменить.
+    `next_attempt_at` пуст у писем, исчерпавших попытки.
+    """
+    email = models.EmailField('Адрес', max_length=254, unique=True)
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст')
+    revision = models.PositiveIntegerField('Версия', default=1)
+    attempts = models.PositiveIntegerField('Попытки отправки', default=0)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка', null=True, db_index=True)
+    claim = models.CharField('Обработчик', max_length=32, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Очередь писем'
+
+    def __str__(self) -> str:
+        return self.email
@@ -0,0 +1,172 @@
+"""Полнотекстовый поиск по произведениям на SQLite FTS5.
+
+Индекс reviews_title_search хранит название, описание, названия жанров
+и категории произведения; rowid строки совпадает с id произведения.
+Индекс поддерживают сигналы из reviews/signals.py, а массовые операции
+должны вызывать index_titles() или rebuild_index() сами. Внутри
+batch_indexing() переиндексация откладывается до выхода из блока и
+выполняется один раз на произведение.
+
+В FTS5 нет стеммера для русского языка, поэтому морфология
+обрабатывается на стороне запроса: у слова отрезается окончание,
+и основа ищется как префикс (`шоушенка` -> `шоушенк*`). Основы до 4
+символов читаются из готовых префиксных индексов (`prefix = '2 3 4'`);
+для более длинных FTS5 просматривает в основном индексе диапазон
+терминов с этим префиксом, так что стоимость растёт с числом таких
+терминов и их вхождений, а не с размером каталога целиком, как у
+LIKE '%x%'.
+На других СУБД поиск откатывается к icontains.
+"""
+import re
+import threading
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_TABLE = 'reviews_title_search'
+# Веса столбцов для bm25: name, description, genres, category.
+RANK = f'bm25({SEARCH_TABLE}, 10.0, 1.0, 3.0, 3.0)'
+CHUNK_SIZE = 500
+
+CREATE_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+    'name, description, genres, category, '
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+DROP_TABLE_SQL = f'DROP TABLE IF EXISTS {SEARCH_TABLE}'
+
+INSERT_SQL = f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, name, description, genres, category)
+    SELECT t.id, t.name, t.description,
+           COALESCE((SELECT group_concat(g.name, ' ')
+                     FROM reviews_titlegenre tg
+                     JOIN reviews_genre g ON g.id = tg.genre_id
+                     WHERE tg.title_id = t.id), ''),
+           COALESCE(c.name, '')
+    FROM reviews_title t
+    LEFT JOIN reviews_category c ON c.id = t.category_id
+"""
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-яё]')
+RU_ENDINGS = sorted((
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    'ам', 'ям', 'ом', 'ем', 'ов', 'ев', 'ей', 'ой', 'ый', 'ий', 'ая', 'яя',
+    'ое', 'ее', 'ые', 'ие', 'ых', 'их', 'ую', 'юю', 'ою', 'ею', 'ах', 'ях',
+    'ия', 'ья', 'ье', 'ьи', 'ью', 'ию',
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'иях',
+    'иями',
+), key=len, reverse=True)
+MIN_STEM = 3
+
+_batch = threading.local()
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def stem(word):
+    """Отрезает самое длинное русское окончание, оставляя основу >= 3."""
+    word = word.lower()
+    if not CYRILLIC_RE.search(word):
+        return word
+    for ending in RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def build_query(text):
+    """Строка MATCH: все слова запроса как префиксы их основ."""
+    terms = [stem(word) for word in WORD_RE.findall(text)]
+    return ' '.join('"{}"*'.format(term.replace('"', '""'))
+                    for term in terms)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def remove_titles(title_ids):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(title_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} '
+                f'WHERE rowid IN ({placeholders})', chunk)
+
+
+@contextmanager
+def batch_indexing():
+    """Переиндексация, запрошенная в блоке, выполняется на выходе из
+    него одним вызовом: удаление строк TitleGenre, где post_delete
+    приходит на каждую строку, обновляет произведение один раз."""
+    if getattr(_batch, 'title_ids', None) is not None:
+        yield
+        return
+    _batch.title_ids = set()
+    try:
+        yield
+        title_ids = _batch.title_ids
+    finally:
+        _batch.title_ids = None
+    if title_ids:
+        index_titles(sorted(title_ids))
+
+
+def index_titles(title_ids):
+    """Переиндексация указанных произведений."""
+    if not is_available():
+        return
+    if getattr(_batch, 'title_ids', None) is not None:
+        _batch.title_ids.update(title_ids)
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(title_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} '
+                f'WHERE rowid IN ({placeholders})', chunk)
+            cursor.execute(
+                f'{INSERT_SQL} WHERE t.id IN ({placeholders})', chunk)
+
+
+def rebuild_index(using_connection=None):
+    """Полное перестроение индекса (после загрузок в обход сигналов)."""
+    db = using_connection or connection
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(INSERT_SQL)
+
+
+def search_titles(queryset, text):
+    """Фильтрует queryset произведений по запросу и сортирует по bm25."""
+    if not is_available():
+        condition = (
+            Q(name__icontains=text)
+            | Q(description__icontains=text)
+            | Q(genre__name__icontains=text)
+            | Q(category__name__icontains=text)
+        )
+        return queryset.filter(condition).distinct()
+    match = build_query(text)
+    if not match:
+        return queryset
+    return queryset.extra(
+        select={'search_rank': RANK},
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = reviews_title.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[match],
+        order_by=['search_rank', 'id'],
+    )
@@ -0,0 +1,128 @@
+from django.db.models import F
+from django.db.models.functions import NullIf
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_delete)
+from django.dispatch import Signal, receiver
+
+from . import search
+from .models import Category, Genre, Review, RowCount, Title, TitleGenre
+
+# Пользователей не считаем: регистрация не должна писать ничего, кроме
+# строки пользователя, а список пользователей берёт count из кэша
+# пагинации.
+COUNTED_MODELS = (Category, Genre, Title)
+
+# Отправляется после массовой записи в обход сигналов моделей
+# (load_data --bulk и т.п.); аргумент models — список затронутых моделей.
+bulk_loaded = Signal()
+
+
+def update_title_rating(title_id, score_delta, count_delta):
+    """Инкрементальное обновление рейтинга произведения одним UPDATE."""
+    score_sum = F('score_sum') + score_delta
+    review_count = F('review_count') + count_delta
+    Title.objects.filter(pk=title_id).update(
+        score_sum=score_sum,
+        review_count=review_count,
+        rating=score_sum / NullIf(review_count, 0),
+    )
+
+
+def _remember_rating_state(instance):
+    # Отложенные (deferred) поля не трогаем, чтобы не вызвать запрос.
+    if 'score' in instance.__dict__ and 'title_id' in instance.__dict__:
+        instance._rating_state = (instance.title_id, instance.score or 0)
+    else:
+        instance._rating_state = None
+
+
+@receiver(post_init, sender=Review)
+def review_post_init(sender, instance, **kwargs):
+    _remember_rating_state(instance)
+
+
+@receiver(post_save, sender=Review)
+def review_post_save(sender, instance, created, **kwargs):
+    score = instance.score or 0
+    if created:
+        update_title_rating(instance.title_id, score, 1)
+    elif instance._rating_state is None:
+        Title.objects.filter(pk=instance.title_id).refresh_rating()
+    else:
+        old_title_id, old_score = instance._rating_state
+        if old_title_id != instance.title_id:
+            update_title_rating(old_title_id, -old_score, -1)
+            update_title_rating(instance.title_id, score, 1)
+        elif old_score != score:
+            update_title_rating(instance.title_id, score - old_score, 0)
+    _remember_rating_state(instance)
+
+
+@receiver(post_delete, sender=Review)
+def review_post_delete(sender, instance, **kwargs):
+    update_title_rating(instance.title_id, -(instance.score or 0), -1)
+
+
+@receiver(post_save, sender=Title)
+def title_post_save(sender, instance, **kwargs):
+    search.index_titles([instance.pk])
+
+
+@receiver(post_delete, sender=Title)
+def title_post_delete(sender, instance, **kwargs):
+    search.remove_titles([instance.pk])
+
+
+@receiver(post_save, sender=TitleGenre)
+@receiver(post_delete, sender=TitleGenre)
+def title_genre_changed(sender, instance, **kwargs):
+    search.index_titles([instance.title_id])
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_title_ids = list(
+            instance.titles.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_titles([instance.pk])
+    elif action == 'post_clear':
+        search.index_titles(instance._cleared_title_ids)
+    else:
+        search.index_titles(pk_set)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def reference_post_save(sender, instance, created, **kwargs):
+    if not created:
+        search.index_titles(
+            instance.titles.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def category_pre_delete(sender, instance, **kwargs):
+    # Произведения отвязываются через UPDATE ... SET NULL без сигналов.
+    instance._title_ids = list(instance.titles.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def category_post_delete(sender, instance, **kwargs):
+    search.index_titles(instance._title_ids)
+
+
+def row_count_post_save(sender, instance, created, **kwargs):
+    if created:
+        RowCount.add(sender, 1)
+
+
+def row_count_post_delete(sender, instance, **kwargs):
+    RowCount.add(sender, -1)
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(row_count_post_save, sender=model)
+    post_delete.connect(row_count_post_delete, sender=model)
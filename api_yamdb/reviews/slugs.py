@@ -0,0 +1,65 @@
+"""Выдача уникальных slug'ов без запроса на каждого кандидата.
+
+Занятые slug'и загружаются из базы одним запросом, дальше кандидаты
+`base`, `base-1`, `base-2`, ... проверяются по множеству в памяти.
+Результат зависит только от уже занятых slug'ов и порядка имён, поэтому
+повторная загрузка тех же данных даёт те же slug'и.
+"""
+from django.utils.text import slugify
+
+TRANSLITERATION = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def slugify_name(name):
+    """ASCII-slug из названия, кириллица транслитерируется."""
+    return slugify(name.lower().translate(TRANSLITERATION))
+
+
+class SlugAllocator:
+    def __init__(self, model, taken=(), field='slug', fallback=None):
+        self.model = model
+        self.field = field
+        self.max_length = model._meta.get_field(field).max_length
+        self.fallback = fallback or model._meta.model_name
+        self.taken = set(taken)
+        self.next_suffix = {}
+
+    @classmethod
+    def load(cls, model, field='slug', **kwargs):
+        """Аллокатор со всеми занятыми slug'ами модели."""
+        taken = model._default_manager.values_list(field, flat=True)
+        return cls(model, taken, field, **kwargs)
+
+    @classmethod
+    def for_name(cls, model, name, field='slug', **kwargs):
+        """Аллокатор для одного имени: загружаются только slug'и,
+        начинающиеся с его основы."""
+        allocator = cls(model, field=field, **kwargs)
+        base = allocator.base(name)
+        allocator.taken.update(model._default_manager.filter(
+            **{f'{field}__startswith': base}
+        ).values_list(field, flat=True))
+        return allocator
+
+    def base(self, name, slug=None):
+        base = slugify(slug or '') or slugify_name(name) or self.fallback
+        return base[:self.max_length].strip('-_') or self.fallback
+
+    def allocate(self, name, slug=None):
+        """Свободный slug для имени (или для предложенного slug)."""
+        base = self.base(name, slug)
+        candidate = base
+        counter = self.next_suffix.get(base, 1)
+        while candidate in self.taken:
+            suffix = f'-{counter}'
+            candidate = base[:self.max_length - len(suffix)] + suffix
+            counter += 1
+        self.next_suffix[base] = counter
+        self.taken.add(candidate)
+        return candidate
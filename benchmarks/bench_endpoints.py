@@ -0,0 +1,212 @@
+"""Задержки (p50/p95/p99) и SQL-запросы всех маршрутов API.
+
+Запуск: pytest benchmarks/bench_endpoints.py -s
+Данные создаются `generate_data --insert`; BENCH_ENDPOINT_REVIEWS
+задаёт размеры наборов в отзывах (`10000,100000`), остальные таблицы
+растут пропорционально. BENCH_REPEAT — число замеряемых запросов на
+случай (по умолчанию 50). Кэш ответов анонимным пользователям
+отключён, иначе замеры GET показывали бы попадания в него.
+
+Результаты пишутся в BENCH_RESULTS (по умолчанию
+benchmarks/results/endpoints.json); два прогона, например до и после
+коммита, сравниваются командой
+`python -m benchmarks.compare old.json new.json`.
+"""
+import io
+import os
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+from django.urls import get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.codes import get_code_store
+from benchmarks.utils import bench_sizes, measure_requests, write_results
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenre, User)
+from tests.test_13_query_budgets import route_names
+
+RESULTS_PATH = os.path.join(
+    os.path.dirname(__file__), 'results', 'endpoints.json')
+BULK_ITEMS = 100
+
+TITLES = '/api/v1/titles/'
+TITLE = TITLES + '{title}/'
+REVIEWS = TITLE + 'reviews/'
+REVIEW = REVIEWS + '{review}/'
+COMMENTS = REVIEW + 'comments/'
+
+# (маршрут, случай, метод, клиент, путь, тело). Путь и тело — строки
+# с полями контекста или функции (контекст, номер запроса).
+CASES = (
+    ('api:api-root', 'api-root', 'GET', 'anon', '/api/v1/', None),
+    ('api:titles-list', 'titles', 'GET', 'anon', TITLES, None),
+    ('api:titles-list', 'titles?genre', 'GET', 'anon', TITLES,
+     {'genre': '{genre}'}),
+    ('api:titles-list', 'titles?category', 'GET', 'anon', TITLES,
+     {'category': '{category}'}),
+    ('api:titles-list', 'titles?year', 'GET', 'anon', TITLES,
+     {'year': '{year}'}),
+    ('api:titles-list', 'titles?name', 'GET', 'anon', TITLES,
+     {'name': '{name}'}),
+    ('api:titles-list', 'titles?search', 'GET', 'anon', TITLES,
+     {'search': '{name}'}),
+    ('api:titles-list', 'titles?page=last', 'GET', 'anon', TITLES,
+     {'page': '{last_page}'}),
+    ('api:titles-list', 'titles?cursor', 'GET', 'anon', TITLES,
+     {'cursor': ''}),
+    ('api:titles-bulk', 'titles bulk x100', 'POST', 'admin',
+     '/api/v1/titles/bulk/', lambda context, index: [
+         {'name': f'bench {index}-{item}', 'year': 2000,
+          'description': 'bench', 'genre': [context['genre']],
+          'category': context['category']}
+         for item in range(BULK_ITEMS)]),
+    ('api:titles-detail', 'title', 'GET', 'anon', TITLE, None),
+    ('api:titles-cards', 'title cards stats', 'GET', 'admin',
+     '/api/v1/titles/cards/', None),
+    ('api:reviews-list', 'reviews', 'GET', 'anon', REVIEWS, None),
+    ('api:reviews-list', 'reviews?cursor', 'GET', 'anon', REVIEWS,
+     {'cursor': ''}),
+    ('api:reviews-list', 'reviews POST', 'POST', 'writer',
+     lambda context, index: REVIEWS.format(
+         **{**context, 'title': context['titles'][index]}),
+     {'text': 'bench', 'score': 7}),
+    ('api:reviews-detail', 'review', 'GET', 'anon', REVIEW, None),
+    ('api:review-list', 'all reviews', 'GET', 'anon', '/api/v1/reviews/',
+     None),
+    ('api:review-detail', 'any review', 'GET', 'anon',
+     '/api/v1/reviews/{review}/', None),
+    ('api:comments-list', 'comments', 'GET', 'anon', COMMENTS, None),
+    ('api:comments-list', 'comments POST', 'POST', 'writer', COMMENTS,
+     {'text': 'bench'}),
+    ('api:comments-detail', 'comment', 'GET', 'anon',
+     COMMENTS + '{comment}/', None),
+    ('api:categories-list', 'categories', 'GET', 'anon',
+     '/api/v1/categories/', None),
+    ('api:categories-detail', 'category DELETE', 'DELETE', 'admin',
+     lambda context, index: f'/api/v1/categories/bench-{index}/', None),
+    ('api:genres-list', 'genres', 'GET', 'anon', '/api/v1/genres/', None),
+    ('api:genres-detail', 'genre DELETE', 'DELETE', 'admin',
+     lambda context, index: f'/api/v1/genres/bench-{index}/', None),
+    ('api:user-list', 'users', 'GET', 'admin', '/api/v1/users/', None),
+    ('api:user-list', 'users?search', 'GET', 'admin', '/api/v1/users/',
+     {'search': 'user1'}),
+    ('api:user-detail', 'user', 'GET', 'admin',
+     '/api/v1/users/{username}/', None),
+    ('api:users-me', 'users/me', 'GET', 'writer', '/api/v1/users/me/', None),
+    ('api:throttles', 'auth throttles', 'GET', 'admin',
+     '/api/v1/auth/throttles/', None),
+    ('api:signup', 'signup', 'POST', 'anon', '/api/v1/auth/signup/',
+     lambda context, index: {
+         'username': f'bench{context["size"]}x{index}',
+         'email': f'bench{context["size"]}x{index}@yamdb.fake'}),
+    ('api:token', 'token', 'POST', 'anon', '/api/v1/auth/token/',
+     lambda context, index: {
+         'username': 'bench-writer',
+         'confirmation_code': get_code_store().issue('bench-writer')}),
+)
+
+
+def scale(reviews):
+    return {
+        'users': max(100, reviews // 10),
+        'titles': max(100, reviews // 20),
+        'genres': 20,
+        'categories': 5,
+        'reviews': reviews,
+        'comments': reviews,
+    }
+
+
+def seed(size, repeat):
+    for model in (Comment, Review, TitleGenre, Title, Genre, Category, User):
+        model.objects.all().delete()
+    args = []
+    for name, value in scale(size).items():
+        args += [f'--{name}', str(value)]
+    call_command('generate_data', '--insert', *args, stdout=io.StringIO())
+    # Жанры и категории без произведений для замеров DELETE.
+    for model in (Category, Genre):
+        model.objects.bulk_create(
+            model(name=f'bench {index}', slug=f'bench-{index}')
+            for index in range(repeat + 1))
+
+    review = Review.objects.annotate(
+        comment_count=Count('comments')).order_by('-comment_count').first()
+    title = review.title
+    genre = TitleGenre.objects.filter(title=title).select_related(
+        'genre').first().genre
+    admin = User.objects.create(
+        username='bench-admin', email='bench-admin@yamdb.fake',
+        role=User.ADMIN)
+    writer = User.objects.create(
+        username='bench-writer', email='bench-writer@yamdb.fake')
+    clients = {'anon': APIClient()}
+    for name, user in (('admin', admin), ('writer', writer)):
+        clients[name] = APIClient()
+        clients[name].credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return clients, {
+        'size': size,
+        'title': title.pk,
+        'review': review.pk,
+        'comment': review.comments.order_by('pk').first().pk,
+        'genre': genre.slug,
+        'category': title.category.slug,
+        'year': title.year,
+        'name': title.name.split()[-1],
+        'username': User.objects.filter(role=User.USER).first().username,
+        'last_page': Title.objects.count() // 10 + 1,
+        'titles': list(Title.objects.order_by('pk').values_list(
+            'pk', flat=True)),
+    }
+
+
+def render(template, context):
+    if callable(template):
+        return lambda index: template(context, index)
+    if isinstance(template, str):
+        return template.format(**context)
+    if isinstance(template, dict):
+        return {key: render(value, context)
+                for key, value in template.items()}
+    return template
+
+
+def test_00_every_route_is_benchmarked():
+    routes = {
+        name for name in route_names(get_resolver().url_patterns)
+        if name.startswith('api:')
+    }
+    assert routes == {case[0] for case in CASES}, (
+        'В CASES должен быть хотя бы один замер для каждого маршрута '
+        'из api/urls.py.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_01_endpoint_latency(settings):
+    # Замеры регистрации и токена не должны упираться в лимиты, а
+    # анонимные GET — отдаваться из кэша ответов.
+    settings.AUTH_THROTTLE_RATES = {}
+    settings.RESPONSE_CACHE_TIMEOUT = 0
+    repeat = int(os.getenv('BENCH_REPEAT', '50'))
+    sizes = bench_sizes('BENCH_ENDPOINT_REVIEWS', '10000')
+    results = []
+    for size in sizes:
+        clients, context = seed(size, repeat)
+        print(f'\nreviews={size}: {"p50":>8} {"p95":>8} {"p99":>8} '
+              f'{"queries":>7}')
+        for route, case, method, client, path, data in CASES:
+            stats = measure_requests(
+                clients[client], method, render(path, context),
+                render(data, context), repeat=repeat)
+            results.append({'size': size, 'case': case, 'route': route,
+                            'method': method, **stats})
+            print(f'{case:>20}: {stats["p50"]:8.2f} {stats["p95"]:8.2f} '
+                  f'{stats["p99"]:8.2f} {stats["queries"]:7}')
+    path = os.getenv('BENCH_RESULTS', RESULTS_PATH)
+    write_results(path, results, sizes=sizes, repeat=repeat)
+    print(f'results: {path}')
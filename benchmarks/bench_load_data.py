@@ -0,0 +1,51 @@
+"""Построчная загрузка load_data против --bulk.
+
+Запуск: pytest benchmarks/bench_load_data.py -s (или все бенчмарки:
+pytest benchmarks/ -s).
+BENCH_LOAD_ROWS задаёт число отзывов (и комментариев) в дампе для
+построчного режима, BENCH_BULK_ROWS — для --bulk, например
+`BENCH_BULK_ROWS=1000000`. Скорость сравнивается в строках в секунду.
+"""
+import io
+import os
+import time
+
+import pytest
+from django.core.management import call_command
+
+from benchmarks.utils import bench_sizes, write_csv_dump
+from reviews.models import Comment, Review
+
+
+def load(path, *args):
+    started = time.perf_counter()
+    call_command('load_data', path, *args, stdout=io.StringIO(),
+                 stderr=io.StringIO())
+    elapsed = time.perf_counter() - started
+    rows = Review.objects.count() + Comment.objects.count()
+    return rows / elapsed
+
+
+# Построчная загрузка не берёт id произведений и жанров из CSV, а
+# ссылки дампа рассчитаны на id с 1: счётчики id сбрасываются после
+# бенчмарков, которые уже наполняли базу.
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+def test_load_data_bulk_speedup(tmp_path):
+    row_rows = bench_sizes('BENCH_LOAD_ROWS', '2000')[0]
+    bulk_rows = bench_sizes('BENCH_BULK_ROWS', '100000')[0]
+
+    row_path = os.path.join(tmp_path, 'row')
+    os.mkdir(row_path)
+    write_csv_dump(row_path, row_rows)
+    row_rate = load(row_path)
+
+    for model in (Comment, Review):
+        model.objects.all().delete()
+    bulk_path = os.path.join(tmp_path, 'bulk')
+    os.mkdir(bulk_path)
+    write_csv_dump(bulk_path, bulk_rows)
+    bulk_rate = load(bulk_path, '--bulk')
+
+    print(f'row-by-row: {row_rate:10.0f} rows/s ({row_rows} reviews)')
+    print(f'bulk:       {bulk_rate:10.0f} rows/s ({bulk_rows} reviews), '
+          f'x{bulk_rate / row_rate:.0f}')
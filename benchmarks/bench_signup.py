@@ -0,0 +1,151 @@
+"""Пропускная способность регистрации под параллельной нагрузкой.
+
+Запуск: pytest benchmarks/bench_signup.py -s
+BENCH_SIGNUP_USERS — число пользователей (по умолчанию 300), каждый
+регистрируется BENCH_SIGNUP_REPEAT раз (по умолчанию 3: первый запрос
+и повторные запросы кода); BENCH_SIGNUP_THREADS — число потоков
+(по умолчанию 8). Для сравнения тот же поток запросов проходит через
+прежнюю реализацию целиком: проверки `exists()` + `get()` по каждому
+полю, `get_or_create`, запись кода в строку пользователя через
+`save(update_fields=...)` (колонки кода больше нет, поэтому код пишется
+в `last_name` той же длины) и синхронный `send_mail`. В обоих прогонах
+почтовый бэкенд — файловый из настроек проекта; текущая реализация
+только ставит письмо в очередь, отправку выполняет обработчик вне
+запроса.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.mail import send_mail
+from django.db import OperationalError, close_old_connections
+from rest_framework import serializers, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from api.util import confirmation_code_generation
+from api.views import send_confirmation_code
+from api_yamdb.settings import PATTERN
+from benchmarks.utils import bench_sizes
+from reviews.models import OutboxEmail, User
+
+LOCK_RETRIES = 50
+
+
+class LegacySignupSerializer(serializers.ModelSerializer):
+    username = serializers.RegexField(regex=PATTERN, max_length=150)
+    email = serializers.EmailField(max_length=254)
+
+    class Meta:
+        model = User
+        fields = ['email', 'username']
+
+    def validate_username(self, value):
+        if (User.objects.filter(username=value).exists()
+                and User.objects.get(username=value).email
+                != self.initial_data.get('email')):
+            raise serializers.ValidationError('username занят.')
+        return value
+
+    def validate_email(self, value):
+        if (User.objects.filter(email=value).exists()
+                and User.objects.get(email=value).username
+                != self.initial_data.get('username')):
+            raise serializers.ValidationError('email занят.')
+        return value
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def legacy_signup(request):
+    serializer = LegacySignupSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user, _ = User.objects.get_or_create(
+        username=serializer.validated_data.get('username'),
+        email=serializer.validated_data.get('email'),
+    )
+    user.last_name = confirmation_code_generation()
+    user.save(update_fields=['last_name'])
+    send_mail(
+        'Код подтверждения для получения JWT токена.',
+        f'confirmation_code: {user.last_name}',
+        'from@example.com',
+        [user.email],
+        fail_silently=False,
+    )
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def run(view, payloads, threads):
+    """Регистраций в секунду и число повторов из-за блокировок SQLite."""
+    factory = APIRequestFactory()
+    retries = []
+    lock = threading.Lock()
+
+    def call(data):
+        for attempt in range(LOCK_RETRIES):
+            try:
+                response = view(factory.post(
+                    '/api/v1/auth/signup/', data, format='json'))
+                break
+            except OperationalError:
+                time.sleep(0.001 * (attempt + 1))
+        else:
+            raise AssertionError('База данных заблокирована')
+        with lock:
+            retries.append(attempt)
+        assert response.status_code == 200, response.data
+        close_old_connections()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(call, payloads))
+    elapsed = time.perf_counter() - started
+    return len(payloads) / elapsed, sum(retries)
+
+
+def payloads(prefix, users, repeat, seed):
+    items = [{'username': f'{prefix}{index}',
+              'email': f'{prefix}{index}@yamdb.fake'}
+             for index in range(users)] * repeat
+    random.Random(seed).shuffle(items)
+    # Первая регистрация пользователя идёт раньше повторных.
+    seen, first, rest = set(), [], []
+    for item in items:
+        (rest if item['username'] in seen else first).append(item)
+        seen.add(item['username'])
+    return first + rest
+
+
+@pytest.mark.django_db(transaction=True)
+def test_signup_throughput(settings, tmp_path):
+    settings.EMAIL_OUTBOX_DELIVERY = 'command'
+    # pytest-django подменяет бэкенд на locmem; прежняя реализация
+    # писала письма файловым бэкендом из настроек проекта.
+    settings.EMAIL_BACKEND = (
+        'django.core.mail.backends.filebased.EmailBackend')
+    settings.EMAIL_FILE_PATH = str(tmp_path)
+    settings.AUTH_THROTTLE_RATES = {}
+    users = bench_sizes('BENCH_SIGNUP_USERS', '300')[0]
+    repeat = int(os.getenv('BENCH_SIGNUP_REPEAT', '3'))
+    threads = int(os.getenv('BENCH_SIGNUP_THREADS', '8'))
+    results = {}
+    for name, view in (('legacy', legacy_signup),
+                       ('current', send_confirmation_code)):
+        User.objects.filter(username__startswith='bench').delete()
+        OutboxEmail.objects.all().delete()
+        results[name] = run(
+            view, payloads(f'bench-{name}-', users, repeat, 0), threads)
+        rate, retries = results[name]
+        print(f'{name:>8}: {rate:8.0f} signups/s, lock retries {retries}')
+    speedup = results['current'][0] / results['legacy'][0]
+    print(f'x{speedup:.2f} ({users} users x {repeat}, {threads} threads)')
+    assert speedup >= 2, (
+        'Регистрация должна выдерживать как минимум вдвое больше '
+        'запросов в секунду, чем прежняя реализация.'
+    )
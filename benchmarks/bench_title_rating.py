@@ -0,0 +1,53 @@
+"""Задержка списка произведений в зависимости от числа отзывов.
+
+Запуск: pytest benchmarks/bench_title_rating.py -s
+Размеры задаются переменной BENCH_REVIEWS_PER_TITLE (по умолчанию
+`10,100,1000` отзывов на каждое из пяти произведений).
+"""
+import pytest
+
+from benchmarks.utils import bench_sizes, measure
+from reviews.models import Category, Review, Title, User
+
+TITLES = 5
+
+
+def seed(reviews_per_title):
+    Title.objects.all().delete()
+    User.objects.filter(username__startswith='bench').delete()
+    category = Category.objects.get_or_create(name='Фильм', slug='bench')[0]
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {idx}', year=2000, description='',
+              category=category)
+        for idx in range(TITLES)
+    )
+    User.objects.bulk_create(
+        User(username=f'bench{idx}', email=f'bench{idx}@yamdb.fake')
+        for idx in range(reviews_per_title)
+    )
+    # SQLite в Django 3.2 не возвращает pk из bulk_create.
+    titles = list(Title.objects.all())
+    authors = list(User.objects.filter(username__startswith='bench'))
+    Review.objects.bulk_create(
+        (Review(title=title, author=author, text='text',
+                score=idx % 10 + 1)
+         for title in titles
+         for idx, author in enumerate(authors)),
+        batch_size=500,
+    )
+    Title.objects.refresh_rating()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_title_list_latency_is_flat(client):
+    results = []
+    for size in bench_sizes('BENCH_REVIEWS_PER_TITLE', '10,100,1000'):
+        seed(size)
+        median_ms, queries = measure(client, '/api/v1/titles/')
+        results.append((size, median_ms, queries))
+        print(f'reviews/title={size:>7}: {median_ms:8.2f} ms, '
+              f'{queries} queries')
+    assert len({queries for _, _, queries in results}) == 1, (
+        'Число запросов к БД при выдаче списка произведений не должно '
+        'зависеть от количества отзывов.'
+    )
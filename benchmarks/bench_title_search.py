@@ -0,0 +1,56 @@
+"""Поиск `?search=` по FTS5 против `?name=` (LIKE '%x%').
+
+Запуск: pytest benchmarks/bench_title_search.py -s
+Размеры каталога задаются переменной BENCH_SEARCH_TITLES, например
+`BENCH_SEARCH_TITLES=10000,100000,1000000` для замера на 1M произведений
+(заполнение такого каталога занимает несколько минут).
+"""
+import random
+
+import pytest
+
+from benchmarks.utils import bench_sizes, measure
+from reviews import search
+from reviews.models import Category, Title
+
+WORDS = (
+    'побег', 'крестный', 'отец', 'звёздные', 'войны', 'властелин', 'колец',
+    'криминальное', 'чтиво', 'бойцовский', 'клуб', 'зелёная', 'миля',
+    'форрест', 'гамп', 'матрица', 'начало', 'интерстеллар', 'жизнь',
+    'прекрасна', 'унесённые', 'ветром', 'молчание', 'ягнят', 'терминатор',
+)
+BATCH_SIZE = 5000
+
+
+def seed(count):
+    rnd = random.Random(count)
+    Title.objects.all().delete()
+    category = Category.objects.get_or_create(name='Фильм', slug='bench')[0]
+    for start in range(0, count, BATCH_SIZE):
+        Title.objects.bulk_create(
+            Title(name=' '.join(rnd.sample(WORDS, 3)), year=2000,
+                  description=' '.join(rnd.sample(WORDS, 8)),
+                  category=category)
+            for _ in range(start, min(start + BATCH_SIZE, count))
+        )
+    Title.objects.create(name='Шоушенкский редут', year=2000,
+                         description='', category=category)
+    search.rebuild_index()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_title_search_latency(client, settings):
+    # Замеряется поиск, а не попадания в кэш ответов.
+    settings.RESPONSE_CACHE_TIMEOUT = 0
+    sizes = bench_sizes('BENCH_SEARCH_TITLES', '1000,10000,100000')
+    for size in sizes:
+        seed(size)
+        fts_ms, _ = measure(client, '/api/v1/titles/?search=шоушенкского')
+        like_ms, _ = measure(client, '/api/v1/titles/?name=Шоушенк')
+        print(f'titles={size:>8}: search {fts_ms:8.2f} ms, '
+              f'name contains {like_ms:8.2f} ms')
+    if sizes[-1] >= 10000:
+        assert fts_ms < like_ms, (
+            f'На {sizes[-1]} произведениях поиск по FTS5 должен быть '
+            'быстрее поиска по вхождению подстроки.'
+        )
@@ -0,0 +1,76 @@
+"""Сравнение двух прогонов bench_endpoints.
+
+Запуск: python -m benchmarks.compare old.json new.json [--threshold 10]
+Для каждого случая выводятся p50, p95 и число SQL-запросов до и после.
+Регрессией считается рост p95 больше чем на threshold процентов или
+рост числа запросов; при регрессиях код выхода 1.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        document = json.load(file)
+    results = {
+        (result['size'], result['case']): result
+        for result in document['results']
+    }
+    return document['meta'], results
+
+
+def change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def compare(old, new, threshold):
+    """Строки отчёта и число регрессий."""
+    lines = [
+        f'{"size":>8} {"case":>20} {"p50":>17} {"p95":>17} '
+        f'{"queries":>9}'
+    ]
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        p95_change = change(before['p95'], after['p95'])
+        slower = p95_change > threshold
+        more_queries = after['queries'] > before['queries']
+        mark = ''
+        if slower or more_queries:
+            regressions += 1
+            mark = '  <- регрессия'
+        lines.append(
+            f'{key[0]:>8} {key[1]:>20} '
+            f'{before["p50"]:7.2f}→{after["p50"]:<7.2f}  '
+            f'{before["p95"]:7.2f}→{after["p95"]:<7.2f} '
+            f'{before["queries"]:>3}→{after["queries"]:<3}'
+            f'{p95_change:+7.1f}%{mark}'
+        )
+    for key in sorted(old.keys() ^ new.keys()):
+        where = 'только в старом' if key in old else 'только в новом'
+        lines.append(f'{key[0]:>8} {key[1]:>20} ({where} прогоне)')
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument(
+        '--threshold', type=float, default=10,
+        help='Допустимый рост p95 в процентах')
+    args = parser.parse_args(argv)
+    old_meta, old = load(args.old)
+    new_meta, new = load(args.new)
+    print(f'{old_meta.get("commit")} → {new_meta.get("commit")}')
+    lines, regressions = compare(old, new, args.threshold)
+    print('\n'.join(lines))
+    print(f'регрессий: {regressions}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
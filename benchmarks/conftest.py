@@ -0,0 +1,2 @@
+from tests.fixtures.fixture_cache import *  # noqa: F401,F403
+from tests.fixtures.fixture_user import *  # noqa: F401,F403
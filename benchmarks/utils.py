@@ -0,0 +1,136 @@
+import csv
+import json
+import os
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def bench_sizes(env_name, default):
+    """Размеры наборов данных из переменной окружения: `10,100,1000`."""
+    value = os.getenv(env_name, default)
+    return [int(size) for size in value.split(',') if size]
+
+
+def measure(client, url, repeat=20):
+    """Медиана времени ответа (мс) и число SQL-запросов на один запрос."""
+    client.get(url)
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.content
+    return statistics.median(timings), len(queries)
+
+
+def percentiles(timings):
+    """p50/p95/p99 и среднее по списку времён в мс."""
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49], 3),
+        'p95': round(cuts[94], 3),
+        'p99': round(cuts[98], 3),
+        'mean': round(statistics.fmean(timings), 3),
+    }
+
+
+def measure_requests(client, method, path, data=None, repeat=50):
+    """Времена ответов и число SQL-запросов для серии запросов.
+
+    `path` и `data` могут быть функциями номера запроса, чтобы запросы
+    на запись не конфликтовали между собой. Первый запрос прогревочный
+    и в статистику не входит. Коды ответов сохраняются в результатах:
+    4xx не ошибка замера (например, маршрут без вложенного title_id).
+    """
+    def call(index):
+        url = path(index) if callable(path) else path
+        body = data(index) if callable(data) else data
+        if method == 'GET':
+            return client.get(url, body)
+        return getattr(client, method.lower())(url, body, format='json')
+
+    call(0)
+    timings, queries, statuses = [], [], set()
+    for index in range(1, repeat + 1):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = call(index)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+        assert response.status_code < 500, (
+            f'{method} {response.request["PATH_INFO"]}: '
+            f'{response.status_code} {response.content[:200]}')
+    return {
+        **percentiles(timings),
+        'queries': max(queries),
+        'statuses': sorted(statuses),
+        'repeat': repeat,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, results, **meta):
+    """Результаты в JSON для сравнения прогонов (benchmarks/compare.py)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    document = {
+        'meta': {
+            'commit': git_commit(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            **meta,
+        },
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(document, file, ensure_ascii=False, indent=2)
+
+
+def write_csv_dump(path, reviews, titles=100, genres=10, comments=None):
+    """Синтетический дамп в формате static/data с `reviews` отзывами."""
+    comments = reviews if comments is None else comments
+    users = reviews // titles + 1
+    date = '2020-01-13T23:20:02.422Z'
+    tables = {
+        'category.csv': (('id', 'name', 'slug'), [(1, 'Фильм', 'movie')]),
+        'genre.csv': (('id', 'name', 'slug'), (
+            (idx, f'Жанр {idx}', f'genre-{idx}')
+            for idx in range(1, genres + 1))),
+        'titles.csv': (('id', 'name', 'year', 'category'), (
+            (idx, f'Произведение {idx}', 2000, 1)
+            for idx in range(1, titles + 1))),
+        'genre_title.csv': (('id', 'title_id', 'genre_id'), (
+            (idx, idx, idx % genres + 1) for idx in range(1, titles + 1))),
+        'users.csv': (('id', 'username', 'email', 'role', 'bio',
+                       'first_name', 'last_name'), (
+            (idx, f'user{idx}', f'user{idx}@yamdb.fake', 'user', '', '', '')
+            for idx in range(1, users + 1))),
+        'review.csv': (('id', 'title_id', 'text', 'author', 'score',
+                        'pub_date'), (
+            (idx, idx % titles + 1, f'Отзыв {idx}', idx // titles + 1,
+             idx % 10 + 1, date)
+            for idx in range(1, reviews + 1))),
+        'comments.csv': (('id', 'review_id', 'text', 'author', 'pub_date'), (
+            (idx, idx % reviews + 1, f'Комментарий {idx}',
+             idx % users + 1, date)
+            for idx in range(1, comments + 1))),
+    }
+    for file_name, (header, rows) in tables.items():
+        with open(os.path.join(path, file_name), 'w', encoding='utf-8',
+                  newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
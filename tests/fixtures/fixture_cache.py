@@ -0,0 +1,15 @@
+import pytest
+from django.core.cache import caches
+
+from api.authentication import user_cache
+from api.cards import title_cards
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Кэши API переживают очистку БД между тестами, сбрасываем их."""
+    for cache in caches.all():
+        cache.clear()
+    title_cards.reset()
+    user_cache.clear()
+    yield
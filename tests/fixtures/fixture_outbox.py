@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def eager_outbox(settings):
+    """Письма отправляются сразу после коммита, а не фоновым потоком."""
+    settings.EMAIL_OUTBOX_DELIVERY = 'eager'
@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Title
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleRating:
+
+    def get_title(self, client, title_id):
+        response = client.get(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == HTTPStatus.OK
+        return response.json()
+
+    def test_01_rating_follows_reviews(self, admin_client, client, user,
+                                       user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        assert self.get_title(client, title_id)['rating'] is None, (
+            'Рейтинг произведения без отзывов должен быть равен `None`.'
+        )
+
+        review = create_single_review(user_client, title_id, 'text', 3)
+        create_single_review(moderator_client, title_id, 'text', 10)
+        assert self.get_title(client, title_id)['rating'] == 6, (
+            'После создания отзыва хранимый рейтинг произведения должен '
+            'пересчитываться.'
+        )
+
+        review_id = review.json()['id']
+        user_client.patch(
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/',
+            data={'score': 9}
+        )
+        assert self.get_title(client, title_id)['rating'] == 9, (
+            'После изменения оценки в отзыве хранимый рейтинг произведения '
+            'должен пересчитываться.'
+        )
+
+        user_client.delete(f'/api/v1/titles/{title_id}/reviews/{review_id}/')
+        assert self.get_title(client, title_id)['rating'] == 10, (
+            'После удаления отзыва хранимый рейтинг произведения должен '
+            'пересчитываться.'
+        )
+
+    def test_02_rating_after_author_delete(self, admin_client, client, user,
+                                           user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(user_client, title_id, 'text', 2)
+        create_single_review(moderator_client, title_id, 'text', 8)
+
+        user.delete()
+        assert self.get_title(client, title_id)['rating'] == 8, (
+            'При каскадном удалении отзывов вместе с пользователем хранимый '
+            'рейтинг произведения должен пересчитываться.'
+        )
+
+    def test_03_title_save_keeps_rating(self, admin_client, client,
+                                        user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        stale = Title.objects.get(pk=title_id)
+        create_single_review(user_client, title_id, 'text', 7)
+
+        stale.name = 'Новое название'
+        stale.save()
+        title = self.get_title(client, title_id)
+        assert (title['name'], title['rating']) == ('Новое название', 7), (
+            'Сохранение произведения не должно перезаписывать хранимый '
+            'рейтинг значениями экземпляра.'
+        )
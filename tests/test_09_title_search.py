@@ -0,0 +1,64 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09TitleSearch:
+    url = '/api/v1/titles/'
+
+    def search(self, client, text):
+        response = client.get(self.url, {'search': text})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{self.url}` с параметром `search` '
+            'возвращает ответ со статусом 200.'
+        )
+        return [title['name'] for title in response.json()['results']]
+
+    def test_01_search_morphology_and_case(self, admin_client, client):
+        create_titles(admin_client)
+        assert self.search(client, 'терминатора') == ['Терминатор'], (
+            'Поиск по произведениям должен учитывать словоформы.'
+        )
+        assert self.search(client, 'КРЕПКОГО') == ['Крепкий орешек'], (
+            'Поиск по произведениям не должен зависеть от регистра.'
+        )
+
+    def test_02_search_genre_category_and_rank(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        assert self.search(client, 'драма') == ['Крепкий орешек'], (
+            'Поиск должен учитывать названия жанров произведения.'
+        )
+        assert self.search(client, 'книги') == ['Крепкий орешек'], (
+            'Поиск должен учитывать название категории произведения.'
+        )
+        admin_client.post(self.url, data={
+            'name': 'Фильм о фильме',
+            'year': 2000,
+            'genre': ['comedy'],
+            'category': 'books',
+            'description': 'Без описания',
+        })
+        assert self.search(client, 'фильм') == [
+            'Фильм о фильме', 'Терминатор'
+        ], (
+            'Совпадения в названии произведения должны ранжироваться выше '
+            'совпадений в категории.'
+        )
+
+    def test_03_search_index_follows_changes(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(
+            f'{self.url}{titles[0]["id"]}/', data={'name': 'Хищник'}
+        )
+        assert self.search(client, 'хищник') == ['Хищник'], (
+            'Поисковый индекс должен обновляться при изменении произведения.'
+        )
+        assert self.search(client, 'терминатор') == []
+
+        admin_client.delete(f'{self.url}{titles[1]["id"]}/')
+        assert self.search(client, 'орешек') == [], (
+            'Удалённое произведение не должно находиться поиском.'
+        )
@@ -0,0 +1,62 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_reviews, create_single_comment
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10CursorPagination:
+
+    def get(self, client, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}` с параметром `cursor` '
+            'возвращает ответ со статусом 200.'
+        )
+        return response.json(), len(queries)
+
+    def test_01_comments_cursor_pages(self, admin_client, user, user_client):
+        reviews, titles = create_reviews(admin_client, {user: user_client})
+        title_id, review_id = titles[0]['id'], reviews[0]['id']
+        created = [
+            create_single_comment(
+                user_client, title_id, review_id, f'comment {idx}'
+            ).json()['id']
+            for idx in range(10)
+        ]
+        url = f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+
+        first, first_queries = self.get(user_client, url, {'cursor': ''})
+        assert 'count' not in first, (
+            'В режиме `cursor` ответ не должен содержать `count`.'
+        )
+        assert first['previous'] is None
+        second, second_queries = self.get(user_client, first['next'])
+        assert second['next'] is None
+        ids = [obj['id'] for obj in first['results'] + second['results']]
+        assert ids == created[::-1], (
+            'В режиме `cursor` комментарии должны отдаваться от новых к '
+            'старым без пропусков и повторов.'
+        )
+        assert second_queries == first_queries, (
+            'Вторая страница в режиме `cursor` должна стоить столько же '
+            'запросов, сколько первая.'
+        )
+
+        back, _ = self.get(user_client, second['previous'])
+        assert back['results'] == first['results'], (
+            'Ссылка `previous` должна вести на предыдущую страницу.'
+        )
+
+    def test_02_invalid_cursor(self, client):
+        response = client.get('/api/v1/titles/', {'cursor': 'broken'})
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_03_page_number_mode_unchanged(self, admin_client, client):
+        create_reviews(admin_client, {})
+        data, _ = self.get(client, '/api/v1/titles/')
+        assert data['count'] == 2
@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import RowCount, Title
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ListCounts:
+
+    def get(self, client, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        assert response.status_code == HTTPStatus.OK
+        count_queries = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT COUNT(*)')
+        ]
+        return response.json()['count'], count_queries
+
+    @pytest.fixture(autouse=True)
+    def no_response_cache(self, settings):
+        # Иначе повторный анонимный запрос отдаётся из кэша ответов, и
+        # пагинация не вызывается.
+        settings.RESPONSE_CACHE_TIMEOUT = 0
+
+    def test_01_unfiltered_count_from_counter(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        self.get(client, '/api/v1/titles/')
+        RowCount.objects.filter(table=Title._meta.db_table).update(count=42)
+        count, count_queries = self.get(client, '/api/v1/titles/')
+        assert count == 42 and not count_queries, (
+            'Нефильтрованный список произведений должен брать `count` из '
+            'RowCount без SELECT COUNT(*).'
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        count, _ = self.get(client, '/api/v1/titles/')
+        assert count == 41, (
+            'Счётчик произведений должен уменьшаться при удалении.'
+        )
+
+    def test_02_filtered_count_cache(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        count, count_queries = self.get(client, url, {'genre': 'horror'})
+        assert count == 1 and len(count_queries) == 1
+        count, count_queries = self.get(client, url, {'genre': 'horror'})
+        assert count == 1 and not count_queries, (
+            'Повторный запрос с тем же набором фильтров должен брать '
+            '`count` из кэша.'
+        )
+
+        admin_client.patch(f'{url}{titles[1]["id"]}/', data={
+            'genre': ['horror']
+        })
+        count, _ = self.get(client, url, {'genre': 'horror'})
+        assert count == 2, (
+            'Закэшированный `count` должен сбрасываться при изменении '
+            'произведений.'
+        )
+
+        count, count_queries = self.get(
+            client, url, {'genre': 'horror', 'exact_count': 1}
+        )
+        assert count == 2 and len(count_queries) == 1, (
+            'С параметром `exact_count=1` `count` должен считаться точно.'
+        )
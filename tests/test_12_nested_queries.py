@@ -0,0 +1,59 @@
+import pytest
+
+from tests.utils import create_comments
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12NestedQueries:
+    """Родители вложенных маршрутов загружаются один раз за запрос."""
+
+    @pytest.fixture
+    def objects(self, admin_client, user, user_client, moderator,
+                moderator_client):
+        comments, reviews, titles = create_comments(
+            admin_client, {user: user_client, moderator: moderator_client}
+        )
+        base = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        return {
+            'reviews': base,
+            'review': f'{base}{reviews[0]["id"]}/',
+            'comments': f'{base}{reviews[0]["id"]}/comments/',
+            'comment': f'{base}{reviews[0]["id"]}/comments/'
+                       f'{comments[0]["id"]}/',
+        }
+
+    # Родитель + объекты страницы; пользователь токена уже в LRU после
+    # create_comments, count для отзывов берётся из хранимого
+    # review_count произведения.
+    def test_01_review_list(self, objects, user_client,
+                            django_assert_num_queries):
+        with django_assert_num_queries(2):
+            user_client.get(objects['reviews'])
+
+    def test_02_review_detail(self, objects, user_client,
+                              django_assert_num_queries):
+        with django_assert_num_queries(2):
+            user_client.get(objects['review'])
+
+    # + проверка дубликата, транзакция, INSERT и UPDATE рейтинга.
+    def test_03_review_create(self, objects, admin_client,
+                              django_assert_num_queries):
+        with django_assert_num_queries(5):
+            admin_client.post(objects['reviews'], {'text': 'x', 'score': 3})
+
+    # Отзыв и произведение загружаются одним JOIN.
+    def test_04_comment_create(self, objects, user_client,
+                               django_assert_num_queries):
+        with django_assert_num_queries(2):
+            user_client.post(objects['comments'], {'text': 'x'})
+
+    def test_05_comment_detail(self, objects, user_client,
+                               django_assert_num_queries):
+        with django_assert_num_queries(2):
+            user_client.get(objects['comment'])
+
+    def test_06_missing_parent(self, objects, user_client):
+        response = user_client.get(
+            objects['comments'].replace('/titles/', '/titles/1000')
+        )
+        assert response.status_code == 404
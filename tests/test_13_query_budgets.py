@@ -0,0 +1,165 @@
+import json
+import os
+from http import HTTPStatus
+
+import pytest
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from api.codes import get_code_store
+from tests.utils import create_comments
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+with open(BUDGETS_PATH, encoding='utf-8') as file:
+    BUDGETS = json.load(file)
+
+TITLE = '/api/v1/titles/{title}/'
+REVIEWS = '/api/v1/titles/{title}/reviews/'
+REVIEW = REVIEWS + '{review}/'
+COMMENTS = REVIEW + 'comments/'
+COMMENT = COMMENTS + '{comment}/'
+
+# Запрос для каждой пары (маршрут, метод): клиент, путь и тело.
+REQUESTS = {
+    ('api:api-root', 'GET'): ('client', '/api/v1/', None),
+    ('api:signup', 'POST'): ('client', '/api/v1/auth/signup/', {
+        'username': 'budget', 'email': 'budget@yamdb.fake'}),
+    ('api:token', 'POST'): ('client', '/api/v1/auth/token/', {
+        'username': 'TestUser', 'confirmation_code': '{code}'}),
+    ('api:throttles', 'GET'): (
+        'admin_client', '/api/v1/auth/throttles/', None),
+    ('api:users-me', 'GET'): ('user_client', '/api/v1/users/me/', None),
+    ('api:users-me', 'PATCH'): ('user_client', '/api/v1/users/me/', {
+        'bio': 'new bio'}),
+    ('api:user-list', 'GET'): ('admin_client', '/api/v1/users/', None),
+    ('api:user-list', 'POST'): ('admin_client', '/api/v1/users/', {
+        'username': 'budget', 'email': 'budget@yamdb.fake'}),
+    ('api:user-detail', 'GET'): (
+        'admin_client', '/api/v1/users/TestUser/', None),
+    ('api:user-detail', 'PATCH'): (
+        'admin_client', '/api/v1/users/TestUser/', {'bio': 'new bio'}),
+    ('api:user-detail', 'DELETE'): (
+        'admin_client', '/api/v1/users/TestUser/', None),
+    ('api:categories-list', 'GET'): ('client', '/api/v1/categories/', None),
+    ('api:categories-list', 'POST'): ('admin_client', '/api/v1/categories/', {
+        'name': 'Музыка', 'slug': 'music'}),
+    ('api:categories-detail', 'DELETE'): (
+        'admin_client', '/api/v1/categories/books/', None),
+    ('api:genres-list', 'GET'): ('client', '/api/v1/genres/', None),
+    ('api:genres-list', 'POST'): ('admin_client', '/api/v1/genres/', {
+        'name': 'Рок', 'slug': 'rock'}),
+    ('api:genres-detail', 'DELETE'): (
+        'admin_client', '/api/v1/genres/drama/', None),
+    ('api:titles-list', 'GET'): ('client', '/api/v1/titles/', None),
+    ('api:titles-list', 'POST'): ('admin_client', '/api/v1/titles/', {
+        'name': 'Чужой', 'year': 1979, 'genre': ['horror', 'drama'],
+        'category': 'films', 'description': 'In space no one can hear'}),
+    ('api:titles-cards', 'GET'): (
+        'admin_client', '/api/v1/titles/cards/', None),
+    ('api:titles-bulk', 'POST'): ('admin_client', '/api/v1/titles/bulk/', [
+        {'name': 'Чужой', 'year': 1979, 'genre': ['horror', 'drama'],
+         'category': 'films', 'description': 'In space no one can hear'},
+        {'id': 1, 'name': 'Терминатор 2', 'genre': ['drama']},
+    ]),
+    ('api:titles-detail', 'GET'): ('client', TITLE, None),
+    ('api:titles-detail', 'PATCH'): ('admin_client', TITLE, {
+        'name': 'Терминатор 2'}),
+    ('api:titles-detail', 'DELETE'): ('admin_client', TITLE, None),
+    ('api:review-list', 'GET'): ('client', '/api/v1/reviews/', None),
+    ('api:review-detail', 'GET'): (
+        'client', '/api/v1/reviews/{review}/', None),
+    ('api:reviews-list', 'GET'): ('client', REVIEWS, None),
+    ('api:reviews-list', 'POST'): ('superuser_client', REVIEWS, {
+        'text': 'budget', 'score': 7}),
+    ('api:reviews-detail', 'GET'): ('client', REVIEW, None),
+    ('api:reviews-detail', 'PATCH'): ('user_client', REVIEW, {'score': 1}),
+    ('api:reviews-detail', 'DELETE'): ('moderator_client', REVIEW, None),
+    ('api:comments-list', 'GET'): ('client', COMMENTS, None),
+    ('api:comments-list', 'POST'): ('user_client', COMMENTS, {
+        'text': 'budget'}),
+    ('api:comments-detail', 'GET'): ('client', COMMENT, None),
+    ('api:comments-detail', 'PATCH'): ('user_client', COMMENT, {
+        'text': 'budget'}),
+    ('api:comments-detail', 'DELETE'): ('moderator_client', COMMENT, None),
+}
+
+# Ожидаемый код ответа по методу; POST, которые ничего не создают,
+# отвечают 200.
+EXPECTED_STATUS = {
+    'GET': HTTPStatus.OK,
+    'POST': HTTPStatus.CREATED,
+    'PATCH': HTTPStatus.OK,
+    'DELETE': HTTPStatus.NO_CONTENT,
+}
+POSTS_WITH_OK = {'api:signup', 'api:token', 'api:titles-bulk'}
+# Маршруты /reviews/ без произведения: get_title() отвечает 404.
+EXPECTED_NOT_FOUND = {'api:review-list', 'api:review-detail'}
+
+
+def route_names(patterns, namespace=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            yield from route_names(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def test_00_every_route_has_budget():
+    routes = {
+        name for name in route_names(get_resolver().url_patterns)
+        if name.startswith('api:')
+    }
+    assert routes == set(BUDGETS), (
+        'В tests/query_budgets.json должен быть бюджет запросов для каждого '
+        'маршрута из api/urls.py и только для них.'
+    )
+    cases = {(name, method) for name in BUDGETS for method in BUDGETS[name]}
+    assert cases == set(REQUESTS), (
+        'Для каждого бюджета должен быть описан проверочный запрос.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('name,method', sorted(REQUESTS))
+def test_01_query_budget(name, method, settings, request, admin_client,
+                         user, user_client, moderator, moderator_client,
+                         user_superuser, user_superuser_client):
+    authors = {user: user_client, moderator: moderator_client,
+               user_superuser: admin_client}
+    comments, reviews, titles = create_comments(admin_client, authors)
+    settings.QUERY_COUNT_HEADERS = True
+    # Письма отправляет обработчик очереди, а не запрос.
+    settings.EMAIL_OUTBOX_DELIVERY = 'command'
+
+    client_name, path, data = REQUESTS[(name, method)]
+    client = request.getfixturevalue(
+        'user_superuser_client' if client_name == 'superuser_client'
+        else client_name)
+    path = path.format(title=titles[0]['id'], review=reviews[0]['id'],
+                       comment=comments[0]['id'])
+    if isinstance(data, dict):
+        code = get_code_store().issue('TestUser')
+        data = {key: value.format(code=code) if isinstance(value, str)
+                else value for key, value in data.items()}
+    # Массивы (массовая запись) отправляются как JSON.
+    format = 'json' if isinstance(data, list) else None
+    response = getattr(client, method.lower())(path, data, format=format)
+    assert response.resolver_match.view_name == name
+    expected = EXPECTED_STATUS[method]
+    if name in POSTS_WITH_OK:
+        expected = HTTPStatus.OK
+    if name in EXPECTED_NOT_FOUND:
+        expected = HTTPStatus.NOT_FOUND
+    assert response.status_code == expected, (
+        f'{method} {path} ({name}) вернул {response.status_code} вместо '
+        f'{expected}: {response.content[:200]!r}'
+    )
+
+    queries = int(response['X-Query-Count'])
+    budget = BUDGETS[name][method]
+    assert queries <= budget, (
+        f'{method} {path} ({name}) выполнил {queries} SQL-запросов при '
+        f'бюджете {budget}.'
+    )
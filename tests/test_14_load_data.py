@@ -0,0 +1,131 @@
+import io
+import shutil
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+from reviews.management.loading import (TABLES, TableWriter,
+                                        dependency_levels)
+from reviews.models import Comment, Review, RowCount, Title
+
+DATA_DIR = settings.BASE_DIR / 'static' / 'data'
+
+
+def load_bulk(path, *args):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    call_command('load_data', str(path), '--bulk', '--batch-size', '10',
+                 *args, stdout=stdout, stderr=stderr)
+    return stdout.getvalue(), stderr.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14LoadData:
+
+    def test_01_bulk_load(self):
+        load_bulk(DATA_DIR)
+        assert Title.objects.count() == 32
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert RowCount.get_count(Title) == Title.objects.count(), (
+            'После `load_data --bulk` счётчики строк должны быть '
+            'пересчитаны.'
+        )
+        review = Review.objects.get(pk=1)
+        assert review.pub_date.year == 2019, (
+            'Дата публикации отзыва должна браться из CSV-файла.'
+        )
+        title = Title.objects.get(pk=review.title_id)
+        scores = list(title.reviews.values_list('score', flat=True))
+        assert title.review_count == len(scores)
+        assert title.rating == round(sum(scores) / len(scores))
+
+    def test_02_bulk_load_is_idempotent(self):
+        load_bulk(DATA_DIR)
+        Title.objects.filter(pk=1).update(name='Изменено')
+        load_bulk(DATA_DIR)
+        assert Review.objects.count() == 72
+        assert Title.objects.get(pk=1).name != 'Изменено', (
+            'Повторная загрузка должна обновлять существующие строки.'
+        )
+
+    def test_03_bulk_load_skips_invalid_rows(self, tmp_path):
+        shutil.copytree(DATA_DIR, tmp_path, dirs_exist_ok=True)
+        with open(tmp_path / 'review.csv', 'a', encoding='utf-8') as file:
+            file.write('\n1000,1,Текст,100,11,2019-09-24T21:08:21.567Z\n')
+            file.write('1001,9999,Текст,100,5,2019-09-24T21:08:21.567Z\n')
+        _, errors = load_bulk(tmp_path)
+        assert Review.objects.count() == 72
+        assert 'вне диапазона' in errors
+        assert 'Title с id 9999 не найден' in errors
+
+    def test_04_bulk_load_resumes_from_checkpoint(self, tmp_path,
+                                                  monkeypatch):
+        checkpoints = tmp_path / 'checkpoints'
+        write = TableWriter.write
+        calls = []
+
+        def crash_on_second_review_batch(writer, rows, existing):
+            if writer.table.model is Review:
+                calls.append(len(rows))
+                if len(calls) == 2:
+                    raise KeyboardInterrupt
+            return write(writer, rows, existing)
+
+        monkeypatch.setattr(TableWriter, 'write', crash_on_second_review_batch)
+        with pytest.raises(KeyboardInterrupt):
+            load_bulk(DATA_DIR, '--checkpoint-dir', str(checkpoints))
+        assert Review.objects.count() == 10
+        assert (checkpoints / 'review.json').exists(), (
+            'После каждой записанной пачки `load_data --bulk` должен '
+            'сохранять контрольную точку.'
+        )
+
+        monkeypatch.setattr(TableWriter, 'write', write)
+        output, _ = load_bulk(DATA_DIR, '--checkpoint-dir', str(checkpoints))
+        assert 'titles: уже загружена' in output
+        assert 'review: 62 строк' in output, (
+            'Прерванная загрузка должна продолжаться с последней '
+            'записанной пачки.'
+        )
+        assert Review.objects.count() == 72
+        assert Title.objects.get(pk=1).review_count == (
+            Review.objects.filter(title_id=1).count())
+        assert not checkpoints.exists(), (
+            'После успешной загрузки контрольные точки должны удаляться.'
+        )
+
+    def test_05_dependency_levels(self):
+        levels = [
+            [table.name for table in level]
+            for level in dependency_levels(TABLES)
+        ]
+        assert levels == [
+            ['category', 'genre', 'users'],
+            ['titles'],
+            ['genre_title', 'review'],
+            ['comments'],
+        ]
+
+    def test_06_bulk_load_with_jobs(self):
+        output, errors = load_bulk(DATA_DIR, '--jobs', '2', '--restart')
+        assert not errors
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert 'уровень 0 (category, genre, users)' in output, (
+            '`load_data --jobs` должен выводить время по уровням '
+            'зависимостей таблиц.'
+        )
+
+    def test_07_bulk_load_counts_unique_conflicts(self, tmp_path):
+        shutil.copytree(DATA_DIR, tmp_path, dirs_exist_ok=True)
+        with open(tmp_path / 'review.csv', 'a', encoding='utf-8') as file:
+            # Второй отзыв автора 100 на произведение 1.
+            file.write('\n1000,1,Текст,100,5,2019-09-24T21:08:21.567Z\n')
+        output, _ = load_bulk(tmp_path)
+        assert Review.objects.count() == 72
+        assert ('review: 72 строк' in output
+                and 'конфликтов уникальности 1' in output), (
+            'Строки, пропущенные INSERT из-за уникальности, не должны '
+            'считаться загруженными.'
+        )
@@ -0,0 +1,57 @@
+import io
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.management.commands.load_data import Command
+from reviews.models import Genre, RowCount
+
+
+def load_genres(path):
+    command = Command(stdout=io.StringIO(), stderr=io.StringIO())
+    with CaptureQueriesContext(connection) as queries:
+        command.load_genres(str(path))
+    return len(queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15GenreSlugs:
+    url = '/api/v1/genres/'
+
+    def test_01_genre_slug_from_name(self, admin_client):
+        response = admin_client.post(self.url, data={'name': 'Ужасы'})
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Если slug не передан, POST-запрос администратора к '
+            f'`{self.url}` должен создавать жанр со slug по названию.'
+        )
+        assert response.json()['slug'] == 'uzhasy'
+        response = admin_client.post(self.url, data={'name': 'Ужасы'})
+        assert response.json()['slug'] == 'uzhasy-1', (
+            'Выданный по названию slug должен быть уникальным.'
+        )
+
+    def test_02_load_genres_allocates_slugs_in_memory(self, tmp_path):
+        Genre.objects.create(name='Драма', slug='drama')
+        Genre.objects.create(name='Другая драма', slug='drama-1')
+        rows = ['id,name,slug', '1,Драма,drama', '2,Новая драма,drama']
+        rows += [f'{idx},Жанр {idx},' for idx in range(3, 23)]
+        (tmp_path / 'genre.csv').write_text(
+            '\n'.join(rows) + '\n', encoding='utf-8')
+
+        queries = load_genres(tmp_path)
+        assert queries <= 5, (
+            'Загрузка жанров не должна делать запрос на каждый '
+            'проверяемый slug.'
+        )
+        assert Genre.objects.get(name='Новая драма').slug == 'drama-2'
+        assert Genre.objects.get(name='Жанр 3').slug == 'zhanr-3'
+        assert RowCount.get_count(Genre) == Genre.objects.count()
+
+        slugs = dict(Genre.objects.values_list('name', 'slug'))
+        load_genres(tmp_path)
+        assert dict(Genre.objects.values_list('name', 'slug')) == slugs, (
+            'Повторная загрузка жанров не должна менять slug и создавать '
+            'дубликаты.'
+        )
@@ -0,0 +1,58 @@
+import csv
+import io
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+from reviews.management.loading import TABLES
+from reviews.models import Comment, Review, Title, User
+
+DATA_DIR = settings.BASE_DIR / 'static' / 'data'
+
+
+def command(name, *args):
+    call_command(name, *(str(arg) for arg in args),
+                 stdout=io.StringIO(), stderr=io.StringIO())
+
+
+def snapshot():
+    return {
+        table.name: list(table.model.objects.order_by('pk').values(
+            *(column.field for column in table.columns)))
+        for table in TABLES
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16DumpData:
+
+    def test_01_dump_matches_load_data_format(self, tmp_path):
+        command('load_data', DATA_DIR, '--bulk')
+        command('dump_data', tmp_path)
+        for name in ('category', 'genre', 'titles', 'genre_title', 'users',
+                     'review', 'comments'):
+            with open(DATA_DIR / f'{name}.csv', encoding='utf-8') as file:
+                expected = next(csv.reader(file))
+            with open(tmp_path / f'{name}.csv', encoding='utf-8') as file:
+                header = next(csv.reader(file))
+            assert set(expected) <= set(header), (
+                f'Файл `{name}.csv` из `dump_data` должен содержать '
+                'столбцы, которые ожидает `load_data`.'
+            )
+
+    @pytest.mark.parametrize('args', [(), ('--gzip', '--jobs', '3')])
+    def test_02_dump_and_load_round_trip(self, tmp_path, args):
+        command('load_data', DATA_DIR, '--bulk')
+        before = snapshot()
+        command('dump_data', tmp_path, '--chunk-size', '10', *args)
+
+        Comment.objects.all().delete()
+        Review.objects.all().delete()
+        Title.objects.all().delete()
+        User.objects.all().delete()
+        command('load_data', tmp_path, '--bulk')
+        assert snapshot() == before, (
+            'Данные, выгруженные `dump_data`, должны загружаться '
+            '`load_data --bulk` без изменений.'
+        )
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+
+from reviews.management.generating import DatabaseSink, split_by_zipf
+from reviews.management.loading import TABLES_BY_NAME
+from reviews.models import (Comment, Genre, Review, Title, TitleGenre,
+                            User)
+
+SIZES = ('--users', '200', '--titles', '100', '--genres', '5',
+         '--reviews', '1000', '--comments', '100')
+
+
+def command(name, *args):
+    call_command(name, *(str(arg) for arg in args),
+                 stdout=io.StringIO(), stderr=io.StringIO())
+
+
+def test_split_by_zipf():
+    parts = split_by_zipf(1000, 50, 1.1, cap=40)
+    assert sum(parts) == 1000
+    assert max(parts) == 40
+    assert parts == sorted(parts, reverse=True)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17GenerateData:
+
+    def check_generated(self):
+        assert User.objects.count() == 200
+        assert Title.objects.count() == 100
+        assert Review.objects.count() == 1000, (
+            'Сгенерированные отзывы должны соблюдать ограничение '
+            '`unique_title_author`.'
+        )
+        assert Comment.objects.count() == 100
+        assert TitleGenre.objects.count() >= 100
+        counts = sorted(
+            Review.objects.order_by().values('title')
+            .annotate(total=Count('pk'))
+            .values_list('total', flat=True), reverse=True)
+        assert counts[0] > 2 * counts[len(counts) // 2], (
+            'Популярность произведений должна быть неравномерной.'
+        )
+        title = Review.objects.first().title
+        assert title.review_count == title.reviews.count()
+
+    def test_01_generate_csv_and_load(self, tmp_path):
+        command('generate_data', tmp_path / 'a', *SIZES)
+        command('generate_data', tmp_path / 'b', *SIZES)
+        for name in ('users', 'titles', 'review', 'comments'):
+            first = (tmp_path / 'a' / f'{name}.csv').read_bytes()
+            assert first == (tmp_path / 'b' / f'{name}.csv').read_bytes(), (
+                'С одинаковым `--seed` генерация должна давать одинаковые '
+                'данные.'
+            )
+        command('load_data', tmp_path / 'a', '--bulk')
+        self.check_generated()
+
+    def test_02_generate_insert(self):
+        command('generate_data', '--insert', *SIZES)
+        self.check_generated()
+
+    def test_03_database_sink_counts_inserted_rows(self):
+        Genre.objects.create(id=1, name='Драма', slug='drama')
+        rows = [{'id': pk, 'name': f'Жанр {pk}', 'slug': f'genre-{pk}'}
+                for pk in (1, 2, 3)]
+        count = DatabaseSink().write(TABLES_BY_NAME['genre'], rows, 2)
+        assert count == 2, (
+            'Строки, пропущенные INSERT по уникальности, не должны '
+            'попадать в число записанных.'
+        )
+        assert Genre.objects.count() == 3
@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from reviews.models import Comment, Review
+
+SIZES = ('--users', '50', '--titles', '30', '--genres', '3',
+         '--reviews', '200', '--comments', '50')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18LoadTest:
+
+    def test_loadtest_reports_mix(self, tmp_path):
+        call_command('generate_data', '--insert', *SIZES,
+                     stdout=io.StringIO())
+        reviews, comments = Review.objects.count(), Comment.objects.count()
+        report_path = tmp_path / 'report.json'
+        stdout = io.StringIO()
+        # Общая in-memory база SQLite не ждёт блокировок, поэтому
+        # запросы идут по одному соединению.
+        call_command(
+            'loadtest', '--rate', '30', '--duration', '1', '--users', '3',
+            '--connections', '1',
+            '--mix', 'browse=1,review=1,comments=1',
+            '--json', str(report_path), stdout=stdout)
+
+        report = json.loads(report_path.read_text(encoding='utf-8'))
+        assert report['requests'] > 0
+        assert report['throughput'] > 0
+        assert sum(report['histogram'].values()) == report['requests']
+        assert report['errors'] == {}, (
+            'Сценарии нагрузки должны выполняться без ошибок.'
+        )
+        labels = report['labels']
+        assert {'titles', 'title', 'reviews'} <= labels.keys()
+        assert Review.objects.count() - reviews == labels.get(
+            'review POST', {}).get('count', 0)
+        assert Comment.objects.count() - comments == labels.get(
+            'comment POST', {}).get('count', 0)
+        assert 'задержки запросов' in stdout.getvalue()
+
+    def test_loadtest_needs_data(self):
+        with pytest.raises(CommandError):
+            call_command('loadtest', '--duration', '0.1',
+                         stdout=io.StringIO())
+
+    def test_loadtest_rejects_unknown_scenario(self):
+        call_command('generate_data', '--insert', *SIZES,
+                     stdout=io.StringIO())
+        with pytest.raises(CommandError):
+            call_command('loadtest', '--mix', 'browse=1,delete=1',
+                         stdout=io.StringIO())
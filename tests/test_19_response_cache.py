@@ -0,0 +1,131 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Title
+from reviews.signals import bulk_loaded
+from tests.utils import (create_comments, create_single_comment,
+                         create_single_review, create_titles)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19ResponseCache:
+
+    def get(self, client, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params)
+        assert response.status_code == HTTPStatus.OK
+        return response.get('X-Cache'), len(queries)
+
+    def test_01_anonymous_hit_without_queries(self, admin_client, client):
+        create_titles(admin_client)
+        url = '/api/v1/titles/'
+        assert self.get(client, url, {'year': 1984, 'name': 'Т'})[0] == 'MISS'
+        assert self.get(client, '/api/v1/titles/?name=Т&year=1984') == (
+            'HIT', 0), (
+            'Повторный анонимный запрос с тем же набором параметров '
+            'должен отдаваться из кэша без запросов к БД.'
+        )
+        assert self.get(client, url, {'year': 1985})[0] == 'MISS'
+
+    def test_02_authenticated_requests_bypass_cache(self, admin_client):
+        create_titles(admin_client)
+        for _ in range(2):
+            cache_status, _ = self.get(admin_client, '/api/v1/titles/')
+            assert cache_status is None, (
+                'Ответы авторизованным пользователям не кэшируются.'
+            )
+
+    def test_03_review_purges_only_its_title(self, admin_client, client,
+                                             user_client):
+        titles, _, _ = create_titles(admin_client)
+        first, second = (
+            f'/api/v1/titles/{title["id"]}/' for title in titles)
+        for url in (first, second, first + 'reviews/', second + 'reviews/'):
+            self.get(client, url)
+
+        create_single_review(user_client, titles[0]['id'], 'review', 9)
+
+        assert self.get(client, second)[0] == 'HIT'
+        assert self.get(client, second + 'reviews/')[0] == 'HIT', (
+            'Отзыв не должен сбрасывать кэш отзывов других произведений.'
+        )
+        assert self.get(client, first + 'reviews/')[0] == 'MISS'
+        response = client.get(first)
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['rating'] == 9, (
+            'Новый отзыв должен сбрасывать кэш своего произведения.'
+        )
+
+    def test_04_comment_purges_only_its_review(self, admin_client, client,
+                                               user, user_client,
+                                               moderator, moderator_client):
+        _, reviews, titles = create_comments(
+            admin_client, {user: user_client, moderator: moderator_client})
+        title = titles[0]['id']
+        url = '/api/v1/titles/{}/reviews/{}/comments/'
+        comments = [url.format(title, review['id']) for review in reviews]
+        reviews_url = f'/api/v1/titles/{title}/reviews/'
+        for cached_url in (*comments, reviews_url):
+            self.get(client, cached_url)
+
+        create_single_comment(user_client, title, reviews[0]['id'], 'new')
+
+        assert self.get(client, comments[1])[0] == 'HIT'
+        assert self.get(client, reviews_url)[0] == 'HIT'
+        response = client.get(comments[0])
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['count'] == 3
+
+    def test_05_reference_changes(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        detail = f'/api/v1/titles/{titles[0]["id"]}/'
+        for url in ('/api/v1/titles/', detail, '/api/v1/categories/',
+                    '/api/v1/genres/'):
+            self.get(client, url)
+
+        admin_client.delete('/api/v1/genres/horror/')
+
+        assert self.get(client, '/api/v1/categories/')[0] == 'HIT'
+        for url in ('/api/v1/genres/', '/api/v1/titles/', detail):
+            assert self.get(client, url)[0] == 'MISS', (
+                f'Удаление жанра должно сбрасывать кэш `{url}`.'
+            )
+
+    def test_06_bulk_load_purges_responses(self, admin_client, client):
+        create_titles(admin_client)
+        self.get(client, '/api/v1/categories/')
+        bulk_loaded.send(sender=None, models=[Title])
+        assert self.get(client, '/api/v1/categories/')[0] == 'MISS'
+
+    def test_07_tags_bumped_after_commit(self, admin_client, client):
+        create_titles(admin_client)
+        url = '/api/v1/categories/'
+        assert self.get(client, url)[0] == 'MISS'
+        with transaction.atomic():
+            Category.objects.create(name='Музыка', slug='music')
+            assert self.get(client, url)[0] == 'HIT', (
+                'До фиксации транзакции версия тега не должна меняться.'
+            )
+        assert self.get(client, url)[0] == 'MISS', (
+            'После фиксации транзакции закэшированный ответ должен '
+            'сбрасываться.'
+        )
+
+    def test_08_zero_padded_ids(self, admin_client, client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/0{title_id}/'
+        for path in (url, url + 'reviews/'):
+            self.get(client, path)
+
+        create_single_review(user_client, title_id, 'review', 9)
+        response = client.get(url)
+        assert (response['X-Cache'], response.json()['rating']) == (
+            'MISS', 9), (
+            'Теги ответа должны строиться из числового id, иначе '
+            '`/titles/05/` не сбрасывается записью в произведение 5.'
+        )
+        assert self.get(client, url + 'reviews/')[0] == 'MISS'
@@ -0,0 +1,174 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+from rest_framework.mixins import ListModelMixin
+from rest_framework.test import APIClient
+
+from django.core.cache import caches
+
+from api.cache import (VERSION_PREFIX, DurableFileBasedCache, SingleFlight,
+                       bump, expires_early, get_cache, get_versions)
+from tests.utils import create_titles
+
+URL = '/api/v1/titles/'
+
+
+def test_single_flight_runs_once():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'result'
+
+    with ThreadPoolExecutor(5) as pool:
+        leader = pool.submit(flight.do, 'key', compute)
+        started.wait()
+        followers = [pool.submit(flight.do, 'key', compute)
+                     for _ in range(4)]
+    assert leader.result() == ('result', False)
+    assert [future.result() for future in followers] == [
+        ('result', True)] * 4
+    assert len(calls) == 1
+    assert not flight.running('key')
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight.do('key', lambda: 1) == (1, False)
+
+
+def test_expires_early():
+    assert not expires_early(100, delta=1, beta=0, now=99)
+    assert expires_early(100, delta=1, beta=0, now=100)
+    assert expires_early(100, delta=10, beta=1e9, now=50)
+
+
+
+def bump_many(tag, count):
+    for _ in range(count):
+        bump(tag)
+
+
+def test_versions_shared_between_processes():
+    bump('test.tag')
+    before, = get_versions(['test.tag'])
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=bump_many, args=('test.tag', 50))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert get_versions(['test.tag']) == [before + 200], (
+        'Версии тегов должны храниться в общем для процессов кэше и '
+        'увеличиваться атомарно.'
+    )
+
+
+def test_reading_versions_writes_nothing():
+    tags = [f'reviews.title:pk={pk}' for pk in range(1000, 1100)]
+    assert get_versions(tags) == [0] * 100
+    assert get_cache().get_many(
+        [VERSION_PREFIX + tag for tag in tags]) == {}, (
+        'Чтение версий несуществующих тегов не должно записывать в кэш.'
+    )
+    bump(tags[0])
+    assert get_versions(tags[:2])[0] > 0 and get_versions(tags[:2])[1] == 0
+
+
+def test_durable_cache_culls_only_expired(tmp_path):
+    cache = DurableFileBasedCache(
+        str(tmp_path), {'OPTIONS': {'MAX_ENTRIES': 10}})
+    cache.cull_every = 1
+    cache.set_many({f'live{idx}': idx for idx in range(10)}, timeout=None)
+    cache.set_many({f'old{idx}': idx for idx in range(10)}, timeout=1)
+    time.sleep(1.1)
+    cache.set('new', 1)
+    assert cache.get_many([f'live{idx}' for idx in range(10)]) == {
+        f'live{idx}': idx for idx in range(10)}, (
+        'Кэш кодов и счётчиков не должен вытеснять живые записи.'
+    )
+    assert len(cache._list_cache_files()) == 11
+
+
+def test_codes_and_throttles_not_in_version_cache():
+    assert caches['auth'] is not get_cache()
+    assert isinstance(caches['auth'], DurableFileBasedCache)
+
+@pytest.fixture
+def slow_list(monkeypatch):
+    """ListModelMixin.list, который считает вызовы и думает 0.3 с."""
+    calls = []
+    original = ListModelMixin.list
+
+    def list_(self, request, *args, **kwargs):
+        calls.append(1)
+        time.sleep(0.3)
+        return original(self, request, *args, **kwargs)
+
+    monkeypatch.setattr(ListModelMixin, 'list', list_)
+    return calls
+
+
+def anonymous_get(url):
+    try:
+        return APIClient().get(url)
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20CacheStampede:
+
+    def test_concurrent_misses_coalesce(self, admin_client, slow_list,
+                                        settings):
+        settings.RESPONSE_CACHE_EARLY_BETA = 0
+        create_titles(admin_client)
+        with ThreadPoolExecutor(5) as pool:
+            responses = list(pool.map(anonymous_get, [URL] * 5))
+        assert len(slow_list) == 1, (
+            'Одновременные одинаковые промахи должны ждать одного '
+            'вычисления списка.'
+        )
+        assert sorted(response['X-Cache'] for response in responses) == [
+            'COALESCED'] * 4 + ['MISS']
+        assert len({response.content for response in responses}) == 1
+
+    def test_stale_while_revalidate(self, admin_client, client, slow_list,
+                                    settings):
+        settings.RESPONSE_CACHE_EARLY_BETA = 0
+        settings.RESPONSE_CACHE_TIMEOUT = 0.1
+        create_titles(admin_client)
+        assert client.get(URL)['X-Cache'] == 'MISS'
+        time.sleep(0.15)
+
+        with ThreadPoolExecutor(1) as pool:
+            refresh = pool.submit(anonymous_get, URL)
+            time.sleep(0.1)
+            stale = client.get(URL)
+            assert stale['X-Cache'] == 'STALE', (
+                'Пока истёкший ответ пересчитывается, остальным запросам '
+                'отдаётся старый ответ.'
+            )
+        assert refresh.result()['X-Cache'] == 'MISS'
+        assert len(slow_list) == 2
+
+    def test_early_expiration(self, admin_client, client, settings):
+        create_titles(admin_client)
+        settings.RESPONSE_CACHE_EARLY_BETA = 0
+        client.get(URL)
+        assert client.get(URL)['X-Cache'] == 'HIT'
+        settings.RESPONSE_CACHE_EARLY_BETA = 1e9
+        assert client.get(URL)['X-Cache'] == 'MISS', (
+            'При большом beta запись должна обновляться досрочно.'
+        )
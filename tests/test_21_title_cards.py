@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.cards import LfuCache, title_cards
+from tests.utils import create_single_review, create_titles
+
+
+def test_lfu_evicts_least_frequent_by_bytes():
+    cache = LfuCache(max_bytes=30)
+    cache.set('a', 'A', 10)
+    cache.set('b', 'B', 10)
+    cache.set('c', 'C', 10)
+    for _ in range(3):
+        cache.get('a')
+    cache.get('c')
+    cache.set('d', 'D', 10)
+    assert cache.get('b') is None, (
+        'Вытесняться должен наименее часто запрашиваемый ключ.'
+    )
+    assert [cache.get(key) for key in 'acd'] == ['A', 'C', 'D']
+    assert cache.size == 30 and cache.evictions == 1
+
+    cache.set('d', 'D' * 2, 20)
+    assert cache.size <= 30 and cache.get('d') == 'DD'
+    assert cache.get('a') == 'A', (
+        'При нехватке места первым вытесняется менее частый ключ.'
+    )
+    assert not cache.set('big', 'x', 31)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21TitleCards:
+
+    def get(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        return response.json(), len(queries)
+
+    def test_card_hits_skip_title_queries(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        # Пользователь токена попадает в LRU первым запросом.
+        user_client.get('/api/v1/users/me/')
+        first, cold_queries = self.get(user_client, url)
+        second, warm_queries = self.get(user_client, url)
+        assert first == second
+        assert warm_queries == cold_queries - 2, (
+            'Карточка из кэша не должна запрашивать произведение и жанры.'
+        )
+        stats = title_cards.stats()
+        assert stats['misses'] == 1 and stats['local_hits'] == 1
+
+    def test_shared_tier(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        expected, _ = self.get(user_client, url)
+        # Другой процесс: пустой LFU, общий файловый уровень.
+        title_cards.local.clear()
+        assert self.get(user_client, url)[0] == expected
+        assert title_cards.stats()['shared_hits'] == 1
+
+    def test_invalidation(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        self.get(user_client, url)
+
+        create_single_review(user_client, titles[0]['id'], 'review', 4)
+        assert self.get(user_client, url)[0]['rating'] == 4, (
+            'Карточка должна сбрасываться при изменении отзывов.'
+        )
+        admin_client.patch(url, data={'genre': ['comedy']})
+        card, _ = self.get(user_client, url)
+        assert [genre['slug'] for genre in card['genre']] == ['comedy']
+        admin_client.patch('/api/v1/titles/{}/'.format(titles[1]['id']),
+                           data={'name': 'Другое'})
+        self.get(user_client, url)
+        stats = title_cards.stats()
+        assert stats['misses'] == 3 and stats['local_hits'] == 1, (
+            'Изменение другого произведения не должно сбрасывать карточку.'
+        )
+        assert stats['invalidations'] == 2
+
+    def test_stats_endpoint(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        self.get(user_client, f'/api/v1/titles/{titles[0]["id"]}/')
+        response = user_client.get('/api/v1/titles/cards/')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Счётчики кэша карточек доступны только администратору.'
+        )
+        stats, _ = self.get(admin_client, '/api/v1/titles/cards/')
+        assert stats == title_cards.stats()
+        assert stats['misses'] == 1
@@ -0,0 +1,98 @@
+import multiprocessing
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.cache import bump, model_tag
+from reviews.models import Category
+from tests.utils import create_titles
+
+
+def reference_queries(queries):
+    return [
+        query['sql'] for query in queries
+        if 'FROM "reviews_category"' in query['sql']
+        or 'FROM "reviews_genre"' in query['sql']
+        or 'JOIN "reviews_genre"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22ReferenceData:
+
+    def request(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(url, data=data)
+        return response, reference_queries(queries)
+
+    def test_lists_from_snapshot(self, admin_client):
+        create_titles(admin_client)
+        self.request(admin_client.get, '/api/v1/genres/')
+        for url in ('/api/v1/genres/', '/api/v1/categories/'):
+            self.request(admin_client.get, url)
+            response, queries = self.request(admin_client.get, url)
+            assert response.status_code == HTTPStatus.OK
+            assert not queries, (
+                f'Список `{url}` должен строиться по снимку справочника '
+                'без запросов к БД.'
+            )
+        response, _ = self.request(
+            admin_client.get, '/api/v1/genres/', {'search': 'КОМ'})
+        assert response.json()['count'] == 1
+        assert response.json()['results'] == [
+            {'name': 'Комедия', 'slug': 'comedy'}]
+
+    def test_snapshot_follows_writes(self, admin_client):
+        create_titles(admin_client)
+        self.request(admin_client.get, '/api/v1/categories/')
+        admin_client.post('/api/v1/categories/', data={
+            'name': 'Музыка', 'slug': 'music'})
+        Category.objects.get(slug='films').delete()
+        response, _ = self.request(admin_client.get, '/api/v1/categories/')
+        assert [row['slug'] for row in response.json()['results']] == [
+            'books', 'music']
+
+    def test_snapshot_follows_other_processes(self, admin_client):
+        create_titles(admin_client)
+        self.request(admin_client.get, '/api/v1/categories/')
+        # Запись «в другом процессе»: строка меняется без сигналов, а
+        # версия тега увеличивается в дочернем процессе.
+        Category.objects.filter(slug='books').update(name='Новые книги')
+        process = multiprocessing.get_context('fork').Process(
+            target=bump, args=(model_tag(Category),))
+        process.start()
+        process.join()
+        response, _ = self.request(admin_client.get, '/api/v1/categories/')
+        assert 'Новые книги' in [
+            row['name'] for row in response.json()['results']], (
+            'Снимок справочника должен перечитываться после записи в '
+            'любом процессе.'
+        )
+
+    def test_slug_resolution_and_filter(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        response, queries = self.request(
+            admin_client.patch, f'/api/v1/titles/{titles[0]["id"]}/',
+            {'genre': ['drama', 'comedy'], 'category': 'books'})
+        assert response.status_code == HTTPStatus.OK
+        assert not any('"slug" =' in query for query in queries), (
+            'Slug жанров и категории должны разрешаться по снимку '
+            'справочника.'
+        )
+        response, _ = self.request(
+            admin_client.patch, f'/api/v1/titles/{titles[0]["id"]}/',
+            {'category': 'nope'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        response, queries = self.request(
+            client.get, '/api/v1/titles/', {'genre': 'drama'})
+        assert response.json()['count'] == 2
+        assert not [query for query in queries
+                    if '_prefetch_related_val' not in query], (
+            'Фильтр по slug жанра не должен обращаться к таблице жанров.'
+        )
+        response, _ = self.request(
+            client.get, '/api/v1/titles/', {'category': 'nope'})
+        assert response.json()['count'] == 0
@@ -0,0 +1,95 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+from api.serializers import BatchSlugRelatedField
+from reviews.models import Genre, TitleGenre
+from tests.utils import create_titles
+
+URL = '/api/v1/titles/'
+
+
+class GenreListSerializer(serializers.Serializer):
+    genre = BatchSlugRelatedField(
+        slug_field='slug', queryset=Genre.objects.all(), many=True)
+
+
+def statements(queries, prefix):
+    return [query['sql'] for query in queries
+            if query['sql'].startswith(prefix)]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23TitleGenresBatch:
+
+    def test_01_one_in_query(self, admin_client):
+        create_titles(admin_client)
+        serializer = GenreListSerializer(
+            data={'genre': ['horror', 'drama', 'comedy', 'drama']})
+        with CaptureQueriesContext(connection) as queries:
+            assert serializer.is_valid(), serializer.errors
+        assert len(queries) == 1 and ' IN (' in queries[0]['sql'], (
+            'Все slug списка должны разрешаться одним запросом IN.'
+        )
+        assert [genre.slug for genre in serializer.validated_data[
+            'genre']] == ['horror', 'drama', 'comedy']
+
+    def test_02_all_unknown_slugs_reported(self, admin_client):
+        create_titles(admin_client)
+        response = admin_client.post(URL, data={
+            'name': 'Чужой', 'year': 1979, 'category': 'films',
+            'genre': ['horror', 'space', 'drama', 'aliens']})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = ' '.join(response.json()['genre'])
+        assert 'space' in errors and 'aliens' in errors, (
+            'В ответе должны быть перечислены все неизвестные slug жанров.'
+        )
+
+    def test_03_through_rows_in_one_insert(self, admin_client, client):
+        create_titles(admin_client)
+        for index in range(10):
+            admin_client.post('/api/v1/genres/', data={
+                'name': f'Жанр {index}', 'slug': f'genre-{index}'})
+        slugs = [f'genre-{index}' for index in range(10)]
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(URL, data={
+                'name': 'Чужой', 'year': 1979, 'category': 'films',
+                'description': 'In space', 'genre': slugs})
+        assert response.status_code == HTTPStatus.CREATED
+        title_id = response.json()['id']
+        assert len(statements(queries, 'INSERT INTO "reviews_titlegenre"')
+                   ) == 1
+        assert not statements(queries, 'SELECT "reviews_titlegenre"'), (
+            'Для нового произведения существующие жанры не запрашиваются.'
+        )
+        assert TitleGenre.objects.filter(title_id=title_id).count() == 10
+
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.patch(f'{URL}{title_id}/', data={
+                'genre': ['genre-0', 'genre-1', 'horror']})
+        assert response.status_code == HTTPStatus.OK
+        assert sorted(response.json()['genre']) == [
+            'genre-0', 'genre-1', 'horror']
+        assert len(statements(queries, 'DELETE FROM "reviews_titlegenre"')
+                   ) == 1
+        assert len(statements(queries, 'INSERT INTO "reviews_titlegenre"')
+                   ) == 1
+        assert len(queries) <= 14, (
+            'Удаление жанров не должно перестраивать поисковый индекс '
+            'на каждую строку.'
+        )
+        # Одна переиндексация после сохранения произведения, одна — на
+        # замену жанров.
+        assert len(statements(
+            queries, 'DELETE FROM reviews_title_search')) == 2
+
+        response = client.get(URL, {'search': 'Ужасы'})
+        assert title_id in [title['id'] for title in response.json()[
+            'results']], (
+            'Поисковый индекс должен обновляться после записи жанров.'
+        )
+        response = client.get(f'{URL}{title_id}/')
+        assert len(response.json()['genre']) == 3
@@ -0,0 +1,174 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import RowCount, Title, TitleGenre
+from reviews.signals import bulk_loaded
+from tests.utils import create_titles
+
+URL = '/api/v1/titles/bulk/'
+
+
+def item(index, **fields):
+    return {'name': f'Фильм {index}', 'year': 2000, 'category': 'films',
+            'description': 'описание', 'genre': ['horror'], **fields}
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24TitlesBulk:
+
+    def test_01_admin_only(self, client, user_client, moderator_client):
+        response = client.post(URL, json.dumps([item(1)]),
+                               content_type='application/json')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        for other_client in (user_client, moderator_client):
+            response = other_client.post(URL, [item(1)], format='json')
+            assert response.status_code == HTTPStatus.FORBIDDEN
+
+    def test_02_json_array_upsert(self, admin_client, client):
+        titles, _, _ = create_titles(admin_client)
+        existing = titles[0]['id']
+        client.get(f'/api/v1/titles/{existing}/')
+        response = admin_client.post(URL, [
+            item(1, genre=['horror', 'comedy']),
+            item(2, category='nope', genre=['nope', 'drama', 'void']),
+            {'id': existing, 'name': 'Терминатор 2', 'genre': ['drama']},
+            item(3, id=1000),
+            {'id': existing, 'name': 'повтор'},
+            'не объект',
+        ], format='json')
+        assert response.status_code == HTTPStatus.OK
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [
+            'created', 'error', 'updated', 'created', 'error', 'error']
+        assert set(results[1]['errors']) == {'category', 'genre'}
+        assert len(results[1]['errors']['genre']) == 2, (
+            'Об ошибках элемента должно сообщаться сразу обо всех.'
+        )
+        assert results[3]['id'] == 1000
+        stats = response.json()['stats']
+        assert {key: stats[key] for key in (
+            'received', 'created', 'updated', 'errors', 'chunks')} == {
+            'received': 6, 'created': 2, 'updated': 1, 'errors': 3,
+            'chunks': 1}
+
+        created = client.get(f'/api/v1/titles/{results[0]["id"]}/').json()
+        assert sorted(genre['slug'] for genre in created['genre']) == [
+            'comedy', 'horror']
+        updated = Title.objects.get(pk=existing)
+        assert updated.name == 'Терминатор 2' and updated.year == 1984
+        assert list(TitleGenre.objects.filter(title=updated).values_list(
+            'genre__slug', flat=True)) == ['drama']
+        cached = client.get(f'/api/v1/titles/{existing}/').json()
+        assert cached['name'] == 'Терминатор 2', (
+            'Массовое обновление должно сбрасывать карточку произведения.'
+        )
+        response = client.get('/api/v1/titles/', {'search': 'описание'})
+        assert response.json()['count'] == 2, (
+            'Новые произведения должны попадать в поисковый индекс.'
+        )
+        assert client.get('/api/v1/titles/').json()['count'] == 4
+
+    def test_03_ndjson_chunks(self, admin_client):
+        create_titles(admin_client)
+        lines = [json.dumps(item(index)) for index in range(5)]
+        lines.insert(2, '{"name": ')
+        response = admin_client.post(
+            f'{URL}?chunk_size=2', data='\n'.join(lines).encode(),
+            content_type='application/x-ndjson')
+        assert response.status_code == HTTPStatus.OK
+        stats = response.json()['stats']
+        assert stats['received'] == 6 and stats['chunks'] == 3
+        assert stats['created'] == 5 and stats['errors'] == 1
+        error = response.json()['results'][2]
+        assert error['status'] == 'error'
+        assert 'Строка 3' in error['errors']['non_field_errors'][0]
+
+    def test_04_queries_per_chunk(self, admin_client):
+        create_titles(admin_client)
+        counts = []
+        for size in (10, 100):
+            with CaptureQueriesContext(connection) as queries:
+                response = admin_client.post(URL, [
+                    item(f'{size}-{index}') for index in range(size)
+                ], format='json')
+            assert response.json()['stats']['created'] == size
+            counts.append(len(queries))
+        assert counts[0] == counts[1], (
+            'Число запросов не должно расти с числом элементов в пачке.'
+        )
+
+    def test_05_bad_requests(self, admin_client):
+        for path, data in ((f'{URL}?chunk_size=0', [item(1)]),
+                           (f'{URL}?chunk_size=x', [item(1)]),
+                           (URL, item(1)),
+                           (URL, 'строка'),
+                           (URL, 42)):
+            response = admin_client.post(path, data, format='json')
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                'Тело запроса, которое не массив и не NDJSON, должно '
+                'отклоняться целиком, а не разбираться по символам.'
+            )
+        assert not Title.objects.exists()
+
+    def test_06_concurrent_id_conflict(self, admin_client, monkeypatch):
+        titles, _, _ = create_titles(admin_client)
+        taken = titles[0]['id']
+        # Произведение с этим id «создано другим запросом» после того,
+        # как пачка проверила существующие id.
+        monkeypatch.setattr(Title.objects, 'in_bulk', lambda ids: {})
+        response = admin_client.post(
+            URL + '?chunk_size=1', [item(1), item(2, id=taken)],
+            format='json')
+        assert response.status_code == HTTPStatus.OK
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [
+            'created', 'error'], (
+            'Конфликт id при записи пачки должен возвращаться ошибкой '
+            'её элементов, а не ответом 500.'
+        )
+        assert results[1]['id'] == taken
+        assert Title.objects.filter(name='Фильм 1').exists()
+
+    def test_07_backend_without_returning_pks(self, admin_client,
+                                              monkeypatch):
+        create_titles(admin_client)
+        monkeypatch.setattr(connection, 'vendor', 'mysql')
+        response = admin_client.post(
+            URL, [item(1), item(2)], format='json')
+        assert response.status_code == HTTPStatus.OK
+        ids = [result['id'] for result in response.json()['results']]
+        assert [Title.objects.get(pk=pk).name for pk in ids] == [
+            'Фильм 1', 'Фильм 2']
+        assert RowCount.get_count(Title) == Title.objects.count()
+
+    def test_08_bulk_loaded_once(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        sent = []
+        bulk_loaded.connect(
+            lambda sender, models, **kwargs: sent.append(models),
+            weak=False, dispatch_uid='test_08')
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = admin_client.post(URL + '?chunk_size=2', [
+                    item(1), item(2),
+                    {'id': titles[0]['id'], 'genre': ['drama']},
+                    {'id': titles[1]['id'], 'genre': ['comedy']},
+                    item(3),
+                ], format='json')
+        finally:
+            bulk_loaded.disconnect(dispatch_uid='test_08')
+        assert response.json()['stats']['chunks'] == 3
+        assert len(sent) == 1, (
+            'bulk_loaded отправляется один раз на запрос, а не на пачку.'
+        )
+        deletes = [query['sql'] for query in queries
+                   if query['sql'].startswith(
+                       'DELETE FROM "reviews_titlegenre"')]
+        assert len(deletes) == 1
+        assert list(TitleGenre.objects.filter(
+            title_id=titles[0]['id']).values_list(
+                'genre__slug', flat=True)) == ['drama']
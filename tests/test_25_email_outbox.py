@@ -0,0 +1,211 @@
+import io
+import re
+import socketserver
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from api.outbox import Outbox, enqueue, worker
+from reviews.models import OutboxEmail
+
+URL_SIGNUP = '/api/v1/auth/signup/'
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.connections += 1
+        recipients = []
+        self.reply('220 stub')
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 stub')
+            elif command.startswith('RCPT'):
+                address = re.search(r'<(.*)>', line.decode()).group(1)
+                if address in stub.reject:
+                    self.reply('550 mailbox unavailable')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 go ahead')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                with stub.lock:
+                    stub.messages.append((recipients, data.decode()))
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                if command.startswith(('MAIL', 'RSET')):
+                    recipients = []
+                self.reply('250 OK')
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """Локальный SMTP-сервер, запоминающий соединения и письма."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SmtpHandler)
+        self.stub = self
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.reject = set()
+
+    @property
+    def recipients(self):
+        return sorted(address for rcpts, _ in self.messages
+                      for address in rcpts)
+
+
+@pytest.fixture
+def smtp(settings):
+    server = SmtpStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST = '127.0.0.1'
+    settings.EMAIL_PORT = server.server_address[1]
+    settings.EMAIL_OUTBOX_DELIVERY = 'command'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def signup(client, index):
+    return client.post(URL_SIGNUP, {
+        'username': f'user{index}', 'email': f'user{index}@yamdb.fake'})
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25EmailOutbox:
+
+    def test_01_signup_only_enqueues(self, client, smtp):
+        response = signup(client, 1)
+        assert response.status_code == 200
+        assert smtp.connections == 0, (
+            'Регистрация не должна отправлять письмо в запросе.'
+        )
+        queued = OutboxEmail.objects.get()
+        assert queued.email == 'user1@yamdb.fake'
+        assert 'confirmation_code' in queued.body
+
+    def test_02_batch_over_one_connection(self, client, smtp):
+        for index in range(5):
+            signup(client, index)
+        assert Outbox(batch_size=10).drain() == (5, 0)
+        assert smtp.connections == 1, (
+            'Пачка писем должна уходить через одно соединение.'
+        )
+        assert smtp.recipients == [
+            f'user{index}@yamdb.fake' for index in range(5)]
+        assert not OutboxEmail.objects.exists()
+
+        for index in range(5, 10):
+            signup(client, index)
+        assert Outbox(batch_size=2).drain() == (5, 0)
+        assert smtp.connections == 4
+
+    def test_03_repeat_requests_coalesce(self, client, smtp):
+        for _ in range(3):
+            signup(client, 1)
+        assert OutboxEmail.objects.get().revision == 3
+        Outbox().drain()
+        assert len(smtp.messages) == 1, (
+            'Повторные запросы на один адрес должны давать одно письмо.'
+        )
+        code = re.search(r'confirmation_code: (\S+)', smtp.messages[0][1])
+        response = client.post('/api/v1/auth/token/', {
+            'username': 'user1', 'confirmation_code': code.group(1)})
+        assert response.status_code == 200, (
+            'Отправляться должен последний код подтверждения.'
+        )
+
+    def test_04_retry_with_backoff(self, client, smtp, settings):
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 3
+        smtp.reject.add('user1@yamdb.fake')
+        signup(client, 1)
+        signup(client, 2)
+        assert Outbox().drain() == (1, 1)
+        failed = OutboxEmail.objects.get()
+        assert failed.attempts == 1
+        assert failed.last_error
+        delay = failed.next_attempt_at - timezone.now()
+        assert timedelta(seconds=25) < delay <= timedelta(seconds=30)
+        assert Outbox().drain() == (0, 0), (
+            'Отложенное письмо не должно отправляться до своего срока.'
+        )
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        Outbox().drain()
+        failed.refresh_from_db()
+        assert failed.attempts == 2
+        delay = failed.next_attempt_at - timezone.now()
+        assert timedelta(seconds=55) < delay <= timedelta(seconds=60), (
+            'Задержка повтора должна удваиваться.'
+        )
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        Outbox().drain()
+        failed.refresh_from_db()
+        assert failed.attempts == 3 and failed.next_attempt_at is None
+
+        smtp.reject.clear()
+        signup(client, 1)
+        assert Outbox().drain() == (1, 0), (
+            'Новый запрос должен возвращать письмо в очередь.'
+        )
+
+    def test_05_backend_down(self, client, smtp, settings):
+        signup(client, 1)
+        settings.EMAIL_PORT = 1
+        assert Outbox().drain() == (0, 1)
+        assert OutboxEmail.objects.get().attempts == 1
+
+    def test_06_replaced_while_sending(self, smtp):
+        enqueue('user1@yamdb.fake', 'код', 'первый')
+        outbox = Outbox()
+        emails = outbox.claim_batch()
+        enqueue('user1@yamdb.fake', 'код', 'второй')
+        assert outbox.send_batch(emails) == (1, 0)
+        assert OutboxEmail.objects.get().body == 'второй', (
+            'Письмо, заменённое во время отправки, должно остаться в '
+            'очереди.'
+        )
+        assert Outbox().claim_batch() != []
+
+    def test_07_command_and_worker(self, client, smtp, settings):
+        signup(client, 1)
+        call_command('send_emails', stdout=io.StringIO())
+        assert smtp.recipients == ['user1@yamdb.fake']
+
+        settings.EMAIL_OUTBOX_DELIVERY = 'thread'
+        try:
+            signup(client, 2)
+            for _ in range(100):
+                if len(smtp.messages) == 2:
+                    break
+                time.sleep(0.05)
+        finally:
+            worker.stop()
+        assert smtp.recipients == ['user1@yamdb.fake', 'user2@yamdb.fake'], (
+            'Фоновый поток должен отправлять письма после коммита.'
+        )
+
+    def test_08_eager_mode(self, client, settings):
+        signup(client, 1)
+        assert [message.to for message in mail.outbox] == [
+            ['user1@yamdb.fake']]
+        assert not OutboxEmail.objects.exists()
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import re
+import time
+
+import pytest
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.codes import CodeStore, get_code_store
+
+URL_SIGNUP = '/api/v1/auth/signup/'
+URL_TOKEN = '/api/v1/auth/token/'
+USER = {'username': 'coder', 'email': 'coder@yamdb.fake'}
+
+
+class FixedCodeStore(CodeStore):
+    def issue(self, username):
+        return 'fixed'
+
+    def verify(self, username, code):
+        return code == 'fixed'
+
+
+def signup(client):
+    response = client.post(URL_SIGNUP, USER)
+    assert response.status_code == 200
+    return re.search(r'confirmation_code: (\S+)', mail.outbox[-1].body)[1]
+
+
+def verify_and_exit(username, code):
+    os._exit(0 if get_code_store().verify(username, code) else 1)
+
+
+def exchange(client, code):
+    return client.post(URL_TOKEN, {
+        'username': USER['username'], 'confirmation_code': code})
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26ConfirmationCodes:
+
+    def test_01_code_is_single_use(self, client):
+        code = signup(client)
+        assert exchange(client, code).status_code == 200
+        assert exchange(client, code).status_code == 400, (
+            'Код подтверждения должен приниматься один раз.'
+        )
+
+    def test_02_new_code_replaces_old(self, client):
+        old = signup(client)
+        new = signup(client)
+        assert exchange(client, old).status_code == 400
+        assert exchange(client, new).status_code == 200
+
+    def test_03_code_expires(self, client, settings):
+        settings.CONFIRMATION_CODE_TTL = 1
+        code = signup(client)
+        time.sleep(1.1)
+        assert exchange(client, code).status_code == 400, (
+            'Просроченный код не должен приниматься.'
+        )
+
+    def test_04_attempts_are_limited(self, client, settings):
+        settings.CONFIRMATION_CODE_MAX_ATTEMPTS = 2
+        code = signup(client)
+        assert exchange(client, 'wrong').status_code == 400
+        assert exchange(client, code).status_code == 200
+        code = signup(client)
+        for _ in range(2):
+            exchange(client, 'wrong')
+        assert exchange(client, code).status_code == 400, (
+            'После исчерпания попыток код должен сбрасываться.'
+        )
+
+    def test_05_queries(self, client):
+        signup(client)
+        with CaptureQueriesContext(connection) as queries:
+            code = signup(client)
+        user_writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE'))
+            and 'reviews_user' in query['sql']]
+        assert user_writes == [], (
+            'Повторная регистрация не должна писать в таблицу пользователей.'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            assert exchange(client, code).status_code == 200
+        assert len(queries) == 1, (
+            'Обмен кода на токен должен делать один запрос к БД.'
+        )
+
+    def test_06_pluggable_store(self, client, settings):
+        settings.CONFIRMATION_CODE_STORE = (
+            'tests.test_26_confirmation_codes.FixedCodeStore')
+        assert signup(client) == 'fixed'
+        assert exchange(client, 'fixed').status_code == 200
+
+    def test_07_code_shared_between_processes(self, client):
+        code = signup(client)
+        process = multiprocessing.get_context('fork').Process(
+            target=verify_and_exit, args=(USER['username'], code))
+        process.start()
+        process.join()
+        assert process.exitcode == 0, (
+            'Код, выданный одним процессом, должен проверяться в другом.'
+        )
+        assert exchange(client, code).status_code == 400
+
+    def test_08_store_interface_is_abstract(self):
+        with pytest.raises(TypeError):
+            CodeStore()
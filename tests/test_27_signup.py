@@ -0,0 +1,74 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import SignupUserSerializer
+from reviews.models import User
+
+URL_SIGNUP = '/api/v1/auth/signup/'
+USER = {'username': 'signer', 'email': 'signer@yamdb.fake'}
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test27Signup:
+
+    def test_01_single_lookup(self, client, settings):
+        settings.EMAIL_OUTBOX_DELIVERY = 'command'
+        with CaptureQueriesContext(connection) as queries:
+            client.post(URL_SIGNUP, USER)
+        selects = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('SELECT')]
+        assert len(selects) == 1, (
+            'Регистрация должна искать пользователя одним запросом.'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(URL_SIGNUP, USER)
+        assert response.status_code == 200
+        assert len(queries) == 2, (
+            'Повторная регистрация — один SELECT и постановка письма.'
+        )
+
+    def test_02_conflicts_reported_together(self, client):
+        client.post(URL_SIGNUP, USER)
+        client.post(URL_SIGNUP, {'username': 'other',
+                                 'email': 'other@yamdb.fake'})
+        response = client.post(URL_SIGNUP, {
+            'username': 'signer', 'email': 'other@yamdb.fake'})
+        assert response.status_code == 400
+        assert set(response.json()) == {'username', 'email'}
+
+    def test_03_race_with_same_data(self):
+        serializer = SignupUserSerializer(data=USER)
+        assert serializer.is_valid()
+        created = User.objects.create(**USER)
+        assert serializer.save().pk == created.pk, (
+            'Параллельная регистрация тех же данных должна вернуть '
+            'созданного пользователя.'
+        )
+
+    def test_04_race_with_conflicting_data(self):
+        serializer = SignupUserSerializer(data=USER)
+        assert serializer.is_valid()
+        User.objects.create(username='signer', email='thief@yamdb.fake')
+        with pytest.raises(ValidationError) as error:
+            serializer.save()
+        assert set(error.value.detail) == {'username'}
+        assert User.objects.count() == 1
+
+    def test_05_write_count(self, client, settings):
+        settings.EMAIL_OUTBOX_DELIVERY = 'command'
+        for expected in (['INSERT INTO "reviews_user"'], []):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post(URL_SIGNUP, USER)
+            assert response.status_code == 200
+            writes = [query['sql'] for query in queries.captured_queries
+                      if query['sql'].startswith(WRITES)]
+            outbox = [sql for sql in writes if 'reviews_outboxemail' in sql]
+            assert len(outbox) == 1, 'Письмо ставится в очередь одной записью.'
+            assert [sql[:len(expected[0])] for sql in writes
+                    if sql not in outbox] == expected, (
+                'Регистрация пишет в БД только строку нового пользователя, '
+                'повторная — ничего, кроме письма в очередь.'
+            )
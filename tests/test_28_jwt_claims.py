@@ -0,0 +1,120 @@
+import multiprocessing
+import re
+
+import pytest
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import ClaimsJWTAuthentication, auth_tag
+from api.cache import bump
+from reviews.management.loading import refresh_derived_data
+from reviews.models import User
+
+USER = {'username': 'holder', 'email': 'holder@yamdb.fake'}
+
+
+def obtain_token(client):
+    client.post('/api/v1/auth/signup/', USER)
+    code = re.search(r'confirmation_code: (\S+)', mail.outbox[-1].body)[1]
+    response = client.post('/api/v1/auth/token/', {
+        'username': USER['username'], 'confirmation_code': code})
+    return response.json().removeprefix('token: ')
+
+
+def authenticate(token):
+    request = APIRequestFactory().get(
+        '/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    with CaptureQueriesContext(connection) as queries:
+        user, _ = ClaimsJWTAuthentication().authenticate(request)
+    return user, len(queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test28JwtClaims:
+
+    def test_01_claims_without_queries(self, client):
+        token = obtain_token(client)
+        assert AccessToken(token)['role'] == 'user'
+        user, queries = authenticate(token)
+        assert queries == 0, (
+            'Пользователь из свежего токена не должен загружаться из БД.'
+        )
+        assert (user.username, user.role, user.is_superuser) == (
+            'holder', 'user', False)
+
+    def test_02_role_change_makes_token_stale(self, client, admin_client):
+        token = obtain_token(client)
+        response = admin_client.patch(
+            '/api/v1/users/holder/', {'role': 'admin'})
+        assert response.status_code == 200
+        user, queries = authenticate(token)
+        assert (user.role, queries) == ('admin', 1), (
+            'После смены роли токен должен проверяться по БД.'
+        )
+        user, queries = authenticate(token)
+        assert (user.role, queries) == ('admin', 0), (
+            'Повторно пользователь должен браться из LRU.'
+        )
+        holder = APIClient()
+        holder.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = holder.post('/api/v1/categories/', {
+            'name': 'Музыка', 'slug': 'music'})
+        assert response.status_code == 201
+
+    def test_03_profile_edit_keeps_token_fresh(self, client):
+        token = obtain_token(client)
+        holder = APIClient()
+        holder.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = holder.patch('/api/v1/users/me/', {'bio': 'bio'})
+        assert response.status_code == 200
+        assert authenticate(token)[1] == 0
+
+    def test_04_deleted_user(self, client, admin_client):
+        token = obtain_token(client)
+        admin_client.delete('/api/v1/users/holder/')
+        with pytest.raises(AuthenticationFailed):
+            authenticate(token)
+
+    def test_05_plain_token_falls_back_to_db(self, user):
+        token = AccessToken.for_user(user)
+        assert authenticate(token) == (user, 1)
+        assert authenticate(token)[1] == 0
+
+    def test_06_deactivation_in_other_process(self, client):
+        token = obtain_token(client)
+        assert authenticate(token)[1] == 0
+        holder = User.objects.get(username=USER['username'])
+        # Блокировка «в другом процессе»: в этом сигналов нет.
+        User.objects.filter(pk=holder.pk).update(is_active=False)
+        process = multiprocessing.get_context('fork').Process(
+            target=bump, args=(auth_tag(holder.pk),))
+        process.start()
+        process.join()
+        with pytest.raises(AuthenticationFailed):
+            authenticate(token)
+
+    def test_07_lru_entries_expire(self, user, settings):
+        settings.JWT_USER_CACHE_TTL = 0
+        token = AccessToken.for_user(user)
+        assert authenticate(token)[1] == 1
+        assert authenticate(token)[1] == 1, (
+            'Запись LRU пользователей должна истекать через '
+            'JWT_USER_CACHE_TTL.'
+        )
+
+    def test_08_bulk_update_makes_tokens_stale(self, client):
+        token = obtain_token(client)
+        assert authenticate(token)[1] == 0
+        # Так пишет пользователей загрузчик: без сигналов post_save, с
+        # bulk_loaded после записи.
+        User.objects.filter(username=USER['username']).update(role='admin')
+        refresh_derived_data([User])
+        user, queries = authenticate(token)
+        assert (user.role, queries) == ('admin', 1), (
+            'После массовой записи пользователей токены должны '
+            'проверяться по БД.'
+        )
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.throttling import SlidingWindowThrottle
+
+URL_SIGNUP = '/api/v1/auth/signup/'
+URL_TOKEN = '/api/v1/auth/token/'
+URL_STATS = '/api/v1/auth/throttles/'
+
+
+def signup(client, index, ip='10.0.0.1'):
+    return client.post(URL_SIGNUP, {
+        'username': f'user{index}', 'email': f'user{index}@yamdb.fake'},
+        REMOTE_ADDR=ip)
+
+
+def guess(client, ip, username='TestUser'):
+    return client.post(URL_TOKEN, {
+        'username': username, 'confirmation_code': 'wrong'}, REMOTE_ADDR=ip)
+
+
+class FixedKeyThrottle(SlidingWindowThrottle):
+    scope = 'auth_ip'
+
+    def get_keys(self, request, view):
+        return ['fixed']
+
+
+def allow_and_exit(count):
+    throttle = FixedKeyThrottle()
+    os._exit(sum(throttle.allow_request(None, None) for _ in range(count)))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(SlidingWindowThrottle, 'timer', lambda self: now[0])
+    return now
+
+
+@pytest.mark.django_db(transaction=True)
+class Test29AuthThrottles:
+
+    def test_01_ip_bucket(self, client, settings, clock):
+        settings.AUTH_THROTTLE_RATES = {'auth_ip': '3/min'}
+        for index in range(3):
+            assert signup(client, index).status_code == HTTPStatus.OK
+        with CaptureQueriesContext(connection) as queries:
+            response = signup(client, 3)
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert len(queries) == 0, (
+            'Отклонённый запрос не должен обращаться к БД.'
+        )
+        # Окно [960, 1020) заполнено: следующий запрос пройдёт, когда
+        # его вклад в скользящее окно убудет до двух запросов.
+        assert response['Retry-After'] == '40'
+        assert signup(client, 3, ip='10.0.0.2').status_code == HTTPStatus.OK
+
+        clock[0] += 40
+        assert signup(client, 3).status_code == HTTPStatus.OK, (
+            'Лимит должен восстанавливаться со временем.'
+        )
+        assert signup(client, 4).status_code == (
+            HTTPStatus.TOO_MANY_REQUESTS)
+
+    def test_02_identity_bucket(self, client, user, settings, clock):
+        settings.AUTH_THROTTLE_RATES = {'auth_identity': '2/min'}
+        assert guess(client, '10.0.0.1').status_code == HTTPStatus.BAD_REQUEST
+        assert guess(client, '10.0.0.2').status_code == HTTPStatus.BAD_REQUEST
+        assert guess(client, '10.0.0.3').status_code == (
+            HTTPStatus.TOO_MANY_REQUESTS), (
+            'Перебор кодов одного пользователя с разных адресов должен '
+            'ограничиваться.'
+        )
+        assert guess(client, '10.0.0.3', username='Other').status_code == (
+            HTTPStatus.NOT_FOUND)
+
+        client.post(URL_SIGNUP, {'username': 'a', 'email': 'same@yamdb.fake'})
+        client.post(URL_SIGNUP, {'username': 'b', 'email': 'SAME@yamdb.fake'})
+        response = client.post(
+            URL_SIGNUP, {'username': 'c', 'email': 'same@yamdb.fake'})
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+    def test_03_rejection_counters(self, client, admin_client, user_client,
+                                   settings, clock):
+        settings.AUTH_THROTTLE_RATES = {
+            'auth_ip': '1/min', 'auth_identity': '10/min'}
+        for index in range(3):
+            signup(client, index)
+        response = admin_client.get(URL_STATS)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'auth_ip': {'rate': '1/min', 'rejected': 2},
+            'auth_identity': {'rate': '10/min', 'rejected': 0},
+        }
+        assert user_client.get(URL_STATS).status_code == HTTPStatus.FORBIDDEN
+
+    def test_04_forwarded_for_is_ignored(self, client, settings, clock):
+        settings.AUTH_THROTTLE_RATES = {'auth_ip': '2/min'}
+        statuses = [
+            client.post(URL_SIGNUP, {
+                'username': f'user{index}',
+                'email': f'user{index}@yamdb.fake'},
+                REMOTE_ADDR='10.0.0.1',
+                HTTP_X_FORWARDED_FOR=f'192.0.2.{index}').status_code
+            for index in range(3)]
+        assert statuses[-1] == HTTPStatus.TOO_MANY_REQUESTS, (
+            'Лимит по IP не должен обходиться подменой X-Forwarded-For.'
+        )
+
+    def test_05_counters_are_atomic(self, settings, clock):
+        settings.AUTH_THROTTLE_RATES = {'auth_ip': '20/min'}
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=allow_and_exit, args=(10,))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert sum(process.exitcode for process in processes) == 20, (
+            'Одновременные запросы из разных процессов не должны '
+            'превышать лимит.'
+        )